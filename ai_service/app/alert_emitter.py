@@ -1,23 +1,36 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import time
 import uuid
+from typing import Dict, Optional, Sequence, Tuple
 
 import asyncpg
 from confluent_kafka import Producer
 from pydantic import BaseModel
-import structlog
 
-from .normalize import NormalizedEvent
+from . import codec
+from .normalize import CompactEvent
 from .scoring_engine import ScoreResult
 from .labeler import GPTLabel
+from .log_config import get_logger
 from .metrics import DB_LATENCY_SECONDS, KAFKA_PUBLISH_SECONDS, FAILED_TX_TOTAL
-from .secrets import get_db_dsn, get_kafka_conf
+from .secrets import get_db_dsn, get_instance_id, get_kafka_conf
+
+
+_INSERT_ALERT = """
+INSERT INTO public.alerts (
+    id, event_id, class, severity, reason, score,
+    event_ts, raw, gpt_tokens
+) VALUES (
+    $1, $2, $3, $4, $5, $6, $7, $8, $9
+) ON CONFLICT (event_id) DO NOTHING RETURNING id
+"""
 
 
 class AlertIn(BaseModel):
-    event: NormalizedEvent
+    # validated and described as a NormalizedEvent, held compact
+    event: CompactEvent
     scores: ScoreResult
     label: GPTLabel
 
@@ -27,8 +40,9 @@ class AlertEmitter:
         self._pool: asyncpg.Pool | None = None
         self._stmt: asyncpg.PreparedStatement | None = None
         self._producer: Producer | None = None
-        structlog.configure(processors=[structlog.processors.JSONRenderer()])
-        self._logger = structlog.get_logger().bind(service="alert-emitter")
+        # the transactional producer holds one open transaction at a time
+        self._tx_lock = asyncio.Lock()
+        self._logger = get_logger(service="alert-emitter")
 
     # ------------------------------------------------------------------
     async def init(self) -> None:
@@ -36,19 +50,10 @@ class AlertEmitter:
         dsn = get_db_dsn()
         self._pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=4)
         async with self._pool.acquire() as conn:
-            self._stmt = await conn.prepare(
-                """
-                INSERT INTO public.alerts (
-                    id, event_id, class, severity, reason, score,
-                    event_ts, raw, gpt_tokens
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9
-                ) ON CONFLICT (event_id) DO NOTHING RETURNING id
-                """
-            )
+            self._stmt = await conn.prepare(_INSERT_ALERT)
         conf = {
             **get_kafka_conf(),
-            "transactional.id": "trustvault-alert-emitter",
+            "transactional.id": f"trustvault-alert-emitter-{get_instance_id()}",
             "enable.idempotence": True,
             "acks": "all",
             "linger.ms": 10,
@@ -70,16 +75,14 @@ class AlertEmitter:
 
     # ------------------------------------------------------------------
     async def emit(self, alert: AlertIn) -> None:
+        async with self._tx_lock:
+            await self._emit(alert)
+
+    async def _emit(self, alert: AlertIn) -> None:
         assert self._producer is not None and self._pool is not None
         producer = self._producer
         pool = self._pool
-        key = alert.event.id.encode()
-        payload = {
-            "event": alert.event.model_dump(mode="json"),
-            "scores": alert.scores.__dict__,
-            "label": alert.label.model_dump(by_alias=True),
-        }
-        value = json.dumps(payload, separators=(",", ":")).encode()
+        key, value, event_json = self._encode(alert)
         alert_id = str(uuid.uuid4())
         logger = self._logger.bind(alert_id=alert_id, severity=alert.label.severity)
 
@@ -97,7 +100,7 @@ class AlertEmitter:
                     alert.label.reason,
                     alert.scores.aggregate,
                     alert.event.timestamp,
-                    json.dumps(alert.event.model_dump(mode="json"), separators=(",", ":")),
+                    event_json.decode(),
                     alert.label.gpt_tokens,
                 )
             inserted = res is not None
@@ -126,6 +129,131 @@ class AlertEmitter:
             await self._send_dlq(key, value, reason="kafka_failure")
             logger.error("kafka_error", tx_state="aborted")
 
+    @staticmethod
+    def _encode(alert: AlertIn) -> Tuple[bytes, bytes, bytes]:
+        """Return Kafka key, Kafka value and the encoded event for ``alert``."""
+        # the event is encoded once and spliced into the Kafka payload
+        # as well as stored in the raw column
+        event_json = codec.dumps(alert.event.as_dict())
+        value = b"".join(
+            (
+                b'{"event":',
+                event_json,
+                b',"scores":',
+                codec.dumps(alert.scores.__dict__),
+                b',"label":',
+                codec.dumps(alert.label.model_dump(by_alias=True)),
+                b"}",
+            )
+        )
+        return alert.event.id.encode(), value, event_json
+
+    @classmethod
+    def output(cls, alert: AlertIn) -> Tuple[Tuple[str, bytes, Dict[str, str]], bytes]:
+        """The ``alerts`` record for ``alert`` as a pipeline output
+        ``(topic, value, headers)``, and the encoded event for
+        :meth:`persist_many`."""
+        _, value, event_json = cls._encode(alert)
+        return ("alerts", value, {"event_id": alert.event.id}), event_json
+
+    @staticmethod
+    def _rows(alerts: Sequence[AlertIn], event_jsons: Sequence[bytes]) -> list:
+        return [
+            (
+                str(uuid.uuid4()),
+                alert.event.id,
+                alert.label.class_,
+                alert.label.severity,
+                alert.label.reason,
+                alert.scores.aggregate,
+                alert.event.timestamp,
+                event_json.decode(),
+                alert.label.gpt_tokens,
+            )
+            for alert, event_json in zip(alerts, event_jsons)
+        ]
+
+    async def persist_many(self, alerts: Sequence[AlertIn], event_jsons: Optional[Sequence[bytes]] = None) -> None:
+        """Insert ``alerts`` in one DB transaction without publishing them.
+
+        For the live path, where the orchestrator publishes the alerts in
+        its own Kafka transaction with the consumed offsets. Inserts are
+        idempotent per event, so a batch replayed after a failed commit is
+        harmless. Raises on failure.
+        """
+        if not alerts:
+            return
+        assert self._pool is not None
+        if event_jsons is None:
+            event_jsons = [self._encode(alert)[2] for alert in alerts]
+        rows = self._rows(alerts, event_jsons)
+        db_start = time.perf_counter()
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(_INSERT_ALERT, rows)
+        except Exception:
+            DB_LATENCY_SECONDS.labels(outcome="failure").observe(time.perf_counter() - db_start)
+            FAILED_TX_TOTAL.labels(stage="db").inc()
+            self._logger.error("db_error", batch_size=len(alerts))
+            raise
+        DB_LATENCY_SECONDS.labels(outcome="success").observe(time.perf_counter() - db_start)
+
+    async def emit_many(self, alerts: Sequence[AlertIn]) -> None:
+        """Persist and publish ``alerts`` in one DB and one Kafka transaction.
+
+        Used for bulk output such as replays; on failure every alert of the
+        batch goes to the DLQ.
+        """
+        if not alerts:
+            return
+        async with self._tx_lock:
+            await self._emit_many(alerts)
+
+    async def _emit_many(self, alerts: Sequence[AlertIn]) -> None:
+        assert self._producer is not None and self._pool is not None
+        producer = self._producer
+        encoded = [self._encode(alert) for alert in alerts]
+        rows = self._rows(alerts, [event_json for _, _, event_json in encoded])
+        logger = self._logger.bind(batch_size=len(alerts))
+
+        producer.begin_transaction()
+        # the DB transaction commits before Kafka's, so a failure is
+        # attributed to one stage and only an open Kafka transaction is aborted
+        db_start = time.perf_counter()
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(_INSERT_ALERT, rows)
+        except Exception:
+            DB_LATENCY_SECONDS.labels(outcome="failure").observe(time.perf_counter() - db_start)
+            FAILED_TX_TOTAL.labels(stage="db").inc()
+            producer.abort_transaction()
+            for key, value, _ in encoded:
+                await self._send_dlq(key, value, reason="db_failure")
+            logger.error("db_error", tx_state="aborted")
+            return
+        DB_LATENCY_SECONDS.labels(outcome="success").observe(time.perf_counter() - db_start)
+
+        k_start = time.perf_counter()
+        try:
+            for key, value, _ in encoded:
+                producer.produce("alerts", key=key, value=value)
+            producer.commit_transaction()
+        except Exception:
+            KAFKA_PUBLISH_SECONDS.labels(outcome="failure").observe(time.perf_counter() - k_start)
+            FAILED_TX_TOTAL.labels(stage="kafka").inc()
+            producer.abort_transaction()
+            # rows of events already stored before this batch keep their own ids
+            async with self._pool.acquire() as conn:
+                await conn.execute("DELETE FROM public.alerts WHERE id = ANY($1)", [row[0] for row in rows])
+            for key, value, _ in encoded:
+                await self._send_dlq(key, value, reason="kafka_failure")
+            logger.error("kafka_error", tx_state="aborted")
+            return
+        KAFKA_PUBLISH_SECONDS.labels(outcome="success").observe(time.perf_counter() - k_start)
+        logger.info("emitted_batch", tx_state="committed")
+
     async def _send_dlq(self, key: bytes, value: bytes, *, reason: str) -> None:
         try:
             assert self._producer is not None
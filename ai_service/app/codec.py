@@ -0,0 +1,53 @@
+"""Event Codec
+-------------
+
+JSON encoding shared by the orchestrator, the pipeline and the alert
+emitter. Decodes straight from message bytes and always encodes to bytes,
+so an event is serialized once and the result reused for Kafka and
+Postgres.
+
+The fastest available backend is used: ``orjson``, then ``msgspec``, then
+the standard library ``json`` module.
+
+Examples
+--------
+
+>>> loads(dumps({"a": 1}))
+{'a': 1}
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Tuple, Type
+
+try:  # pragma: no cover - depends on installed extras
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:  # pragma: no cover - depends on installed extras
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+
+def _json_loads(data: Any) -> Any:
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _select() -> Tuple[str, Callable[[Any], Any], Callable[[Any], bytes], Tuple[Type[BaseException], ...]]:
+    if orjson is not None:
+        return "orjson", orjson.loads, orjson.dumps, (ValueError,)
+    if msgspec is not None:
+        return "msgspec", msgspec.json.decode, msgspec.json.encode, (ValueError, msgspec.DecodeError)
+    return "json", _json_loads, _json_dumps, (ValueError,)
+
+
+# ``loads(bytes) -> obj``, ``dumps(obj) -> bytes`` and the exceptions raised
+# for a malformed payload (invalid UTF-8 included)
+BACKEND, loads, dumps, DecodeError = _select()
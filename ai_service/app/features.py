@@ -0,0 +1,100 @@
+"""Event Features
+--------------
+
+The 32-wide feature vector the models see, shared by the scoring engine
+and the trainer so both always compute the same numbers.
+
+Eight base features are derived from an event and repeated four times:
+
+====  =========================================================
+0     source address, ``value % 65535 / 65535``
+1     destination address, likewise; ``0`` when missing
+2     ``1`` for internal traffic
+3     length of ``user_id``
+4     POSIX timestamp, ``% 1e6 / 1e6``
+5     ``method``, stable hash in ``[0, 1)``
+6     ``endpoint``, stable hash in ``[0, 1)``
+7     ``bytes``, ``% 1e6 / 1e6``
+====  =========================================================
+
+Strings are hashed with CRC-32 of their UTF-8 bytes rather than the
+builtin :func:`hash`, which is salted per process: with it the same event
+gets different features in every worker and after every restart.
+
+:func:`vectorize` fills a preallocated ``(n, 32)`` float32 matrix for a
+whole batch in one pass.
+
+Examples
+--------
+
+>>> stable_hash("GET")
+0.626
+>>> from ai_service.app.normalize import Normalizer
+>>> event = Normalizer.normalize({"src_ip": "10.0.0.1", "timestamp": 0, "method": "GET"})
+>>> X = vectorize([event, event])
+>>> X.shape, X.dtype
+((2, 32), dtype('float32'))
+>>> bool((X[:, :8] == X[:, 24:]).all())
+True
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .ipnet import parse_ip
+from .normalize import CompactEvent
+
+BASE_FEATURES = 8
+REPEATS = 4
+FEATURES = BASE_FEATURES * REPEATS
+
+
+def stable_hash(text: Optional[str]) -> float:
+    """Map ``text`` to ``[0, 1)``, identically in every process; ``0`` for
+    an empty or missing value."""
+    if not text:
+        return 0.0
+    return zlib.crc32(text.encode("utf-8")) % 1000 / 1000
+
+
+def base_features(event: CompactEvent) -> List[float]:
+    """The eight base features of ``event``."""
+    # normalized addresses are already in the shared parse cache
+    return [
+        parse_ip(event.src_ip).value % 65535 / 65535,
+        parse_ip(event.dst_ip).value % 65535 / 65535 if event.dst_ip else 0.0,
+        1.0 if event.is_internal else 0.0,
+        float(len(event.user_id)) if event.user_id else 0.0,
+        event.timestamp.timestamp() % 1e6 / 1e6,
+        stable_hash(event.method),
+        stable_hash(event.endpoint),
+        (event.bytes or 0) % 1e6 / 1e6,
+    ]
+
+
+def vectorize(events: Sequence[CompactEvent], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Feature matrix of ``events``, written into ``out`` if given.
+
+    ``out`` must be a float32 array of shape ``(len(events), 32)``.
+    """
+    n = len(events)
+    if out is None:
+        out = np.empty((n, FEATURES), dtype=np.float32)
+    elif out.shape != (n, FEATURES) or out.dtype != np.float32:
+        raise ValueError(f"out must be a float32 array of shape {(n, FEATURES)}, got {out.dtype} {out.shape}")
+    if not n:
+        return out
+    base = out[:, :BASE_FEATURES]
+    base[...] = [base_features(event) for event in events]
+    for k in range(1, REPEATS):
+        out[:, k * BASE_FEATURES : (k + 1) * BASE_FEATURES] = base
+    return out
+
+
+def event_vector(event: CompactEvent) -> np.ndarray:
+    """Feature vector of a single event."""
+    return vectorize([event])[0]
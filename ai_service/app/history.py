@@ -0,0 +1,177 @@
+"""Per-user Feature History
+-------------------------
+
+Fixed-size store for the last ``window`` feature vectors of each user, fed
+to the LSTM. All users share one preallocated ``capacity × window ×
+features`` float32 block; an index maps user IDs to slots.
+
+Each slot is kept in time order, newest row last: appending shifts the
+slot left by one row (a ``window × features`` memmove, 6.4 KB by default)
+and writes the new row at the end. A user with ``n`` rows therefore
+occupies the last ``n`` rows of the slot, and :meth:`HistoryStore.view`
+returns them as a view without copying. A classic ring buffer would need a
+copy to unroll on every read, and the engine reads after every append.
+
+Users idle for longer than ``ttl`` seconds are dropped; when every slot is
+taken the least recently used user is evicted. ``np.zeros`` memory is only
+committed by the OS as slots are written, so a large ``capacity`` costs
+address space rather than resident memory until it is used.
+
+Examples
+--------
+
+>>> store = HistoryStore(capacity=2, window=3, features=2)
+>>> for v in range(4):
+...     _ = store.append("alice", np.full(2, v, dtype=np.float32))
+>>> store.get("alice")[:, 0]
+array([1., 2., 3.], dtype=float32)
+>>> _ = store.append("bob", np.ones(2, dtype=np.float32))
+>>> _ = store.append("carol", np.ones(2, dtype=np.float32))  # evicts alice
+>>> "alice" in store, len(store)
+(False, 2)
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+from .metrics import HISTORY_BYTES, HISTORY_EVICTIONS, HISTORY_USERS
+
+
+class HistoryStore:
+    """Bounded per-user history with LRU and idle-time eviction."""
+
+    def __init__(
+        self,
+        capacity: int = 20000,
+        window: int = 50,
+        features: int = 32,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.window = window
+        self.features = features
+        self.ttl = ttl
+        self._data = np.zeros((capacity, window, features), dtype=np.float32)
+        self._lengths = np.zeros(capacity, dtype=np.int64)
+        self._last_seen = np.zeros(capacity, dtype=np.float64)
+        # user -> slot, least recently used first
+        self._slots: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        HISTORY_BYTES.labels(kind="allocated").set(self._data.nbytes)
+        self._report()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, user_id: Hashable) -> bool:
+        return user_id in self._slots
+
+    @property
+    def slot_nbytes(self) -> int:
+        return self.window * self.features * self._data.itemsize
+
+    # ------------------------------------------------------------------
+    def slot(self, user_id: Hashable, now: Optional[float] = None) -> int:
+        """Return the slot of ``user_id``, allocating one if needed, and
+        mark the user as just used."""
+        now = time.monotonic() if now is None else now
+        self.evict_idle(now)
+        slot = self._slots.get(user_id)
+        if slot is None:
+            if not self._free:
+                _, victim = self._slots.popitem(last=False)
+                self._release(victim)
+                HISTORY_EVICTIONS.labels(reason="lru").inc()
+            slot = self._free.pop()
+            self._slots[user_id] = slot
+            self._report()
+        else:
+            self._slots.move_to_end(user_id)
+        self._last_seen[slot] = now
+        return slot
+
+    def push(self, slot: int, vec: np.ndarray) -> None:
+        """Append ``vec`` as the newest row of ``slot``."""
+        rows = self._data[slot]
+        rows[:-1] = rows[1:]
+        rows[-1] = vec
+        if self._lengths[slot] < self.window:
+            self._lengths[slot] += 1
+
+    def length(self, slot: int) -> int:
+        """Rows held in ``slot``; ``0`` for a slot just (re)allocated."""
+        return int(self._lengths[slot])
+
+    def view(self, slot: int) -> np.ndarray:
+        """The ``(length, features)`` history in ``slot``, oldest first.
+
+        This is a view into the store: it changes with the next push to the
+        slot, so copy it to keep it past that.
+        """
+        return self._data[slot, self.window - self._lengths[slot] :]
+
+    def append(self, user_id: Hashable, vec: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """Append ``vec`` to the history of ``user_id`` and return its view."""
+        slot = self.slot(user_id, now)
+        self.push(slot, vec)
+        return self.view(slot)
+
+    def get(self, user_id: Hashable) -> Optional[np.ndarray]:
+        """View of the history of ``user_id`` without marking it used."""
+        slot = self._slots.get(user_id)
+        return None if slot is None else self.view(slot)
+
+    def slot_of(self, user_id: Hashable) -> Optional[int]:
+        """Slot of ``user_id`` without marking it used; ``None`` if absent."""
+        return self._slots.get(user_id)
+
+    def users(self) -> List[Hashable]:
+        """Users held, least recently used first."""
+        return list(self._slots)
+
+    def remove(self, user_id: Hashable) -> None:
+        """Drop ``user_id`` and free its slot."""
+        slot = self._slots.pop(user_id, None)
+        if slot is not None:
+            self._release(slot)
+            self._report()
+
+    # ------------------------------------------------------------------
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop users idle for more than ``ttl`` seconds; return how many."""
+        if self.ttl is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        # LRU order means idle users are at the front
+        while self._slots:
+            user_id, slot = next(iter(self._slots.items()))
+            if now - self._last_seen[slot] <= self.ttl:
+                break
+            del self._slots[user_id]
+            self._release(slot)
+            evicted += 1
+        if evicted:
+            HISTORY_EVICTIONS.labels(reason="ttl").inc(evicted)
+            self._report()
+        return evicted
+
+    def clear(self) -> None:
+        for slot in self._slots.values():
+            self._release(slot)
+        self._slots.clear()
+        self._report()
+
+    def _release(self, slot: int) -> None:
+        # zero lengths are enough: pushes overwrite rows before they are viewed
+        self._lengths[slot] = 0
+        self._free.append(slot)
+
+    def _report(self) -> None:
+        HISTORY_USERS.set(len(self._slots))
+        HISTORY_BYTES.labels(kind="used").set(len(self._slots) * self.slot_nbytes)
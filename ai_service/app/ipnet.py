@@ -0,0 +1,147 @@
+"""Address Parsing and Internal Networks
+---------------------------------------
+
+Parses IP address strings once and classifies them as internal.
+
+"Internal" is a configurable CIDR list (``INTERNAL_CIDRS``, comma
+separated) rather than :attr:`ipaddress.IPv4Address.is_private`, so public
+ranges we own count as internal too. The keyword ``private`` expands to the
+special-purpose ranges ``is_private`` covers, and is the default. The list
+is compiled into sorted, merged integer intervals searched with
+:func:`bisect.bisect_right`.
+
+Parsed addresses are kept in a bounded LRU cache (``IP_CACHE_SIZE``)
+shared by the normalizer and the scoring engine, so hot hosts are not
+parsed at all.
+
+Examples
+--------
+
+>>> configure("private,198.51.100.0/24")
+>>> parse_ip("198.51.100.7").internal
+True
+>>> parse_ip("8.8.8.8").internal
+False
+>>> parse_ip("FD00::1")
+ParsedIP(text='fd00::1', value=336294682933583715844663186250927177729, version=6, internal=True)
+"""
+
+from __future__ import annotations
+
+import bisect
+import ipaddress
+import os
+import socket
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Tuple
+
+# ranges of ``ipaddress`` ``is_private`` (CPython 3.11), pinned so the
+# default does not change with the interpreter version. IPv4-mapped IPv6
+# addresses are classified by their IPv4 address instead.
+PRIVATE_CIDRS = (
+    "0.0.0.0/8",
+    "10.0.0.0/8",
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.0.0.0/29",
+    "192.0.0.170/31",
+    "192.0.2.0/24",
+    "192.168.0.0/16",
+    "198.18.0.0/15",
+    "198.51.100.0/24",
+    "203.0.113.0/24",
+    "240.0.0.0/4",
+    "255.255.255.255/32",
+    "::1/128",
+    "::/128",
+    "100::/64",
+    "2001::/23",
+    "2001:2::/48",
+    "2001:db8::/32",
+    "2001:10::/28",
+    "fc00::/7",
+    "fe80::/10",
+)
+
+
+class ParsedIP(NamedTuple):
+    text: str
+    value: int
+    version: int
+    internal: bool
+
+
+class InternalNetworks:
+    """Membership test for a CIDR list over integer addresses."""
+
+    def __init__(self, cidrs: Iterable[str]) -> None:
+        ranges = {4: [], 6: []}
+        for cidr in cidrs:
+            cidr = cidr.strip()
+            if not cidr:
+                continue
+            if cidr == "private":
+                ranges[4].extend(_ranges(PRIVATE_CIDRS, 4))
+                ranges[6].extend(_ranges(PRIVATE_CIDRS, 6))
+                continue
+            net = ipaddress.ip_network(cidr, strict=False)
+            ranges[net.version].append((int(net.network_address), int(net.broadcast_address)))
+        self._starts = {}
+        self._ends = {}
+        for version, spans in ranges.items():
+            merged = _merge(spans)
+            self._starts[version] = [start for start, _ in merged]
+            self._ends[version] = [end for _, end in merged]
+
+    def contains(self, value: int, version: int) -> bool:
+        starts = self._starts[version]
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= self._ends[version][i]
+
+
+def _ranges(cidrs: Iterable[str], version: int) -> List[Tuple[int, int]]:
+    nets = (ipaddress.ip_network(c) for c in cidrs)
+    return [(int(n.network_address), int(n.broadcast_address)) for n in nets if n.version == version]
+
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+_networks = InternalNetworks(os.getenv("INTERNAL_CIDRS", "private").split(","))
+
+
+def configure(cidrs: str | Iterable[str]) -> None:
+    """Replace the internal network list and drop cached classifications."""
+    global _networks
+    if isinstance(cidrs, str):
+        cidrs = cidrs.split(",")
+    _networks = InternalNetworks(cidrs)
+    parse_ip.cache_clear()
+
+
+@lru_cache(maxsize=int(os.getenv("IP_CACHE_SIZE", "65536")))
+def parse_ip(text: str) -> ParsedIP:
+    """Parse ``text`` into its canonical form, integer value and class.
+
+    Raises :class:`ValueError` for anything that is not an IP address.
+    """
+    try:
+        # inet_pton is as strict as ipaddress for dotted quads, and much faster
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+        return ParsedIP(text, value, 4, _networks.contains(value, 4))
+    except (OSError, TypeError):
+        pass
+    ip = ipaddress.ip_address(text)
+    value = int(ip)
+    mapped = getattr(ip, "ipv4_mapped", None)
+    if mapped is not None:
+        return ParsedIP(str(ip), value, 6, _networks.contains(int(mapped), 4))
+    return ParsedIP(str(ip), value, ip.version, _networks.contains(value, ip.version))
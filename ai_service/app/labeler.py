@@ -7,10 +7,10 @@ from typing import Tuple
 import openai
 from pydantic import BaseModel, Field, ConfigDict
 from tenacity import retry, wait_exponential, stop_after_attempt
-import structlog
 import ulid
 
-from .normalize import NormalizedEvent
+from .log_config import get_logger
+from .normalize import CompactEvent
 from .scoring_engine import ScoreResult
 from .secrets_manager import get_openai_api_key
 
@@ -24,9 +24,7 @@ class GPTLabel(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
-# configure logging
-structlog.configure(processors=[structlog.processors.JSONRenderer()])
-logger = structlog.get_logger().bind(service="gpt-labeler")
+logger = get_logger(service="gpt-labeler")
 
 
 def _score_to_severity(score: float) -> str:
@@ -48,7 +46,7 @@ _MOCK_LABELS: Tuple[Tuple[str, str], ...] = (
 )
 
 
-def _mock_label(event: NormalizedEvent) -> Tuple[str, str]:
+def _mock_label(event: CompactEvent) -> Tuple[str, str]:
     idx = ulid.from_str(event.id).int % len(_MOCK_LABELS)
     return _MOCK_LABELS[idx]
 
@@ -60,7 +58,7 @@ def _call_openai(messages: list[dict]) -> openai.types.chat.chat_completion.Chat
     return openai.ChatCompletion.create(model="gpt-4o-mini", temperature=0, messages=messages, api_key=api_key)
 
 
-def label_event(event: NormalizedEvent, scores: ScoreResult) -> GPTLabel:
+def label_event(event: CompactEvent, scores: ScoreResult) -> GPTLabel:
     if os.getenv("OPENAI_MOCK") == "1":
         class_, severity = _mock_label(event)
         logger.info("labeled", event_id=event.id, severity=severity, gpt_tokens=0, mock=True)
@@ -73,7 +71,7 @@ def label_event(event: NormalizedEvent, scores: ScoreResult) -> GPTLabel:
             "role": "system",
             "content": "You are a senior SOC analyst. Respond with concise JSON {class, severity, reason}. No extra keys.",
         },
-        {"role": "user", "content": json.dumps({"event": event.model_dump(mode="json"), "scores": scores.__dict__})},
+        {"role": "user", "content": json.dumps({"event": event.as_dict(), "scores": scores.__dict__})},
     ]
 
     response = _call_openai(messages)
@@ -0,0 +1,195 @@
+"""Logging Setup
+---------------
+
+The one structlog configuration for the AI service. Importing this module
+configures structlog; modules get their logger from :func:`get_logger`
+instead of calling ``structlog.configure`` themselves.
+
+Two things keep per-event logging off the hot path:
+
+* **Sampling.** High-volume events (``normalized``, ``scored``, ...) are
+  kept with a per-event probability from ``LOG_SAMPLE_RATES``, e.g.
+  ``"normalized=0.001,scored=0.01"``. Kept records carry ``sample_rate``
+  so counts can be scaled back up. Warnings and errors are never sampled.
+* **Queued sink.** Log calls only filter, sample and enqueue the event
+  dict. A background thread renders it to JSON and writes it to stdout.
+
+Examples
+--------
+
+>>> configure(sample_rates={"scored": 0.0})
+>>> log = get_logger(service="docs")
+>>> log.info("scored", score=1.0)      # dropped by sampling
+>>> log.error("scored", score=1.0)     # errors are always kept
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Any, Dict, Mapping, Optional, TextIO, Tuple
+
+import structlog
+
+# sample rates used unless LOG_SAMPLE_RATES says otherwise; events not
+# listed are always kept
+DEFAULT_SAMPLE_RATES: Dict[str, float] = {
+    "normalized": 0.01,
+    "scored": 0.01,
+    "labeled": 0.1,
+    "emitted": 0.1,
+}
+
+_NEVER_SAMPLED = frozenset(("warning", "warn", "error", "critical", "exception", "fatal"))
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse ``"event=rate,event=rate"`` into a dict."""
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, rate = item.partition("=")
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class Sampler:
+    """structlog processor dropping a fraction of info/debug records per event name."""
+
+    def __init__(self, rates: Mapping[str, float]) -> None:
+        self.rates = dict(rates)
+
+    def __call__(self, _logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        if method_name in _NEVER_SAMPLED:
+            return event_dict
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is None or rate >= 1.0:
+            return event_dict
+        if random.random() >= rate:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+class QueueSink:
+    """structlog logger that hands event dicts to a rendering thread.
+
+    The queue is bounded; when it is full, sampled-level records are dropped
+    (and counted in ``dropped``) while warnings and errors wait for room.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, maxsize: int = 10000) -> None:
+        self.stream = stream
+        self.dropped = 0
+        self._maxsize = maxsize
+        self._renderer = structlog.processors.JSONRenderer()
+        self._start()
+
+    def _start(self) -> None:
+        self._queue: queue.Queue = queue.Queue(self._maxsize)
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def _put(self, method_name: str, event_dict: Dict[str, Any]) -> None:
+        if method_name in _NEVER_SAMPLED:
+            self._queue.put(event_dict)
+            return
+        try:
+            self._queue.put_nowait(event_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            event_dict = self._queue.get()
+            try:
+                line = self._renderer(None, "", event_dict)
+                stream = self.stream or sys.stdout
+                stream.write(line + "\n")
+                if self._queue.empty():
+                    stream.flush()
+            except Exception:  # pragma: no cover - never let logging kill the thread
+                pass
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    # structlog calls the method named like the log call with our processor output
+    def msg(self, event_dict: Dict[str, Any]) -> None:
+        self._put("info", event_dict)
+
+    debug = info = msg
+
+    def warning(self, event_dict: Dict[str, Any]) -> None:
+        self._put("warning", event_dict)
+
+    warn = error = critical = exception = fatal = warning
+
+
+def _to_sink(_logger: Any, _method_name: str, event_dict: Dict[str, Any]) -> Tuple[Tuple[Any], Dict]:
+    # passed positionally to QueueSink.<method>, avoiding a kwargs copy
+    return (event_dict,), {}
+
+
+_sampler = Sampler(DEFAULT_SAMPLE_RATES)
+_sink: Optional[QueueSink] = None
+
+
+def configure(
+    *,
+    sample_rates: Optional[Mapping[str, float]] = None,
+    level: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> None:
+    """Install the shared structlog configuration.
+
+    Runs on import with settings from ``LOG_SAMPLE_RATES`` and
+    ``LOG_LEVEL``. Calling it again updates sample rates and the output
+    stream in place, so loggers bound earlier pick up the change.
+    """
+    global _sink
+    if sample_rates is None:
+        sample_rates = {**DEFAULT_SAMPLE_RATES, **parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))}
+    _sampler.rates = dict(sample_rates)
+    if _sink is None:
+        _sink = QueueSink(stream)
+        atexit.register(_sink.flush)
+        if hasattr(os, "register_at_fork"):
+            # the rendering thread does not survive fork
+            os.register_at_fork(after_in_child=_sink._start)
+    else:
+        _sink.stream = stream
+    level_no = logging.getLevelName((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            _sampler,
+            # tracebacks must be captured before leaving the calling thread
+            structlog.processors.format_exc_info,
+            _to_sink,
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(level_no),
+        logger_factory=lambda *_args: _sink,
+        cache_logger_on_first_use=True,
+    )
+
+
+def get_logger(**initial_values: Any) -> structlog.BoundLogger:
+    return structlog.get_logger().bind(**initial_values)
+
+
+def flush() -> None:
+    """Wait until queued log records are written (tests, shutdown)."""
+    if _sink is not None:
+        _sink.flush()
+
+
+configure()
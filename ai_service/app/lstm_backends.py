@@ -0,0 +1,220 @@
+"""LSTM Inference Backends
+-----------------------
+
+Interchangeable runtimes for the LSTM autoencoder, chosen with
+``SCORING_LSTM_BACKEND``:
+
+``tf``
+    The TensorFlow SavedModel in ``lstm_encoder/``. Windows run through its
+    ``serve`` signature; single steps use the NumPy cell.
+``numpy``
+    :class:`~.lstm_cells.LSTMCells` over ``lstm_encoder_weights.npz``. No
+    TensorFlow import at all.
+``tflite``
+    ``lstm_encoder_step.tflite`` through the LiteRT interpreter
+    (``ai_edge_litert``, ``tflite_runtime`` or ``tensorflow.lite``).
+``onnx``
+    ``lstm_encoder_step.onnx`` through ONNX Runtime.
+
+``SCORING_LSTM_PRECISION`` selects a post-training quantized TFLite file
+(``float16`` or ``int8`` weights) instead of the float32 one. The variants
+are smaller, not faster: dynamic-range int8 is slower per step than
+float32. Each ships with a calibration report from the trainer, with
+accuracy and throughput against float32; :func:`adjust_stats` uses it to
+shift the LSTM normalization stats so z-scores stay comparable.
+
+The TFLite and ONNX files hold a single LSTM time step (``x``, ``state``
+→ ``y``, ``state``) rather than the whole sequence model: the converters
+only accept the Keras LSTM with a static sequence length, while windows
+here range from 1 to 50 events. Stepping also gives every backend the
+incremental mode for free. The files are written by ``python -m
+trainer.train_lstm --export-only``.
+
+Examples
+--------
+
+>>> backend = load_backend("numpy", "models")          # doctest: +SKIP
+>>> backend.reconstruct(np.zeros((2, 50, 32), np.float32)).shape  # doctest: +SKIP
+(2, 50, 32)
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple, Type, Union
+
+import numpy as np
+
+from .lstm_cells import LSTMCells
+
+SAVED_MODEL = "lstm_encoder"
+WEIGHTS_FILE = "lstm_encoder_weights.npz"
+TFLITE_FILE = "lstm_encoder_step.tflite"
+ONNX_FILE = "lstm_encoder_step.onnx"
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def tflite_file(precision: str = "float32") -> str:
+    return TFLITE_FILE if precision == "float32" else f"lstm_encoder_step_{precision}.tflite"
+
+
+def report_file(precision: str) -> str:
+    return f"lstm_encoder_step_{precision}.report.json"
+
+
+def adjust_stats(stats: Dict[str, float], report: Dict[str, Any]) -> Dict[str, float]:
+    """Shift ``if_stats.json`` LSTM stats by what a variant's calibration
+    report measured against float32."""
+    base, variant = report["stats"]["float32"], report["stats"]["variant"]
+    adjusted = dict(stats)
+    adjusted["mu_lstm"] = stats["mu_lstm"] + variant["mu_lstm"] - base["mu_lstm"]
+    adjusted["sigma_lstm"] = stats["sigma_lstm"] * variant["sigma_lstm"] / base["sigma_lstm"]
+    return adjusted
+
+
+def load_cells(model_dir: Union[str, Path]) -> LSTMCells:
+    """NumPy cells from the exported weights, else from the SavedModel."""
+    path = Path(model_dir) / WEIGHTS_FILE
+    if path.exists():
+        return LSTMCells.load(path)
+    import tensorflow as tf
+
+    return LSTMCells.from_saved_model(tf.saved_model.load(str(Path(model_dir) / SAVED_MODEL)))
+
+
+class LSTMBackend:
+    """One time step of the encoder, and whole windows built from it."""
+
+    name = ""
+    state_size: int
+
+    def initial_state(self, n: int) -> np.ndarray:
+        return np.zeros((n, self.state_size), dtype=np.float32)
+
+    def step(self, x: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Advance ``(n, features)`` inputs by one step; return ``(y, state)``."""
+        raise NotImplementedError
+
+    def reconstruct(self, batch: np.ndarray) -> np.ndarray:
+        """Outputs for a ``(n, length, features)`` batch from a zero state."""
+        state = self.initial_state(len(batch))
+        outputs = []
+        for t in range(batch.shape[1]):
+            y, state = self.step(batch[:, t], state)
+            outputs.append(y)
+        return np.stack(outputs, axis=1)
+
+
+class NumpyBackend(LSTMBackend):
+    name = "numpy"
+
+    def __init__(self, model_dir: Union[str, Path]) -> None:
+        self.cells = load_cells(model_dir)
+        self.state_size = self.cells.state_size
+
+    def step(self, x: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.cells.step(x, state)
+
+
+class TFBackend(NumpyBackend):
+    name = "tf"
+
+    def __init__(self, model_dir: Union[str, Path]) -> None:
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = tf.saved_model.load(str(Path(model_dir) / SAVED_MODEL))
+        self.cells = LSTMCells.from_saved_model(self.model)
+        self.state_size = self.cells.state_size
+
+    def reconstruct(self, batch: np.ndarray) -> np.ndarray:
+        output = self.model.signatures["serve"](self._tf.constant(batch))
+        return output[list(output.keys())[0]].numpy()
+
+
+def _tflite_interpreter(path: str) -> Any:
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                import tensorflow as tf
+
+                Interpreter = tf.lite.Interpreter
+            except ImportError as e:  # pragma: no cover - optional dependency
+                raise RuntimeError("the tflite backend requires ai-edge-litert, tflite-runtime or tensorflow") from e
+    return Interpreter(model_path=path)
+
+
+class TFLiteBackend(LSTMBackend):
+    """An interpreter is not thread safe (calls resize and fill its input
+    tensors), so every thread that steps gets its own."""
+
+    name = "tflite"
+
+    def __init__(self, model_dir: Union[str, Path], filename: str = TFLITE_FILE) -> None:
+        self.path = str(Path(model_dir) / filename)
+        self._local = threading.local()
+        self.state_size = int(self._runner().get_input_details()["state"]["shape_signature"][1])
+
+    def _runner(self) -> Any:
+        runner = getattr(self._local, "runner", None)
+        if runner is None:
+            interpreter = _tflite_interpreter(self.path)
+            runner = self._local.runner = interpreter.get_signature_runner("serving_default")
+        return runner
+
+    def step(self, x: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        out = self._runner()(x=np.ascontiguousarray(x, dtype=np.float32), state=state)
+        return out["y"], out["state"]
+
+
+class ONNXBackend(LSTMBackend):
+    name = "onnx"
+
+    def __init__(self, model_dir: Union[str, Path], filename: str = ONNX_FILE) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:  # pragma: no cover - optional dependency
+            raise RuntimeError("the onnx backend requires onnxruntime") from e
+        self.session = ort.InferenceSession(str(Path(model_dir) / filename), providers=["CPUExecutionProvider"])
+        inputs = {i.name: i for i in self.session.get_inputs()}
+        self._state_in = next(name for name in inputs if "state" in name)
+        self._x_in = next(name for name in inputs if name != self._state_in)
+        self.state_size = int(inputs[self._state_in].shape[1])
+        # output names depend on the converter; tell them apart by width
+        outputs = self.session.get_outputs()
+        self._state_out = next(o.name for o in outputs if o.shape[1] == self.state_size)
+        self._y_out = next(o.name for o in outputs if o.name != self._state_out)
+
+    def step(self, x: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        y, state = self.session.run(
+            [self._y_out, self._state_out],
+            {self._x_in: np.ascontiguousarray(x, dtype=np.float32), self._state_in: state},
+        )
+        return y, state
+
+
+BACKENDS: Dict[str, Type[LSTMBackend]] = {
+    "tf": TFBackend,
+    "numpy": NumpyBackend,
+    "tflite": TFLiteBackend,
+    "onnx": ONNXBackend,
+}
+
+
+def load_backend(name: str, model_dir: Union[str, Path], precision: str = "float32") -> LSTMBackend:
+    try:
+        factory: Callable[[Union[str, Path]], LSTMBackend] = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown LSTM backend {name!r}; expected one of {sorted(BACKENDS)}") from None
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown LSTM precision {precision!r}; expected one of {list(PRECISIONS)}")
+    if precision != "float32":
+        if name != "tflite":
+            raise ValueError(f"{precision} LSTM variants are TFLite files; use the tflite backend")
+        return TFLiteBackend(model_dir, tflite_file(precision))
+    return factory(model_dir)
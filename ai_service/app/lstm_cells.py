@@ -0,0 +1,110 @@
+"""Stepwise LSTM Autoencoder
+-------------------------
+
+NumPy implementation of one time step of the stacked LSTM autoencoder
+exported by ``trainer/train_lstm.py``, for incremental scoring. Instead of
+re-running the model over a user's whole window for every event, the
+engine keeps each user's recurrent state and advances it by the new event
+only.
+
+The weights are read from the SavedModel, so the step reproduces the Keras
+layers (gate order ``i, f, c, o``; sigmoid recurrent activation, tanh
+activation) up to float32 rounding.
+
+Examples
+--------
+
+>>> rng = np.random.default_rng(0)
+>>> cells = LSTMCells([(rng.normal(size=(3, 8)), rng.normal(size=(2, 8)), np.zeros(8))])
+>>> state = cells.initial_state(4)
+>>> y, state = cells.step(np.ones((4, 3), dtype=np.float32), state)
+>>> y.shape, state.shape
+((4, 2), (4, 4))
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    out = np.negative(x)
+    np.exp(out, out=out)
+    out += 1.0
+    return np.reciprocal(out, out=out)
+
+
+class LSTMCells:
+    """Stacked LSTM layers advanced one time step at a time.
+
+    ``layers`` holds ``(kernel, recurrent_kernel, bias)`` per layer, input
+    first. The state of a row is the concatenation of ``(h, c)`` for every
+    layer.
+    """
+
+    def __init__(self, layers: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> None:
+        self.layers = [
+            (np.asarray(k, np.float32), np.asarray(r, np.float32), np.asarray(b, np.float32))
+            for k, r, b in layers
+        ]
+        self.units = [r.shape[0] for _, r, _ in self.layers]
+        self.state_size = 2 * sum(self.units)
+
+    @classmethod
+    def from_saved_model(cls, model: Any) -> "LSTMCells":
+        """Read the LSTM weights of a loaded SavedModel, in layer order."""
+        weights = {}
+        for var in model.variables:
+            layer, sep, name = var.name.rpartition("/lstm_cell/")
+            if sep:
+                weights.setdefault(layer, {})[name.split(":")[0]] = var.numpy()
+        # "lstm", "lstm_1", ... sort by their numeric suffix
+        order = sorted(weights, key=lambda n: int(n.rpartition("_")[2]) if n[-1].isdigit() else 0)
+        return cls([(weights[n]["kernel"], weights[n]["recurrent_kernel"], weights[n]["bias"]) for n in order])
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the weights to an ``.npz`` file readable by :meth:`load`."""
+        arrays = {}
+        for n, (kernel, recurrent, bias) in enumerate(self.layers):
+            arrays[f"kernel_{n}"] = kernel
+            arrays[f"recurrent_kernel_{n}"] = recurrent
+            arrays[f"bias_{n}"] = bias
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LSTMCells":
+        """Read weights written by :meth:`save`; needs no TensorFlow."""
+        with np.load(path) as data:
+            count = sum(1 for name in data.files if name.startswith("kernel_"))
+            return cls([(data[f"kernel_{n}"], data[f"recurrent_kernel_{n}"], data[f"bias_{n}"]) for n in range(count)])
+
+    def initial_state(self, n: int) -> np.ndarray:
+        return np.zeros((n, self.state_size), dtype=np.float32)
+
+    def step(self, x: np.ndarray, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Advance every row by one input ``x`` of shape ``(n, features)``.
+
+        Returns the output of the last layer and the new ``(n,
+        state_size)`` state; ``state`` is not modified.
+        """
+        new_state = np.empty_like(state)
+        h_in = x.astype(np.float32, copy=False)
+        offset = 0
+        for (kernel, recurrent, bias), units in zip(self.layers, self.units):
+            h = state[:, offset : offset + units]
+            c = state[:, offset + units : offset + 2 * units]
+            z = h_in @ kernel
+            z += h @ recurrent
+            z += bias
+            # one sigmoid over all four gates costs less than three sliced
+            # ones; the candidate gate uses tanh of ``z`` instead
+            gates = _sigmoid(z)
+            c = gates[:, units : 2 * units] * c + gates[:, :units] * np.tanh(z[:, 2 * units : 3 * units])
+            h_in = gates[:, 3 * units :] * np.tanh(c)
+            new_state[:, offset : offset + units] = h_in
+            new_state[:, offset + units : offset + 2 * units] = c
+            offset += 2 * units
+        return h_in, new_state
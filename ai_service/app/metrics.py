@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from prometheus_client import Histogram, Counter, start_http_server
+from prometheus_client import Histogram, Counter, Gauge, start_http_server
 
 # Metrics definitions
 DB_LATENCY_SECONDS = Histogram(
@@ -21,6 +21,81 @@ FAILED_TX_TOTAL = Counter(
     ["stage"],
 )
 
+PIPELINE_STAGE_QUEUE_DEPTH = Gauge(
+    "pipeline_stage_queue_depth",
+    "Events waiting in a pipeline stage queue",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent processing an event in a pipeline stage",
+    ["stage"],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
+)
+SCORING_LATENCY_SECONDS = Histogram(
+    "scoring_latency_seconds",
+    "Time taken for scoring",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1],
+)
+INFERENCE_QUEUE_SIZE = Gauge("inference_queue_size", "Inference queue size")
+SCORING_EXECUTOR_QUEUE_SECONDS = Histogram(
+    "scoring_executor_queue_seconds",
+    "Time an inference call waited for an executor worker",
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1],
+)
+SCORING_COMPUTE_SECONDS = Histogram(
+    "scoring_compute_seconds",
+    "Time spent in model inference per call",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5],
+)
+HISTORY_USERS = Gauge("scoring_history_users", "Users with a feature history in the scoring engine")
+HISTORY_BYTES = Gauge(
+    "scoring_history_bytes",
+    "Memory of the scoring history store (allocated block vs. occupied slots)",
+    ["kind"],
+)
+HISTORY_EVICTIONS = Counter(
+    "scoring_history_evictions_total",
+    "Users dropped from the scoring history store",
+    ["reason"],
+)
+SCORING_BATCH_SIZE = Histogram(
+    "scoring_batch_size",
+    "Events scored per batch by the scoring engine",
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512],
+)
+SCORING_BATCH_WAIT_SECONDS = Histogram(
+    "scoring_batch_wait_seconds",
+    "Time the scoring batcher waited for a batch to fill",
+    buckets=[0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.05],
+)
+SCORING_SHARD_QUEUE_SIZE = Gauge(
+    "scoring_shard_queue_size",
+    "Events waiting for a scoring shard worker",
+    ["shard"],
+)
+SCORING_SHARD_LATENCY_SECONDS = Histogram(
+    "scoring_shard_latency_seconds",
+    "Round trip of a batch to a scoring shard worker",
+    ["shard"],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5],
+)
+SCORING_SHARD_USERS = Gauge(
+    "scoring_shard_users",
+    "Users with a feature history in a scoring shard worker",
+    ["shard"],
+)
+SCORING_SHARD_RESTARTS = Counter(
+    "scoring_shard_restarts_total",
+    "Scoring shard workers started again after dying",
+    ["shard"],
+)
+SCORING_SHARD_MOVED_USERS = Counter(
+    "scoring_shard_moved_users_total",
+    "Users whose history moved to another shard on a rebalance",
+)
+
 
 def start_metrics_server(port: int = 9103) -> None:
     """Start Prometheus metrics HTTP server."""
@@ -1,7 +1,14 @@
 """Data Normalizer
 ------------------
 
-Utility for converting raw event dictionaries into ``NormalizedEvent`` models.
+Utility for converting raw event dictionaries into :class:`CompactEvent`
+records, the slotted event type passed from normalization through scoring,
+labeling and emission. The pydantic :class:`NormalizedEvent` model, and the
+schema it defines, is only built on demand via :meth:`CompactEvent.model`.
+
+Producers that name fields differently (``srcip``, ``@timestamp``, ...) are
+handled by per-source mappings in ``SOURCE_SPECS``, selected by the
+event's ``source`` field or a ``source`` message header.
 
 Examples
 --------
@@ -14,19 +21,38 @@ True
 '10.0.0.5'
 >>> ev.is_internal
 True
+
+Many events at once are normalized into columns, with failures reported
+per row instead of raised:
+
+>>> batch = Normalizer.normalize_batch([raw, {"src_ip": "bad", "timestamp": 0}])
+>>> batch.errors.tolist()
+[False, True]
+>>> batch.event(0).src_ip
+'10.0.0.5'
 """
 
 from __future__ import annotations
 
 import datetime as _dt
 import ipaddress
-from typing import Any, Dict, Optional
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 from dateutil import parser as dt_parser
-from pydantic import BaseModel, Field
-import structlog
+import numpy as np
+from pydantic import BaseModel, Field, GetCoreSchemaHandler
+from pydantic_core import core_schema
 import ulid
 
+from .ipnet import ParsedIP, parse_ip
+from .log_config import get_logger
+
+logger = get_logger(service="normalizer", stage="normalize")
+
 
 class NormalizationError(ValueError):
     """Raised when raw data cannot be normalized."""
@@ -47,8 +73,295 @@ class NormalizedEvent(BaseModel):
     raw_extra: Dict[str, Any] = Field(default_factory=dict)
 
 
+_EPOCH = _dt.datetime(1970, 1, 1, tzinfo=_dt.timezone.utc)
+_KNOWN_FIELDS = frozenset(
+    ("id", "src_ip", "dst_ip", "timestamp", "bytes", "user_id", "method", "endpoint")
+)
+_LOW64 = (1 << 64) - 1
+# range of the int64 nanosecond timestamp column of NormalizedBatch
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+# ---------------------------------------------------------------- timestamps
+# Epoch values are told apart by magnitude: seconds up to 1e11 (year 5138),
+# milliseconds up to 1e14, microseconds above.
+_MS_THRESHOLD = 1e11
+_US_THRESHOLD = 1e14
+# RFC 3339 (and its offset-less variant). Within this shape
+# ``datetime.fromisoformat`` agrees with ``dateutil.parser.isoparse``.
+_is_rfc3339 = re.compile(
+    r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?"
+).fullmatch
+_UTC = _dt.timezone.utc
+_fromtimestamp = _dt.datetime.fromtimestamp
+_fromisoformat = _dt.datetime.fromisoformat
+
+
+def _epoch_ns(ts: int) -> int:
+    if ts > _US_THRESHOLD:
+        return ts * 1_000
+    if ts > _MS_THRESHOLD:
+        return ts * 1_000_000
+    return ts * 1_000_000_000
+
+
+def _from_epoch(value: Any) -> Optional[_dt.datetime]:
+    kind = type(value)
+    if kind is str:
+        if not value.isdigit():
+            return None
+        value, kind = int(value), int
+    if kind is int or kind is bool:
+        if value > _US_THRESHOLD:
+            # a float would lose the last microsecond digit
+            return _EPOCH + _dt.timedelta(0, value // 1_000_000, value % 1_000_000)
+        if value > _MS_THRESHOLD:
+            return _fromtimestamp(value / 1000.0, _UTC)
+        return _fromtimestamp(value, _UTC)
+    if isinstance(value, (int, float)):
+        value = float(value)
+        if value > _US_THRESHOLD:
+            value /= 1_000_000.0
+        elif value > _MS_THRESHOLD:
+            value /= 1000.0
+        return _fromtimestamp(value, _UTC)
+    return None
+
+
+def _to_utc(dt: _dt.datetime) -> _dt.datetime:
+    tz = dt.tzinfo
+    if tz is None:
+        return dt.replace(tzinfo=_UTC)
+    if tz is _UTC:
+        return dt
+    return dt.astimezone(_UTC)
+
+
+def _from_rfc3339(value: Any) -> Optional[_dt.datetime]:
+    if type(value) is not str or not _is_rfc3339(value):
+        return None
+    try:
+        return _to_utc(_fromisoformat(value))
+    except ValueError:
+        # e.g. hour 24, which isoparse accepts
+        return None
+
+
+def _from_dateutil(value: Any) -> _dt.datetime:
+    return _to_utc(dt_parser.isoparse(str(value)))
+
+
+# detection order; dateutil raises for anything it cannot parse
+_TS_PARSERS: Dict[str, Callable[[Any], Optional[_dt.datetime]]] = {
+    "epoch": _from_epoch,
+    "rfc3339": _from_rfc3339,
+    "dateutil": _from_dateutil,
+}
+# The fast formats never both match a value, so trying the cached one first
+# gives the same result as detection. dateutil accepts more than it should be
+# trusted with and always stays last.
+_TS_CACHEABLE = frozenset(("epoch", "rfc3339"))
+# format last detected per registered source mapping. ``source`` comes from
+# the event, so unregistered values share the default entry rather than
+# growing the cache; the cap guards against many registered sources.
+_TS_FORMATS: Dict[str, str] = {}
+_TS_FORMATS_MAX = 1024
+
+
+def _ts_format_key(source: Any) -> str:
+    return source if isinstance(source, str) and source in _MAPPINGS else "default"
+
+
+@dataclass
+class NormalizedBatch:
+    """Columnar form of many normalized events.
+
+    IP addresses are stored as 128-bit integers split into ``(n, 2)`` uint64
+    ``[high, low]`` words (IPv4 lives in the low word) plus their version,
+    ``0`` meaning absent. Timestamps are epoch nanoseconds. Rows flagged in
+    ``errors`` hold zeros and their reason is in ``error_messages``.
+    """
+
+    id: List[str]
+    src_ip: np.ndarray
+    src_version: np.ndarray
+    dst_ip: np.ndarray
+    dst_version: np.ndarray
+    is_internal: np.ndarray
+    timestamp: np.ndarray
+    bytes: np.ndarray
+    has_bytes: np.ndarray
+    user_id: List[Optional[str]]
+    method: List[Optional[str]]
+    endpoint: List[Optional[str]]
+    raw_extra: List[Dict[str, Any]]
+    errors: np.ndarray
+    error_messages: List[Optional[str]]
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @staticmethod
+    def _ip(words: np.ndarray, version: int) -> Optional[str]:
+        if not version:
+            return None
+        value = (int(words[0]) << 64) | int(words[1])
+        return str(ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value))
+
+    def event(self, i: int) -> CompactEvent:
+        """Materialize row ``i`` as a :class:`CompactEvent`."""
+        if self.errors[i]:
+            raise NormalizationError(self.error_messages[i])
+        ns = int(self.timestamp[i])
+        return CompactEvent(
+            id=self.id[i],
+            src_ip=self._ip(self.src_ip[i], int(self.src_version[i])),
+            dst_ip=self._ip(self.dst_ip[i], int(self.dst_version[i])),
+            is_internal=bool(self.is_internal[i]),
+            user_id=self.user_id[i],
+            timestamp=_EPOCH + _dt.timedelta(microseconds=ns // 1000),
+            method=self.method[i],
+            endpoint=self.endpoint[i],
+            bytes=int(self.bytes[i]) if self.has_bytes[i] else None,
+            raw_extra=self.raw_extra[i],
+        )
+
+    def events(self) -> List[Optional[CompactEvent]]:
+        """Materialize every row; failed rows are ``None``."""
+        return [None if self.errors[i] else self.event(i) for i in range(len(self))]
+
+
+_EVENT_FIELDS = tuple(NormalizedEvent.model_fields)
+
+
+class CompactEvent:
+    """Slotted, validated event with the fields of :class:`NormalizedEvent`.
+
+    Nothing is copied from the raw dict until ``raw_extra`` is read, and the
+    pydantic model is only built by :meth:`model`. As a pydantic field type
+    it validates like :class:`NormalizedEvent` (instances pass through
+    unchanged), has its JSON schema and dumps to JSON through
+    :meth:`as_dict`.
+    """
+
+    __slots__ = (
+        "id",
+        "src_ip",
+        "dst_ip",
+        "is_internal",
+        "user_id",
+        "timestamp",
+        "method",
+        "endpoint",
+        "bytes",
+        "_extra",
+        "_raw",
+        "_known",
+        "_model",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        src_ip: str,
+        dst_ip: Optional[str],
+        is_internal: bool,
+        user_id: Optional[str],
+        timestamp: _dt.datetime,
+        method: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        bytes: Optional[int] = None,
+        raw_extra: Optional[Dict[str, Any]] = None,
+        *,
+        raw: Optional[Dict[str, Any]] = None,
+        known: frozenset = _KNOWN_FIELDS,
+    ) -> None:
+        self.id = id
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.is_internal = is_internal
+        self.user_id = user_id
+        self.timestamp = timestamp
+        self.method = method
+        self.endpoint = endpoint
+        self.bytes = bytes
+        # either given, or derived from ``raw`` on first access
+        self._extra = raw_extra
+        self._raw = raw
+        # fields of ``raw`` that were mapped and are not extra
+        self._known = known
+        self._model: Optional[NormalizedEvent] = None
+
+    @property
+    def raw_extra(self) -> Dict[str, Any]:
+        if self._extra is None:
+            raw = self._raw or {}
+            known = self._known
+            self._extra = {k: v for k, v in raw.items() if k not in known}
+            self._raw = None
+        return self._extra
+
+    @classmethod
+    def from_model(cls, model: NormalizedEvent) -> "CompactEvent":
+        event = cls(**{name: getattr(model, name) for name in _EVENT_FIELDS})
+        event._model = model
+        return event
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        validated = core_schema.no_info_after_validator_function(
+            cls.from_model, handler.generate_schema(NormalizedEvent)
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=validated,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), validated]),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+        )
+
+    @staticmethod
+    def _serialize(event: "CompactEvent", info: core_schema.SerializationInfo) -> Dict[str, Any]:
+        return event.as_dict() if info.mode_is_json() else event.model().model_dump()
+
+    def model(self) -> NormalizedEvent:
+        """Return the equivalent pydantic model, built once without re-validation."""
+        if self._model is None:
+            self._model = NormalizedEvent.model_construct(
+                **{name: getattr(self, name) for name in _EVENT_FIELDS}
+            )
+        return self._model
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Same result as ``model().model_dump(mode="json")``, without the model."""
+        ts = self.timestamp.isoformat()
+        if ts.endswith("+00:00"):
+            ts = ts[:-6] + "Z"
+        return {
+            "id": self.id,
+            "src_ip": self.src_ip,
+            "dst_ip": self.dst_ip,
+            "is_internal": self.is_internal,
+            "user_id": self.user_id,
+            "timestamp": ts,
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "bytes": self.bytes,
+            "raw_extra": self.raw_extra,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactEvent):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in _EVENT_FIELDS)
+
+    __hash__ = None  # mutable, like the model
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _EVENT_FIELDS)
+        return f"CompactEvent({fields})"
+
+
 class Normalizer:
-    """Convert raw dictionaries to :class:`NormalizedEvent`."""
+    """Convert raw dictionaries to :class:`CompactEvent`."""
 
     @staticmethod
     def schema() -> Dict[str, Any]:
@@ -56,40 +369,71 @@ class Normalizer:
         return NormalizedEvent.model_json_schema()
 
     @staticmethod
-    def _parse_timestamp(value: Any) -> _dt.datetime:
+    def _parse_timestamp(value: Any, source: Any = None) -> _dt.datetime:
+        """Parse ``value`` into an aware UTC datetime.
+
+        The format that last worked for ``source`` is tried first, so a
+        stream of uniform events skips detection.
+        """
         if value is None:
             raise NormalizationError("timestamp required")
         try:
-            if isinstance(value, (int, float)):
-                ts = float(value)
-                if ts > 1e11:
-                    ts /= 1000.0
-                return _dt.datetime.fromtimestamp(ts, tz=_dt.timezone.utc)
-            if isinstance(value, str) and value.isdigit():
-                ts = int(value)
-                if ts > 1e11:
-                    ts /= 1000.0
-                return _dt.datetime.fromtimestamp(ts, tz=_dt.timezone.utc)
-            dt = dt_parser.isoparse(str(value))
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=_dt.timezone.utc)
-            else:
-                dt = dt.astimezone(_dt.timezone.utc)
-            return dt
-        except Exception as e:  # pragma: no cover - error path
+            key = _ts_format_key(source)
+            cached = _TS_FORMATS.get(key)
+            if cached is not None:
+                dt = _TS_PARSERS[cached](value)
+                if dt is not None:
+                    return dt
+            for name, parse in _TS_PARSERS.items():
+                if name == cached:
+                    continue
+                dt = parse(value)
+                if dt is not None:
+                    if name in _TS_CACHEABLE:
+                        if key not in _TS_FORMATS and len(_TS_FORMATS) >= _TS_FORMATS_MAX:
+                            _TS_FORMATS.clear()
+                        _TS_FORMATS[key] = name
+                    return dt
+        except Exception as e:
             raise NormalizationError("invalid timestamp") from e
+        raise NormalizationError("invalid timestamp")  # pragma: no cover - dateutil raises first
 
     @staticmethod
-    def _parse_ip(value: Any, field: str) -> str:
+    def _parse_timestamp_ns(value: Any, source: Any = None) -> int:
+        """Like :meth:`_parse_timestamp` but returns epoch nanoseconds.
+
+        Raises :class:`NormalizationError` for times an int64 nanosecond
+        column cannot hold (before 1677 or after 2262).
+        """
+        if isinstance(value, int) and not isinstance(value, bool):
+            ns = _epoch_ns(value)
+        elif isinstance(value, str) and value.isdigit():
+            ns = _epoch_ns(int(value))
+        else:
+            dt = Normalizer._parse_timestamp(value, source)
+            ns = (dt - _EPOCH) // _dt.timedelta(microseconds=1) * 1000
+        if not _INT64_MIN <= ns <= _INT64_MAX:
+            raise NormalizationError("timestamp out of range")
+        return ns
+
+    @staticmethod
+    def _parse_ip(value: Any, field: str) -> Optional[ParsedIP]:
         if value in (None, ""):
             if field == "src_ip":
                 raise NormalizationError("src_ip required")
             return None
         try:
-            return str(ipaddress.ip_address(str(value)))
+            return parse_ip(str(value))
         except Exception as e:
             raise NormalizationError(f"invalid {field}") from e
 
+    @staticmethod
+    def _parse_str(value: Any, field: str) -> Optional[str]:
+        # the checks NormalizedEvent validation used to apply
+        if value is None or isinstance(value, str):
+            return value
+        raise NormalizationError(f"invalid {field}")
+
     @staticmethod
     def _parse_bytes(value: Any) -> Optional[int]:
         if value in (None, ""):
@@ -101,34 +445,182 @@ class Normalizer:
         raise NormalizationError("invalid bytes")
 
     @staticmethod
-    def normalize(raw: Dict[str, Any]) -> NormalizedEvent:
-        if not isinstance(raw, dict):
-            raise NormalizationError("raw must be a dict")
-
-        data = dict(raw)
-        raw_id = str(data.pop("id", "")).strip()
-        event_id = raw_id or str(ulid.new())
+    def normalize_batch(raws: Sequence[Dict[str, Any]], source: Optional[str] = None) -> NormalizedBatch:
+        """Normalize ``raws`` into a :class:`NormalizedBatch`.
 
-        logger = structlog.get_logger().bind(event_id=event_id, stage="normalize")
+        ``source`` selects the field mapping for every row; by default each
+        row's own ``source`` field does.
 
-        src_ip = Normalizer._parse_ip(data.pop("src_ip", None), "src_ip")
-        dst_ip = Normalizer._parse_ip(data.pop("dst_ip", None), "dst_ip")
-        timestamp = Normalizer._parse_timestamp(data.pop("timestamp", None))
-        bytes_val = Normalizer._parse_bytes(data.pop("bytes", None))
+        Produces the same values as :meth:`normalize` row by row, but builds
+        no models, binds no per-event logger and parses each IP once. A row
+        that fails sets its ``errors`` flag instead of raising.
+        """
+        n = len(raws)
+        src_ip = np.zeros((n, 2), dtype=np.uint64)
+        src_version = np.zeros(n, dtype=np.uint8)
+        dst_ip = np.zeros((n, 2), dtype=np.uint64)
+        dst_version = np.zeros(n, dtype=np.uint8)
+        is_internal = np.zeros(n, dtype=bool)
+        timestamp = np.zeros(n, dtype=np.int64)
+        bytes_col = np.zeros(n, dtype=np.int64)
+        has_bytes = np.zeros(n, dtype=bool)
+        errors = np.zeros(n, dtype=bool)
+        ids: List[str] = [""] * n
+        user_id: List[Optional[str]] = [None] * n
+        method: List[Optional[str]] = [None] * n
+        endpoint: List[Optional[str]] = [None] * n
+        raw_extra: List[Dict[str, Any]] = [{} for _ in range(n)]
+        error_messages: List[Optional[str]] = [None] * n
 
-        is_internal = ipaddress.ip_address(src_ip).is_private
+        for i, raw in enumerate(raws):
+            try:
+                if not isinstance(raw, dict):
+                    raise NormalizationError("raw must be a dict")
+                name = source if source is not None else raw.get("source")
+                m = mapping_for(name)
+                src = Normalizer._parse_ip(raw.get(m.src_ip), "src_ip")
+                dst = Normalizer._parse_ip(raw.get(m.dst_ip), "dst_ip")
+                ts = Normalizer._parse_timestamp_ns(raw.get(m.timestamp), name)
+                nbytes = Normalizer._parse_bytes(raw.get(m.bytes))
+                user = Normalizer._parse_str(raw.get(m.user_id), "user_id")
+                meth = Normalizer._parse_str(raw.get(m.method), "method")
+                endp = Normalizer._parse_str(raw.get(m.endpoint), "endpoint")
+            except NormalizationError as e:
+                errors[i] = True
+                error_messages[i] = str(e)
+                continue
+            src_ip[i] = (src.value >> 64, src.value & _LOW64)
+            src_version[i] = src.version
+            is_internal[i] = src.internal
+            if dst is not None:
+                dst_ip[i] = (dst.value >> 64, dst.value & _LOW64)
+                dst_version[i] = dst.version
+            timestamp[i] = ts
+            if nbytes is not None:
+                bytes_col[i] = nbytes
+                has_bytes[i] = True
+            ids[i] = str(raw.get(m.id, "")).strip() or str(ulid.new())
+            user_id[i], method[i], endpoint[i] = user, meth, endp
+            raw_extra[i] = {k: v for k, v in raw.items() if k not in m.known}
 
-        event = NormalizedEvent(
-            id=event_id,
+        if errors.any():
+            logger.warning(
+                "normalize_batch_errors", rows=n, failed=int(errors.sum())
+            )
+        return NormalizedBatch(
+            id=ids,
             src_ip=src_ip,
+            src_version=src_version,
             dst_ip=dst_ip,
+            dst_version=dst_version,
             is_internal=is_internal,
-            user_id=data.pop("user_id", None),
             timestamp=timestamp,
-            method=data.pop("method", None),
-            endpoint=data.pop("endpoint", None),
-            bytes=bytes_val,
-            raw_extra=data,
+            bytes=bytes_col,
+            has_bytes=has_bytes,
+            user_id=user_id,
+            method=method,
+            endpoint=endpoint,
+            raw_extra=raw_extra,
+            errors=errors,
+            error_messages=error_messages,
         )
-        logger.info("normalized")
-        return event
+
+    @staticmethod
+    def normalize(raw: Dict[str, Any], source: Optional[str] = None) -> CompactEvent:
+        """Normalize one event with the field mapping of its source.
+
+        ``source`` (e.g. from a message header) wins over the event's own
+        ``source`` field; unknown sources use the canonical field names.
+        """
+        if not isinstance(raw, dict):
+            raise NormalizationError("raw must be a dict")
+        name = source if source is not None else raw.get("source")
+        return mapping_for(name).normalize(raw, name)
+
+
+# ---------------------------------------------------------------- sources
+# Per-source field names: canonical field -> name used by that producer.
+# Fields not listed keep their canonical name. Extend or override with
+# ``SOURCE_MAPPINGS`` (JSON object of the same shape) or register_source().
+SOURCE_SPECS: Dict[str, Dict[str, str]] = {
+    "default": {},
+    "firewall": {"src_ip": "srcip", "dst_ip": "dstip", "timestamp": "ts"},
+    "proxy": {"src_ip": "client_ip", "timestamp": "@timestamp", "bytes": "bytes_out"},
+}
+
+
+class SourceMapping:
+    """A source spec compiled into fixed lookup keys and a normalize function."""
+
+    __slots__ = (*_KNOWN_FIELDS, "name", "known", "normalize")
+
+    def __init__(self, name: str, spec: Dict[str, str]) -> None:
+        unknown = set(spec) - _KNOWN_FIELDS
+        if unknown:
+            raise ValueError(f"source {name!r} maps unknown fields: {sorted(unknown)}")
+        self.name = name
+        for canonical in _KNOWN_FIELDS:
+            setattr(self, canonical, spec.get(canonical, canonical))
+        self.known = frozenset(getattr(self, canonical) for canonical in _KNOWN_FIELDS)
+        self.normalize = self._compile()
+
+    def _compile(self) -> Callable[[Dict[str, Any], Any], CompactEvent]:
+        # keys are bound as closure constants: one dict lookup per field
+        k_id, k_src, k_dst, k_ts = self.id, self.src_ip, self.dst_ip, self.timestamp
+        k_bytes, k_user, k_method, k_endpoint = self.bytes, self.user_id, self.method, self.endpoint
+        known = self.known
+        parse_ip_, parse_str = Normalizer._parse_ip, Normalizer._parse_str
+        parse_ts, parse_bytes = Normalizer._parse_timestamp, Normalizer._parse_bytes
+
+        def normalize(raw: Dict[str, Any], source: Any) -> CompactEvent:
+            event_id = str(raw.get(k_id, "")).strip() or str(ulid.new())
+            src = parse_ip_(raw.get(k_src), "src_ip")
+            dst = parse_ip_(raw.get(k_dst), "dst_ip")
+            event = CompactEvent(
+                event_id,
+                src.text,
+                dst.text if dst is not None else None,
+                src.internal,
+                parse_str(raw.get(k_user), "user_id"),
+                parse_ts(raw.get(k_ts), source),
+                parse_str(raw.get(k_method), "method"),
+                parse_str(raw.get(k_endpoint), "endpoint"),
+                parse_bytes(raw.get(k_bytes)),
+                raw=raw,
+                known=known,
+            )
+            logger.info("normalized", event_id=event_id)
+            return event
+
+        return normalize
+
+
+_MAPPINGS: Dict[str, SourceMapping] = {}
+
+
+def register_source(name: str, spec: Dict[str, str]) -> None:
+    """Compile ``spec`` and use it for events of source ``name``."""
+    _MAPPINGS[name] = SourceMapping(name, spec)
+
+
+def mapping_for(source: Any) -> SourceMapping:
+    mapping = _MAPPINGS.get(source) if isinstance(source, str) else None
+    return mapping or _MAPPINGS["default"]
+
+
+def _load_specs() -> Dict[str, Dict[str, str]]:
+    specs = dict(SOURCE_SPECS)
+    extra = os.getenv("SOURCE_MAPPINGS")
+    if extra:
+        try:
+            loaded = json.loads(extra)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"SOURCE_MAPPINGS is not valid JSON: {e}") from None
+        if not isinstance(loaded, dict) or not all(isinstance(spec, dict) for spec in loaded.values()):
+            raise ValueError("SOURCE_MAPPINGS must be a JSON object mapping source names to field mappings")
+        specs.update(loaded)
+    return specs
+
+
+for _name, _spec in _load_specs().items():
+    register_source(_name, _spec)
@@ -2,19 +2,32 @@ from __future__ import annotations
 
 import asyncio
 import json
+import multiprocessing
 import time
-from collections import defaultdict, deque
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Deque, Dict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 
 import joblib
 import numpy as np
-from prometheus_client import Histogram, Gauge, start_http_server
-import structlog
-import tensorflow as tf
+from prometheus_client import start_http_server
 
-from .normalize import NormalizedEvent
+from .features import vectorize
+from .history import HistoryStore
+from .iforest import CompiledForest
+from .log_config import get_logger
+from .lstm_backends import LSTMBackend, adjust_stats, load_backend, report_file
+from .metrics import (
+    INFERENCE_QUEUE_SIZE,
+    SCORING_BATCH_SIZE,
+    SCORING_BATCH_WAIT_SECONDS,
+    SCORING_COMPUTE_SECONDS,
+    SCORING_EXECUTOR_QUEUE_SECONDS,
+    SCORING_LATENCY_SECONDS,
+)
+from .normalize import CompactEvent
 
 
 @dataclass
@@ -24,106 +37,502 @@ class ScoreResult:
     aggregate: float
 
 
-# configure logging
-structlog.configure(processors=[structlog.processors.JSONRenderer()])
-logger = structlog.get_logger().bind(service="scoring-engine")
+logger = get_logger(service="scoring-engine")
+
+
+# ------------------------------ inference ------------------------------
+# Model calls run in an executor so they do not block the event loop. The
+# functions below are module level so a process pool can pickle them.
+LSTM_MODES = ("incremental", "windowed")
+
+
+def _load_models(
+    model_dir: str, backend: str, precision: str = "float32"
+) -> Tuple[Any, CompiledForest, LSTMBackend]:
+    model_if = joblib.load(Path(model_dir) / "isolation_forest.joblib")
+    # scores through flat arrays instead of sklearn's per-call validation
+    forest = CompiledForest.from_sklearn(model_if)
+    return model_if, forest, load_backend(backend, model_dir, precision)
+
+
+def _infer(
+    forest: CompiledForest, lstm: LSTMBackend, vecs: np.ndarray, batches: List[np.ndarray]
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """IsolationForest scores for ``vecs`` and the per-sequence LSTM
+    reconstruction error for each ``(b, length, 32)`` batch."""
+    scores_if = forest.score_samples(vecs)
+    errors = []
+    for batch in batches:
+        recon = lstm.reconstruct(batch)
+        errors.append(np.mean(np.square(batch - recon), axis=(1, 2)))
+    return scores_if, errors
+
+
+def _infer_incremental(
+    forest: CompiledForest,
+    lstm: LSTMBackend,
+    vecs: np.ndarray,
+    waves: List[Tuple[np.ndarray, np.ndarray]],
+    states: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """IsolationForest scores for ``vecs`` and the reconstruction error of
+    one LSTM step per row.
+
+    Each wave is ``(rows, keys)``: rows of ``vecs`` stepped together from
+    the state rows ``keys``. Waves run in order, so a user with several
+    events in the batch advances once per wave. Returns the new states.
+    """
+    scores_if = forest.score_samples(vecs)
+    errors = np.zeros(len(vecs), dtype=np.float64)
+    for rows, keys in waves:
+        x = vecs[rows]
+        y, states[keys] = lstm.step(x, states[keys])
+        errors[rows] = np.mean(np.square(x - y), axis=1)
+    return scores_if, errors, states
+
+
+_worker_models: Optional[Tuple[CompiledForest, LSTMBackend]] = None
+
+
+def _init_worker(model_dir: str, backend: str, precision: str) -> None:
+    global _worker_models
+    _, forest, lstm = _load_models(model_dir, backend, precision)
+    _worker_models = (forest, lstm)
+
+
+def _infer_in_worker(mode: str, *args: Any) -> Any:
+    forest, lstm = _worker_models
+    if mode == "incremental":
+        return _infer_incremental(forest, lstm, *args)
+    return _infer(forest, lstm, *args)
+
+
+def _timed(fn: Any, *args: Any) -> Tuple[Any, float, float]:
+    # time.monotonic is system wide, so worker processes can use it too
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+async def collect_batch(queue: asyncio.Queue, max_batch_size: int, max_wait: float) -> Tuple[List[Any], float]:
+    """Wait for one item, then collect up to ``max_batch_size`` items or
+    until ``max_wait`` seconds have passed.
+
+    Returns the batch and the seconds spent collecting after the first item
+    arrived.
+    """
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    first = loop.time()
+    deadline = first + max_wait
+    while len(batch) < max_batch_size:
+        if queue.empty():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        else:
+            batch.append(queue.get_nowait())
+    return batch, loop.time() - first
 
 
 class ScoringEngine:
-    """Compute anomaly scores for events."""
+    """Compute anomaly scores for events.
 
-    def __init__(self, model_dir: str = "models") -> None:
-        self.model_if = joblib.load(Path(model_dir) / "isolation_forest.joblib")
-        self.model_lstm = tf.saved_model.load(str(Path(model_dir) / "lstm_encoder"))
+    Inference runs in a ``"thread"`` or ``"process"`` executor with
+    ``workers`` workers. Process workers load their own copy of the models.
+    The batcher (:meth:`run`) scores up to ``workers`` batches at once.
+    Only ``"windowed"`` mode overlaps them: incremental batches read and
+    write the users' recurrent state, so they run one at a time; shard
+    users over processes (:mod:`.sharding`) to score those in parallel.
+
+    ``lstm_mode="windowed"`` (the default) re-runs the model over the
+    user's last 50 events per event. ``"incremental"`` keeps each user's
+    recurrent state and runs one LSTM step per event; the score is the mean
+    one-step reconstruction error over the last 50 events. Both agree until
+    a user's window fills; after that the incremental state also remembers
+    older events, so its scores drift from the windowed ones by a few
+    percent.
+
+    ``lstm_backend`` picks the LSTM runtime, see :mod:`.lstm_backends`;
+    ``lstm_precision`` a quantized TFLite variant, whose calibration report
+    adjusts the LSTM normalization stats.
+
+    ``models`` takes the models already loaded by ``_load_models``, so
+    forked shard workers (see :mod:`.sharding`) share the parent's copy.
+    ``metrics_port=None`` skips the Prometheus HTTP server.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = "models",
+        max_batch_size: int = 256,
+        max_wait_ms: float = 2.0,
+        executor: str = "thread",
+        workers: int = 1,
+        history_capacity: int = 20000,
+        history_ttl: Optional[float] = 3600.0,
+        lstm_mode: str = "windowed",
+        lstm_backend: str = "tf",
+        lstm_precision: str = "float32",
+        models: Optional[Tuple[Any, CompiledForest, LSTMBackend]] = None,
+        metrics_port: Optional[int] = 9101,
+    ) -> None:
+        if executor not in ("thread", "process"):
+            raise ValueError(f"unknown executor {executor!r}")
+        if lstm_mode not in LSTM_MODES:
+            raise ValueError(f"unknown LSTM mode {lstm_mode!r}")
+        self.model_dir = model_dir
+        self.lstm_backend = lstm_backend
+        self.lstm_precision = lstm_precision
+        if models is None:
+            models = _load_models(model_dir, lstm_backend, lstm_precision)
+        self.model_if, self.forest, self.lstm = models
         with open(Path(model_dir) / "if_stats.json", "r") as f:
             self.stats = json.load(f)
-        self.history: Dict[str, Deque[np.ndarray]] = defaultdict(lambda: deque(maxlen=50))
+        if lstm_precision != "float32":
+            with open(Path(model_dir) / report_file(lstm_precision), "r") as f:
+                self.stats = adjust_stats(self.stats, json.load(f))
+        self.history = HistoryStore(capacity=history_capacity, window=50, features=32, ttl=history_ttl)
+        # incremental mode: recurrent state and a ring of one-step errors per history slot
+        self.lstm_mode = lstm_mode
+        self._state = self.lstm.initial_state(history_capacity)
+        self._errors = np.zeros((history_capacity, self.history.window), dtype=np.float64)
+        self._steps = np.zeros(history_capacity, dtype=np.int64)
         self._lock = asyncio.Lock()
+        # dynamic batcher: see ``run`` and ``submit``
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._runner: asyncio.Task | None = None
+        self.executor_kind = executor
+        self.workers = workers
+        self._executor: Executor | None = None
 
-        self.latency_hist = Histogram(
-            "scoring_latency_seconds",
-            "Time taken for scoring",
-            buckets=[0.001, 0.005, 0.01, 0.05, 0.1],
-        )
-        self.queue_gauge = Gauge("inference_queue_size", "Inference queue size")
+        self.latency_hist = SCORING_LATENCY_SECONDS
+        self.queue_gauge = INFERENCE_QUEUE_SIZE
         # Expose metrics
-        try:
-            start_http_server(9101)
-        except Exception:
-            pass
-
-    # -------------------------- feature extraction --------------------------
-    def _event_to_vector(self, event: NormalizedEvent) -> np.ndarray:
-        """Convert event into a 32-element feature vector."""
-        import ipaddress
-
-        src = int(ipaddress.ip_address(event.src_ip)) % 65535 / 65535
-        dst = (
-            int(ipaddress.ip_address(event.dst_ip)) % 65535 / 65535
-            if event.dst_ip
-            else 0.0
-        )
-        is_int = 1.0 if event.is_internal else 0.0
-        user_len = float(len(event.user_id)) if event.user_id else 0.0
-        ts = event.timestamp.timestamp() % 1e6 / 1e6
-        method = (hash(event.method) % 1000) / 1000 if event.method else 0.0
-        endpoint = (hash(event.endpoint) % 1000) / 1000 if event.endpoint else 0.0
-        bytes_v = (event.bytes or 0) % 1e6 / 1e6
-
-        base = np.array(
-            [src, dst, is_int, user_len, ts, method, endpoint, bytes_v], dtype=np.float32
-        )
-        vec = np.tile(base, 4)  # 8 * 4 = 32 features
-        return vec.astype(np.float32)
+        if metrics_port is not None:
+            try:
+                start_http_server(metrics_port)
+            except Exception:
+                pass
 
     # ----------------------------- core scoring -----------------------------
-    async def score(self, event: NormalizedEvent) -> ScoreResult:
-        start = time.perf_counter()
-        vec = self._event_to_vector(event)
-        score_if = float(self.model_if.score_samples([vec])[0])
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # TensorFlow is not fork safe once initialised
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_dir, self.lstm_backend, self.lstm_precision),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
 
-        if event.user_id is None:
-            score_lstm = 0.0
+    async def _run_inference(self, mode: str, *args: Any) -> Any:
+        if self.executor_kind == "process":
+            fn, args = _infer_in_worker, (mode, *args)
+        elif mode == "incremental":
+            fn, args = _infer_incremental, (self.forest, self.lstm, *args)
         else:
-            async with self._lock:
-                history = self.history[event.user_id]
-                history.append(vec)
-                seq = np.stack(history).astype(np.float32)
-            tensor = tf.constant(seq[np.newaxis])
-            output = self.model_lstm.signatures["serve"](tensor)
-            key = list(output.keys())[0]
-            recon = output[key].numpy()
-            score_lstm = float(np.mean(np.square(seq[np.newaxis] - recon)))
+            fn, args = _infer, (self.forest, self.lstm, *args)
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        result, started, finished = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        SCORING_EXECUTOR_QUEUE_SECONDS.observe(max(0.0, started - submitted))
+        SCORING_COMPUTE_SECONDS.observe(finished - started)
+        return result
 
+    def _aggregate(self, score_if: np.ndarray, score_lstm: np.ndarray) -> np.ndarray:
         stats = self.stats
         z_if = (score_if - stats["mu_if"]) / stats["sigma_if"]
         z_lstm = (score_lstm - stats["mu_lstm"]) / stats["sigma_lstm"]
-        agg_raw = max(z_if, z_lstm)
+        agg_raw = np.maximum(z_if, z_lstm)
         agg = (agg_raw - stats["min_raw"]) / (stats["max_raw"] - stats["min_raw"])
-        agg = float(min(1.0, max(0.0, agg)))
+        return np.clip(agg, 0.0, 1.0)
 
-        latency = time.perf_counter() - start
-        self.latency_hist.observe(latency)
+    async def score_batch(self, events: Sequence[CompactEvent]) -> List[ScoreResult]:
+        """Score ``events`` with one IsolationForest call and batched LSTM
+        calls.
 
-        logger.info(
-            "scored",
-            score_if=score_if,
-            score_lstm=score_lstm,
-            aggregate=agg,
-        )
-        return ScoreResult(score_if=score_if, score_lstm=score_lstm, aggregate=agg)
+        Histories are updated in order, so the results equal calling
+        :meth:`score` on each event in turn.
+        """
+        if not events:
+            return []
+        return await self.score_features([event.user_id for event in events], vectorize(events))
+
+    async def score_features(self, user_ids: Sequence[Optional[str]], vecs: np.ndarray) -> List[ScoreResult]:
+        """Score rows of an ``(n, 32)`` feature matrix from
+        :func:`.features.vectorize` for the given users, as :meth:`score_batch`."""
+        if not len(user_ids):
+            return []
+        start = time.perf_counter()
+        if self.lstm_mode == "incremental":
+            scores_if, scores_lstm = await self._score_incremental(user_ids, vecs)
+        else:
+            scores_if, scores_lstm = await self._score_windowed(user_ids, vecs)
+
+        aggregates = self._aggregate(scores_if, scores_lstm)
+        self.latency_hist.observe(time.perf_counter() - start)
+
+        results = []
+        for score_if, score_lstm, agg in zip(scores_if.tolist(), scores_lstm.tolist(), aggregates.tolist()):
+            logger.info("scored", score_if=score_if, score_lstm=score_lstm, aggregate=agg)
+            results.append(ScoreResult(score_if=score_if, score_lstm=score_lstm, aggregate=agg))
+        return results
+
+    async def _score_windowed(
+        self, user_ids: Sequence[Optional[str]], vecs: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """One LSTM call per distinct window length over full histories."""
+        # histories are updated and snapshotted in arrival order under the
+        # lock; inference then works on the snapshots outside it
+        seqs: List[Optional[np.ndarray]] = []
+        async with self._lock:
+            # seqs holds views into the store; the slot -> index map lets a
+            # view be copied before a later push (same user, or an eviction
+            # reusing the slot) overwrites it
+            held: Dict[int, int] = {}
+            for i, (user_id, vec) in enumerate(zip(user_ids, vecs)):
+                if user_id is None:
+                    seqs.append(None)
+                    continue
+                slot = self.history.slot(user_id)
+                j = held.pop(slot, None)
+                if j is not None:
+                    seqs[j] = seqs[j].copy()
+                self.history.push(slot, vec)
+                seqs.append(self.history.view(slot))
+                held[slot] = i
+
+            # the encoder has no masking, so padding would change the
+            # reconstruction; bucket by exact length instead (most users sit
+            # at the full window, so this is usually a single call)
+            buckets: Dict[int, List[int]] = defaultdict(list)
+            for i, seq in enumerate(seqs):
+                if seq is not None:
+                    buckets[len(seq)].append(i)
+            # stacking copies the views while the lock still holds them stable
+            batches = [np.stack([seqs[i] for i in rows]) for rows in buckets.values()]
+        scores_if, errors = await self._run_inference("windowed", vecs, batches)
+        scores_lstm = np.zeros(len(user_ids), dtype=np.float64)
+        for rows, error in zip(buckets.values(), errors):
+            scores_lstm[rows] = error
+        return scores_if, scores_lstm
+
+    async def _score_incremental(
+        self, user_ids: Sequence[Optional[str]], vecs: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """One LSTM step per event from each user's kept recurrent state."""
+        window = self.history.window
+        scores_lstm = np.zeros(len(user_ids), dtype=np.float64)
+        # states are read and written back around inference, so the lock is
+        # held throughout
+        async with self._lock:
+            # a "key" is one user's state within this batch; a slot evicted
+            # and reused mid-batch gets a new key
+            keys: List[int] = []
+            key_slots: List[int] = []
+            fresh: List[bool] = []
+            key_of: Dict[int, int] = {}
+            waves: List[Tuple[List[int], List[int]]] = []
+            steps_in_batch: List[int] = []
+            for i, (user_id, vec) in enumerate(zip(user_ids, vecs)):
+                if user_id is None:
+                    keys.append(-1)
+                    continue
+                slot = self.history.slot(user_id)
+                is_new = self.history.length(slot) == 0
+                self.history.push(slot, vec)
+                key = key_of.get(slot)
+                if key is None or is_new:
+                    key = key_of[slot] = len(key_slots)
+                    key_slots.append(slot)
+                    fresh.append(is_new)
+                    steps_in_batch.append(0)
+                wave = steps_in_batch[key]
+                steps_in_batch[key] += 1
+                if wave == len(waves):
+                    waves.append(([], []))
+                waves[wave][0].append(i)
+                waves[wave][1].append(key)
+                keys.append(key)
+            if not key_slots:
+                scores_if, _ = await self._run_inference("windowed", vecs, [])
+                return scores_if, scores_lstm
+
+            states = self._state[key_slots]
+            states[fresh] = 0.0
+            scores_if, step_errors, states = await self._run_inference(
+                "incremental", vecs, [(np.array(r), np.array(k)) for r, k in waves], states
+            )
+            # later keys for a reused slot overwrite earlier ones
+            self._state[key_slots] = states
+
+            started = [False] * len(key_slots)
+            for i, key in enumerate(keys):
+                if key < 0:
+                    continue
+                slot = key_slots[key]
+                if fresh[key] and not started[key]:
+                    self._steps[slot] = 0
+                started[key] = True
+                n = self._steps[slot]
+                self._errors[slot, n % window] = step_errors[i]
+                n += 1
+                self._steps[slot] = n
+                scores_lstm[i] = self._errors[slot, : min(n, window)].mean()
+        return scores_if, scores_lstm
+
+    async def score(self, event: CompactEvent) -> ScoreResult:
+        return (await self.score_batch([event]))[0]
+
+    # ------------------------------ migration ------------------------------
+    async def export_users(
+        self, predicate: Callable[[Hashable], bool]
+    ) -> List[Tuple[Hashable, np.ndarray, np.ndarray, np.ndarray, int]]:
+        """Remove the users for which ``predicate`` is true and return their
+        history and LSTM state as ``(user, rows, state, errors, steps)``,
+        least recently used first, for :meth:`import_users`."""
+        moved = []
+        async with self._lock:
+            for user_id in self.history.users():
+                if not predicate(user_id):
+                    continue
+                slot = self.history.slot_of(user_id)
+                moved.append(
+                    (
+                        user_id,
+                        self.history.view(slot).copy(),
+                        self._state[slot].copy(),
+                        self._errors[slot].copy(),
+                        int(self._steps[slot]),
+                    )
+                )
+                self.history.remove(user_id)
+        return moved
+
+    async def import_users(self, users: Sequence[Tuple[Hashable, np.ndarray, np.ndarray, np.ndarray, int]]) -> None:
+        """Take over users exported by :meth:`export_users`."""
+        async with self._lock:
+            for user_id, rows, state, errors, steps in users:
+                self.history.remove(user_id)
+                slot = self.history.slot(user_id)
+                for row in rows:
+                    self.history.push(slot, row)
+                self._state[slot] = state
+                self._errors[slot] = errors
+                self._steps[slot] = steps
+
+    async def submit(self, event: CompactEvent) -> ScoreResult:
+        """Score ``event`` through the dynamic batcher.
+
+        Concurrent callers are grouped into one :meth:`score_batch` call.
+        The batcher task starts on first use.
+        """
+        loop = asyncio.get_running_loop()
+        if self._runner is None or self._runner.done():
+            self._queue = asyncio.Queue()
+            self._runner = loop.create_task(self.run(self._queue))
+        future = loop.create_future()
+        self._queue.put_nowait((event, future))
+        return await future
+
+    async def close(self) -> None:
+        """Stop the batcher started by :meth:`submit` and the inference executor."""
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
     # ------------------------------- worker -------------------------------
+    async def _next_batch(self, queue: asyncio.Queue) -> Tuple[List[Any], float]:
+        return await collect_batch(queue, self.max_batch_size, self.max_wait)
+
     async def run(self, queue: asyncio.Queue, out_queue: asyncio.Queue | None = None) -> None:
-        """Consume events from queue and optionally push results."""
-        while True:
-            event = await queue.get()
-            self.queue_gauge.set(queue.qsize())
+        """Consume events from queue in batches and optionally push results.
+
+        Items are events, or ``(event, future)`` pairs whose future receives
+        the result (see :meth:`submit`). Up to ``workers`` batches are scored
+        concurrently; ``out_queue`` still receives results in batch order.
+        A failed batch of bare events stops the worker with its error.
+        """
+        runner = asyncio.current_task()
+        slots = asyncio.Semaphore(self.workers)
+        batches: set = set()
+        failures: List[BaseException] = []
+        previous: asyncio.Task | None = None
+
+        def finished(task: asyncio.Task) -> None:
+            batches.discard(task)
+            slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                failures.append(task.exception())
+                runner.cancel()
+
+        try:
+            while True:
+                items, waited = await self._next_batch(queue)
+                SCORING_BATCH_WAIT_SECONDS.observe(waited)
+                SCORING_BATCH_SIZE.observe(len(items))
+                self.queue_gauge.set(queue.qsize())
+                await slots.acquire()
+                # batches take the history lock in the order they are
+                # created, so histories still advance in arrival order
+                previous = asyncio.create_task(self._run_batch(queue, items, out_queue, previous))
+                batches.add(previous)
+                previous.add_done_callback(finished)
+        except asyncio.CancelledError:
+            if failures:
+                raise failures[0]
+            raise
+        finally:
+            for task in list(batches):
+                task.cancel()
+
+    async def _run_batch(
+        self,
+        queue: asyncio.Queue,
+        items: List[Any],
+        out_queue: asyncio.Queue | None,
+        previous: asyncio.Task | None,
+    ) -> None:
+        pairs = [item if isinstance(item, tuple) else (item, None) for item in items]
+        try:
             try:
-                res = await self.score(event)
-                if out_queue is not None:
+                results = await self.score_batch([event for event, _ in pairs])
+            except Exception as e:
+                if any(future is None for _, future in pairs):
+                    raise
+                for _, future in pairs:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            if out_queue is not None and previous is not None:
+                await asyncio.wait([previous])
+            for (_, future), res in zip(pairs, results):
+                if future is not None:
+                    if not future.done():
+                        future.set_result(res)
+                elif out_queue is not None:
                     await out_queue.put(res)
-            finally:
+        except asyncio.CancelledError:
+            for _, future in pairs:
+                if future is not None and not future.done():
+                    future.cancel()
+            raise
+        finally:
+            for _ in items:
                 queue.task_done()
-                self.queue_gauge.set(queue.qsize())
-
+            self.queue_gauge.set(queue.qsize())
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import socket
 from functools import lru_cache
 
 
@@ -31,3 +32,17 @@ def get_kafka_conf() -> dict[str, str]:
             pass
     bootstrap = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
     return {"bootstrap.servers": bootstrap}
+
+
+def get_instance_id() -> str:
+    """Return an id unique to this process among replicas of the service.
+
+    ``INSTANCE_ID`` (default: hostname) names the replica; orchestrator
+    workers started with ``--workers`` append their ``ORCH_WORKER_INDEX``.
+    Used to derive Kafka transactional ids, which must be distinct per
+    process yet stable across restarts so a restarted process fences its
+    own zombie predecessor.
+    """
+    instance = os.getenv("INSTANCE_ID") or socket.gethostname()
+    worker = os.getenv("ORCH_WORKER_INDEX")
+    return f"{instance}-{worker}" if worker is not None else instance
@@ -0,0 +1,466 @@
+"""User-sharded Scoring
+--------------------
+
+Spreads scoring over ``shards`` worker processes, each running its own
+:class:`~.scoring_engine.ScoringEngine`. A user's LSTM history and state
+live in one engine, so events are routed by ``user_id`` on a consistent
+hash ring (:class:`HashRing`) instead of round-robin. Events without a
+user have no history and are spread by event ID.
+
+Models are loaded once in the parent and the workers are forked from it,
+so the model arrays are shared copy-on-write instead of being loaded again
+by every worker. That needs a runtime that survives ``fork``: the ``numpy``
+LSTM backend. TensorFlow and the TFLite interpreter start threads that do
+not, so with those backends (and where ``fork`` is unavailable) workers
+are spawned and load their own models.
+
+The parent vectorizes each batch (:func:`.features.vectorize`) and sends
+only user IDs and the feature matrix to a worker. Every shard has its own
+batcher, so :meth:`ShardedScoringEngine.submit` batches like
+:meth:`.ScoringEngine.submit`.
+
+:meth:`ShardedScoringEngine.resize` changes the number of workers. New
+events wait while the shard queues drain; then users whose shard changes
+on the new ring are exported with their history and LSTM state and
+imported by their new shard. Consistent hashing moves about ``1/n`` of
+the users when going from ``n - 1`` to ``n`` shards. In the service,
+:meth:`ShardedScoringEngine.resize_on_signals` grows the pool by one shard
+on ``SIGTTIN`` and shrinks it by one on ``SIGTTOU``, as gunicorn does for
+its workers. New workers are started without blocking the event loop.
+
+A worker that dies is started again when its batcher next finds the pipe
+closed; the batch in flight fails, and the users it held lose their
+history.
+
+``history_capacity`` applies per shard.
+
+Examples
+--------
+
+>>> ring = HashRing(4)
+>>> ring.shard("alice") == HashRing(4).shard("alice")
+True
+>>> grown = HashRing(5)
+>>> users = [f"user-{i}" for i in range(1000)]
+>>> moved = [u for u in users if grown.shard(u) != ring.shard(u)]
+>>> all(grown.shard(u) == 4 for u in moved)
+True
+
+>>> engine = ShardedScoringEngine("models", shards=4, lstm_backend="numpy")  # doctest: +SKIP
+>>> result = await engine.submit(event)                                    # doctest: +SKIP
+>>> await engine.resize(8)                                                  # doctest: +SKIP
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .features import vectorize
+from .log_config import get_logger
+from .metrics import (
+    SCORING_SHARD_LATENCY_SECONDS,
+    SCORING_SHARD_MOVED_USERS,
+    SCORING_SHARD_QUEUE_SIZE,
+    SCORING_SHARD_RESTARTS,
+    SCORING_SHARD_USERS,
+)
+from .normalize import CompactEvent
+from .scoring_engine import LSTM_MODES, ScoreResult, ScoringEngine, _load_models, collect_batch
+
+logger = get_logger(service="scoring-shards")
+
+# LSTM backends whose loaded models can be inherited across ``fork``
+FORK_SAFE_BACKENDS = ("numpy",)
+
+
+class ShardDied(RuntimeError):
+    """The worker process of a shard exited or closed its pipe."""
+
+
+def _point(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with ``vnodes`` points per shard.
+
+    A shard's points do not depend on the shard count, so adding shard
+    ``n`` only moves keys to it, and removing it only moves its own keys.
+    """
+
+    def __init__(self, shards: int, vnodes: int = 64) -> None:
+        if shards < 1:
+            raise ValueError(f"need at least one shard, got {shards}")
+        self.shards = shards
+        self.vnodes = vnodes
+        points = sorted((_point(f"shard-{s}-{v}"), s) for s in range(shards) for v in range(vnodes))
+        self._points = [p for p, _ in points]
+        self._owners = [s for _, s in points]
+
+    def shard(self, key: str) -> int:
+        """Shard owning ``key``: the first point clockwise of its hash."""
+        i = bisect.bisect_right(self._points, _point(key))
+        return self._owners[i % len(self._points)]
+
+
+def _route_key(event: CompactEvent) -> str:
+    return event.user_id if event.user_id is not None else event.id
+
+
+# ------------------------------ worker side ------------------------------
+def _shard_main(conn: Any, model_dir: str, options: dict, models: Optional[Tuple[Any, ...]]) -> None:
+    """Serve ``(op, *args)`` requests from the parent until ``None``.
+
+    Every request is answered with ``(status, result, users)``; the first
+    reply reports whether the engine started.
+    """
+    # the parent owns shutdown; Ctrl-C reaches the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    loop = asyncio.new_event_loop()
+    try:
+        engine = ScoringEngine(model_dir, models=models, metrics_port=None, **options)
+    except Exception as e:
+        conn.send(("error", e, 0))
+        return
+    conn.send(("ok", None, 0))
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            op, *args = request
+            try:
+                if op == "score":
+                    result: Any = loop.run_until_complete(engine.score_features(*args))
+                elif op == "export":
+                    ring, index = args
+                    result = loop.run_until_complete(engine.export_users(lambda u: ring.shard(u) != index))
+                elif op == "import":
+                    result = loop.run_until_complete(engine.import_users(*args))
+                else:
+                    raise ValueError(f"unknown shard request {op!r}")
+                reply = ("ok", result, len(engine.history))
+            except Exception as e:
+                reply = ("error", e, len(engine.history))
+            conn.send(reply)
+    finally:
+        loop.run_until_complete(engine.close())
+        loop.close()
+
+
+# ------------------------------ parent side ------------------------------
+class _Shard:
+    """Parent's handle on one worker process."""
+
+    def __init__(self, index: int, process: Any, conn: Any) -> None:
+        self.index = index
+        self.label = str(index)
+        self.process = process
+        self.conn = conn
+        # the pipe is blocking; one thread per shard waits on it
+        self.io = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard-{index}")
+        self.queue: asyncio.Queue | None = None
+        self.runner: asyncio.Task | None = None
+
+    def request(self, request: Any) -> Tuple[str, Any, int]:
+        self.conn.send(request)
+        return self.conn.recv()
+
+    def ready(self) -> None:
+        status, error, _ = self.conn.recv()
+        if status != "ok":
+            raise error
+
+    def stop_process(self, timeout: float = 5.0) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker; the caller cancels :attr:`runner` on the loop."""
+        self.stop_process(timeout)
+        self.io.shutdown(wait=False, cancel_futures=True)
+        SCORING_SHARD_QUEUE_SIZE.labels(shard=self.label).set(0)
+        SCORING_SHARD_USERS.labels(shard=self.label).set(0)
+
+
+class ShardedScoringEngine:
+    """Score events in ``shards`` worker processes, routed by user.
+
+    Takes the :class:`.ScoringEngine` options; each worker builds an engine
+    with a thread executor. ``vnodes`` is the number of ring points per
+    shard.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = "models",
+        shards: int = 2,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 2.0,
+        history_capacity: int = 20000,
+        history_ttl: Optional[float] = 3600.0,
+        lstm_mode: str = "windowed",
+        lstm_backend: str = "tf",
+        lstm_precision: str = "float32",
+        vnodes: int = 64,
+    ) -> None:
+        if lstm_mode not in LSTM_MODES:
+            raise ValueError(f"unknown LSTM mode {lstm_mode!r}")
+        self.ring = HashRing(shards, vnodes)
+        self.model_dir = model_dir
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._options = dict(
+            history_capacity=history_capacity,
+            history_ttl=history_ttl,
+            lstm_mode=lstm_mode,
+            lstm_backend=lstm_backend,
+            lstm_precision=lstm_precision,
+        )
+        self._models: Optional[Tuple[Any, ...]] = None
+        if lstm_backend in FORK_SAFE_BACKENDS and "fork" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("fork")
+            self._models = _load_models(model_dir, lstm_backend, lstm_precision)
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self._shards = self._spawn(range(shards))
+        self._wait_ready(self._shards)
+        # cleared while resizing; submit waits on it
+        self._routable = asyncio.Event()
+        self._routable.set()
+        self._resize_lock = asyncio.Lock()
+        self._target = shards
+        self._resizes: set = set()
+        self._signals: Tuple[int, ...] = ()
+
+    @property
+    def shards(self) -> int:
+        return self.ring.shards
+
+    def _launch(self, index: int) -> Tuple[Any, Any]:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_main,
+            args=(child, self.model_dir, self._options, self._models),
+            name=f"scoring-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        return process, parent
+
+    def _spawn(self, indices: Sequence[int]) -> List[_Shard]:
+        # workers load (or inherit) their models concurrently until ready
+        return [_Shard(index, *self._launch(index)) for index in indices]
+
+    @staticmethod
+    def _wait_ready(shards: Sequence[_Shard]) -> None:
+        try:
+            for shard in shards:
+                shard.ready()
+        except BaseException:
+            for shard in shards:
+                shard.stop()
+            raise
+
+    async def _start(self, indices: Sequence[int]) -> List[_Shard]:
+        """Start workers for ``indices`` without blocking the loop while
+        they load their models."""
+        started = self._spawn(indices)
+        await asyncio.get_running_loop().run_in_executor(None, self._wait_ready, started)
+        return started
+
+    async def _respawn(self, shard: _Shard) -> None:
+        """Replace the dead worker of ``shard``; its queue is kept."""
+        logger.warning("scoring shard died", shard=shard.index, exitcode=shard.process.exitcode)
+        SCORING_SHARD_RESTARTS.labels(shard=shard.label).inc()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, shard.stop_process)
+        shard.process, shard.conn = self._launch(shard.index)
+        await loop.run_in_executor(shard.io, shard.ready)
+        SCORING_SHARD_USERS.labels(shard=shard.label).set(0)
+        logger.info("scoring shard restarted", shard=shard.index)
+
+    def shard_of(self, event: CompactEvent) -> int:
+        return self.ring.shard(_route_key(event))
+
+    # ------------------------------------------------------------------
+    async def _call(self, shard: _Shard, request: Tuple[Any, ...]) -> Any:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            status, result, users = await loop.run_in_executor(shard.io, shard.request, request)
+        except (EOFError, OSError) as e:
+            raise ShardDied(f"scoring shard {shard.index} is gone") from e
+        if request[0] == "score":
+            SCORING_SHARD_LATENCY_SECONDS.labels(shard=shard.label).observe(time.perf_counter() - start)
+        SCORING_SHARD_USERS.labels(shard=shard.label).set(users)
+        if status != "ok":
+            raise result
+        return result
+
+    async def _run_shard(self, shard: _Shard) -> None:
+        """Batcher of one shard: score queued ``(event, future)`` pairs."""
+        queue = shard.queue
+        while True:
+            items, _ = await collect_batch(queue, self.max_batch_size, self.max_wait)
+            SCORING_SHARD_QUEUE_SIZE.labels(shard=shard.label).set(queue.qsize())
+            events = [event for event, _ in items]
+            try:
+                results = await self._call(shard, ("score", [e.user_id for e in events], vectorize(events)))
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                if isinstance(e, ShardDied):
+                    # the worker is gone; queued events go to its replacement
+                    try:
+                        await self._respawn(shard)
+                    except Exception as restart_error:
+                        logger.error("scoring shard restart failed", shard=shard.index, error=str(restart_error))
+            else:
+                for (_, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    async def submit(self, event: CompactEvent) -> ScoreResult:
+        """Score ``event`` on its user's shard through that shard's batcher."""
+        if not self._routable.is_set():
+            await self._routable.wait()
+        shard = self._shards[self.shard_of(event)]
+        loop = asyncio.get_running_loop()
+        if shard.runner is None or shard.runner.done():
+            shard.queue = asyncio.Queue()
+            shard.runner = loop.create_task(self._run_shard(shard))
+        future = loop.create_future()
+        shard.queue.put_nowait((event, future))
+        SCORING_SHARD_QUEUE_SIZE.labels(shard=shard.label).set(shard.queue.qsize())
+        return await future
+
+    async def score_batch(self, events: Sequence[CompactEvent]) -> List[ScoreResult]:
+        """Score ``events``; each user's events are scored in order."""
+        return list(await asyncio.gather(*(self.submit(event) for event in events)))
+
+    async def score(self, event: CompactEvent) -> ScoreResult:
+        return await self.submit(event)
+
+    # ------------------------------------------------------------------
+    async def resize(self, shards: int) -> int:
+        """Run ``shards`` workers, moving users whose shard changes with
+        their history and LSTM state. Returns the number of users moved.
+
+        New workers start before anything moves and removed ones stop only
+        once every user has been imported, so on failure the old shards
+        take their users back and keep serving.
+        """
+        async with self._resize_lock:
+            if shards == self.shards:
+                return 0
+            ring = HashRing(shards, self.ring.vnodes)
+            loop = asyncio.get_running_loop()
+            added = await self._start(range(len(self._shards), shards))
+            exported: Dict[int, List[Any]] = {}
+            self._routable.clear()
+            try:
+                # nothing may be in flight while histories move
+                await asyncio.gather(*(s.queue.join() for s in self._shards if s.queue is not None))
+                for shard in self._shards:
+                    exported[shard.index] = await self._call(shard, ("export", ring, shard.index))
+                target = (self._shards + added)[:shards]
+                by_shard: List[List[Any]] = [[] for _ in range(shards)]
+                for users in exported.values():
+                    for user in users:
+                        by_shard[ring.shard(user[0])].append(user)
+                for shard, users in zip(target, by_shard):
+                    if users:
+                        await self._call(shard, ("import", users))
+                removed = self._shards[shards:]
+                self._shards, self.ring = target, ring
+            except BaseException:
+                await self._restore(exported, added)
+                raise
+            finally:
+                self._routable.set()
+            for shard in removed:
+                if shard.runner is not None:
+                    shard.runner.cancel()
+                await loop.run_in_executor(None, shard.stop)
+        moved = sum(len(users) for users in exported.values())
+        SCORING_SHARD_MOVED_USERS.inc(moved)
+        logger.info("shards resized", shards=shards, moved_users=moved)
+        return moved
+
+    async def _restore(self, exported: Dict[int, List[Any]], added: Sequence[_Shard]) -> None:
+        """Undo a failed :meth:`resize`: old shards drop users imported
+        under the new ring and take back the ones they exported; the added
+        workers stop."""
+        loop = asyncio.get_running_loop()
+        for shard in self._shards:
+            try:
+                await self._call(shard, ("export", self.ring, shard.index))
+                if exported.get(shard.index):
+                    await self._call(shard, ("import", exported[shard.index]))
+            except Exception as e:
+                logger.error("shard resize rollback failed", shard=shard.index, error=str(e))
+        for shard in added:
+            if shard.runner is not None:
+                shard.runner.cancel()
+            await loop.run_in_executor(None, shard.stop)
+
+    def resize_on_signals(self) -> None:
+        """Add a shard on ``SIGTTIN`` and remove one on ``SIGTTOU``."""
+        loop = asyncio.get_running_loop()
+        self._target = self.shards
+        loop.add_signal_handler(signal.SIGTTIN, self._resize_by, 1)
+        loop.add_signal_handler(signal.SIGTTOU, self._resize_by, -1)
+        self._signals = (signal.SIGTTIN, signal.SIGTTOU)
+
+    def _resize_by(self, step: int) -> None:
+        self._target = max(1, self._target + step)
+        task = asyncio.get_running_loop().create_task(self.resize(self._target))
+        self._resizes.add(task)
+        task.add_done_callback(self._resize_done)
+
+    def _resize_done(self, task: asyncio.Task) -> None:
+        self._resizes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # later signals step from the shard count actually running
+            self._target = self.shards
+            logger.error("shard resize failed", error=str(task.exception()))
+
+    async def close(self) -> None:
+        """Stop the batchers and the worker processes."""
+        loop = asyncio.get_running_loop()
+        for sig in self._signals:
+            loop.remove_signal_handler(sig)
+        self._signals = ()
+        for task in list(self._resizes):
+            task.cancel()
+        resizes = list(self._resizes)
+        runners = [s.runner for s in self._shards if s.runner is not None]
+        for runner in runners:
+            runner.cancel()
+        for shard in self._shards:
+            shard.stop()
+        await asyncio.gather(*runners, *resizes, return_exceptions=True)
+        self._shards = []
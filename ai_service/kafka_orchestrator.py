@@ -1,35 +1,103 @@
+import argparse
 import asyncio
-import json
+import contextlib
 import logging
+import multiprocessing
+import os
 import signal
-from typing import Any, Tuple
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, TopicPartition, OffsetAndMetadata
+from aiokafka.abc import ConsumerRebalanceListener
+from aiokafka.coordinator.assignors.sticky.sticky_assignor import StickyPartitionAssignor
 from aiokafka.errors import KafkaError
-from prometheus_client import Gauge, Counter, CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from aiokafka.helpers import create_ssl_context
+from prometheus_client import Gauge, Counter, Histogram, CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client import multiprocess
 from aiohttp import web
 import structlog
 
 from .settings import Settings
-from .pipeline import process_event
+from .pipeline import build_pipeline, process_event
+from .replay import parse_timestamp_ms, run_replay
+from .app import codec
+from .app.log_config import get_logger
+from .app.metrics import PIPELINE_STAGE_QUEUE_DEPTH, PIPELINE_STAGE_SECONDS
+from .app.secrets import get_instance_id
 
 
 # Prometheus metrics
 registry = CollectorRegistry()
-QUEUE_GAUGE = Gauge("in_flight_queue", "In-flight queue size", registry=registry)
-LAG_GAUGE = Gauge("consumer_lag", "Kafka consumer lag", registry=registry)
+# gauges are summed over live workers when running with --workers
+QUEUE_GAUGE = Gauge(
+    "in_flight_queue", "In-flight queue size", registry=registry, multiprocess_mode="livesum"
+)
+INFLIGHT_BYTES = Gauge(
+    "in_flight_bytes",
+    "Bytes fetched but not yet committed",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+# each partition is owned by one live worker, so its latest sample is the max
+LAG_GAUGE = Gauge(
+    "consumer_lag",
+    "Kafka consumer lag (highwater - position)",
+    ["topic", "partition"],
+    registry=registry,
+    multiprocess_mode="livemax",
+)
 PROCESSED_COUNTER = Counter("events_processed_total", "Processed events", registry=registry)
+RECORD_ERRORS = Counter(
+    "orchestrator_record_errors_total",
+    "Records whose processing raised and were sent to the DLQ",
+    registry=registry,
+)
+REBALANCE_DROPPED = Counter(
+    "rebalance_dropped_records_total",
+    "Queued records dropped because their partition was revoked",
+    registry=registry,
+)
+BATCH_SIZE = Histogram(
+    "orchestrator_batch_size",
+    "Records committed per transaction",
+    buckets=[1, 10, 50, 100, 250, 500, 1000, 5000],
+    registry=registry,
+)
+COMMIT_LATENCY = Histogram(
+    "orchestrator_commit_latency_seconds",
+    "Time to produce a batch and commit its transaction",
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
+    registry=registry,
+)
+E2E_LATENCY = Histogram(
+    "orchestrator_e2e_latency_seconds",
+    "Broker record timestamp to offset commit",
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0],
+    registry=registry,
+)
+QUEUE_TIME = Histogram(
+    "orchestrator_queue_time_seconds",
+    "Time a record waits in its partition queue before processing",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0],
+    registry=registry,
+)
+# pipeline stage metrics live on the app registry; serve them on :9000 too
+registry.register(PIPELINE_STAGE_QUEUE_DEPTH)
+registry.register(PIPELINE_STAGE_SECONDS)
 
 
 def configure_logging(env: str) -> structlog.BoundLogger:
+    # stdlib logging is only used by aiokafka; structlog is set up by log_config
     logging.basicConfig(level=logging.INFO, format="%(message)s")
-    structlog.configure(processors=[structlog.processors.JSONRenderer()])
-    return structlog.get_logger().bind(service="ai-orchestrator", environment=env)
+    return get_logger(service="ai-orchestrator", environment=env)
 
 
-async def metrics_app() -> web.AppRunner:
+async def metrics_app(metrics_registry: CollectorRegistry = registry) -> web.AppRunner:
     async def handle(_request: web.Request) -> web.Response:
-        data = generate_latest(registry)
+        data = generate_latest(metrics_registry)
         return web.Response(body=data, content_type=CONTENT_TYPE_LATEST)
 
     app = web.Application()
@@ -41,58 +109,402 @@ async def metrics_app() -> web.AppRunner:
     return runner
 
 
+def _batch_offsets(msgs: Sequence[Any]) -> Dict[TopicPartition, OffsetAndMetadata]:
+    """Return the next offset to commit for every partition in ``msgs``."""
+    highest: Dict[TopicPartition, int] = {}
+    for msg in msgs:
+        tp = TopicPartition(msg.topic, msg.partition)
+        if msg.offset >= highest.get(tp, -1):
+            highest[tp] = msg.offset
+    return {tp: OffsetAndMetadata(offset + 1, None) for tp, offset in highest.items()}
+
+
+async def _transform(msg: Any) -> Tuple[Optional[str], bytes, List[Tuple[str, bytes]], bool]:
+    """Run one record through the pipeline; returns topic, value, headers, processed.
+
+    ``topic`` is ``None`` when the pipeline emitted the result itself and
+    only the offset remains to be committed.
+    """
+    try:
+        event_dict = codec.loads(msg.value)
+    except codec.DecodeError:
+        return "rau_events_dlq", msg.value, [("reason", b"deserialization_error")], False
+    if isinstance(event_dict, dict) and "source" not in event_dict:
+        # producers may name their source in a header instead of a field;
+        # it selects the normalizer's field mapping
+        for key, value in msg.headers or ():
+            if key == "source":
+                event_dict["source"] = value.decode("utf-8", "replace")
+                break
+
+    result = await process_event(event_dict)
+    if result is None:
+        return None, b"", [], True
+    topic, value, headers = result
+    headers = [(str(k), str(v).encode("utf-8")) for k, v in (headers or {}).items()]
+    if not isinstance(value, bytes):
+        value = codec.dumps(value)
+    return topic, value, headers, True
+
+
+def _failed_record(msg: Any, error: Exception) -> Tuple[str, bytes, List[Tuple[str, bytes]], bool]:
+    reason = f"{type(error).__name__}: {error}".encode("utf-8", "replace")
+    headers = [("reason", b"processing_error"), ("error", reason)]
+    return "rau_events_dlq", msg.value, headers, False
+
+
+async def process_kafka_batch(
+    msgs: Sequence[Any],
+    producer: AIOKafkaProducer,
+    group_id: str,
+    logger: structlog.BoundLogger,
+    commit_lock: asyncio.Lock | None = None,
+) -> None:
+    """Process ``msgs`` and commit outputs plus offsets in a single transaction.
+
+    Pipeline outputs are computed once; a Kafka error only replays the
+    transaction, not ``process_event``. A transactional producer holds one
+    open transaction at a time, so concurrent callers sharing ``producer``
+    must pass a shared ``commit_lock``.
+
+    A record whose processing raises goes to ``rau_events_dlq`` in the same
+    transaction; the rest of the batch is unaffected.
+    """
+    # records enter the pipeline together; outputs keep record order
+    results = await asyncio.gather(*(_transform(msg) for msg in msgs), return_exceptions=True)
+    outputs = []
+    for msg, result in zip(msgs, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.warning(
+                "record_error", error=str(result), topic=msg.topic, partition=msg.partition, offset=msg.offset
+            )
+            RECORD_ERRORS.inc()
+            result = _failed_record(msg, result)
+        outputs.append(result)
+    offsets = _batch_offsets(msgs)
+    async with commit_lock or contextlib.nullcontext():
+        attempts = 0
+        while True:
+            start = time.perf_counter()
+            producer.begin_transaction()
+            try:
+                futures = [
+                    await producer.send(topic, value, headers=headers)
+                    for topic, value, headers, _ in outputs
+                    if topic is not None
+                ]
+                await asyncio.gather(*futures)
+                await producer.send_offsets_to_transaction(offsets, group_id)
+                await producer.commit_transaction()
+            except KafkaError as e:
+                await producer.abort_transaction()
+                attempts += 1
+                if attempts > 3:
+                    logger.error("kafka_error", error=str(e), attempt=attempts)
+                    raise
+                wait = 2 ** attempts
+                logger.warning("kafka_retry", attempt=attempts, wait=wait)
+                await asyncio.sleep(wait)
+                continue
+            COMMIT_LATENCY.observe(time.perf_counter() - start)
+            break
+    committed_ms = time.time() * 1000
+    for msg in msgs:
+        E2E_LATENCY.observe(max(0.0, committed_ms - msg.timestamp) / 1000)
+    BATCH_SIZE.observe(len(msgs))
+    PROCESSED_COUNTER.inc(sum(1 for *_, processed in outputs if processed))
+
+
 async def process_kafka_message(
     msg: Any,
     producer: AIOKafkaProducer,
     group_id: str,
     logger: structlog.BoundLogger,
 ) -> None:
-    attempts = 0
-    while True:
-        producer.begin_transaction()
+    await process_kafka_batch([msg], producer, group_id, logger)
+
+
+async def next_batch(queue: asyncio.Queue, max_records: int, linger_ms: int) -> List[Any]:
+    """Wait for one record, then gather more until ``max_records`` or ``linger_ms``."""
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + linger_ms / 1000
+    while len(batch) < max_records:
         try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+def _record_size(msg: Any) -> int:
+    return len(msg.value or b"") + len(msg.key or b"")
+
+
+class InFlightBuffer:
+    """Byte accounting for records fetched but not yet committed.
+
+    Each assigned partition gets an equal share of ``max_bytes``. A partition
+    is paused once its buffered bytes reach that share and resumed when they
+    drop below half of it, so one burst of large events only stalls the
+    partition it came from.
+    """
+
+    def __init__(self, consumer: AIOKafkaConsumer, max_bytes: int) -> None:
+        self._consumer = consumer
+        self._max_bytes = max_bytes
+        self._bytes: Dict[TopicPartition, int] = defaultdict(int)
+        self.total = 0
+
+    def _budget(self) -> int:
+        return self._max_bytes // max(1, len(self._consumer.assignment()))
+
+    def add(self, tp: TopicPartition, nbytes: int) -> None:
+        self._bytes[tp] += nbytes
+        self.total += nbytes
+        if self._bytes[tp] >= self._budget() and tp not in self._consumer.paused():
+            self._consumer.pause(tp)
+        INFLIGHT_BYTES.set(self.total)
+
+    def retain(self, assigned: set) -> None:
+        """Drop the accounting of partitions that are no longer assigned."""
+        for tp in [tp for tp in self._bytes if tp not in assigned]:
+            self.total -= self._bytes.pop(tp)
+        INFLIGHT_BYTES.set(self.total)
+
+    def reapply(self) -> None:
+        """Pause partitions over budget again; assignment resets pause state."""
+        budget = self._budget()
+        over = [tp for tp, nbytes in self._bytes.items() if nbytes >= budget]
+        assigned = self._consumer.assignment()
+        self._consumer.pause(*(tp for tp in over if tp in assigned))
+
+    def release(self, msgs: Sequence[Any]) -> None:
+        released: Dict[TopicPartition, int] = defaultdict(int)
+        for msg in msgs:
+            released[TopicPartition(msg.topic, msg.partition)] += _record_size(msg)
+        paused = self._consumer.paused()
+        for tp, nbytes in released.items():
+            held = self._bytes.get(tp, 0)
+            # records of a forgotten partition no longer count; only bytes
+            # added since (a fetch that raced the rebalance) are released
+            nbytes = min(nbytes, held)
+            if not nbytes:
+                continue
+            remaining = held - nbytes
+            if remaining > 0:
+                self._bytes[tp] = remaining
+            else:
+                self._bytes.pop(tp, None)
+            self.total -= nbytes
+            if tp in paused and remaining < self._budget() // 2:
+                self._consumer.resume(tp)
+        INFLIGHT_BYTES.set(self.total)
+
+
+class PartitionWorkerPool:
+    """Per-partition sub-queues drained by one worker task per partition.
+
+    Records of a partition are processed in order by its worker, so each
+    batch commits a strictly increasing offset for that partition. Workers
+    of different partitions run concurrently, at most ``max_concurrency`` at
+    a time; only the transaction itself is serialised on the shared producer.
+
+    Around a rebalance :meth:`pause` lets in-flight batches commit and holds
+    back new ones, and :meth:`reassign` drops the queued records of
+    partitions that were lost while keeping those of partitions we still own.
+    """
+
+    def __init__(
+        self,
+        producer: AIOKafkaProducer,
+        group_id: str,
+        logger: structlog.BoundLogger,
+        *,
+        max_concurrency: int = 8,
+        max_records: int = 1,
+        linger_ms: int = 0,
+        buffer: InFlightBuffer | None = None,
+    ) -> None:
+        self._producer = producer
+        self._buffer = buffer
+        self._group_id = group_id
+        self._logger = logger
+        self._max_records = max_records
+        self._linger_ms = linger_ms
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._commit_lock = asyncio.Lock()
+        self._queues: Dict[TopicPartition, asyncio.Queue] = {}
+        self._workers: Dict[TopicPartition, asyncio.Task] = {}
+        self._counts: Dict[TopicPartition, int] = defaultdict(int)
+        self._next_offsets: Dict[TopicPartition, int] = {}
+        # dispatch times, in queue order, for the queue-time histogram
+        self._enqueued: Dict[TopicPartition, deque] = defaultdict(deque)
+        # None until the first assignment: accept every partition
+        self._owned: set | None = None
+        self._running = asyncio.Event()
+        self._running.set()
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.pending = 0
+
+    def dispatch(self, msg: Any) -> None:
+        tp = TopicPartition(msg.topic, msg.partition)
+        if self._owned is not None and tp not in self._owned:
+            # fetched before we lost the partition; the new owner re-reads it.
+            # Its bytes were forgotten on reassign, so this only releases
+            # what was added after that
+            if self._buffer is not None:
+                self._buffer.release([msg])
+            REBALANCE_DROPPED.inc()
+            return
+        queue = self._queues.get(tp)
+        if queue is None:
+            queue = self._queues[tp] = asyncio.Queue()
+            self._workers[tp] = asyncio.create_task(self._worker(tp, queue))
+        queue.put_nowait(msg)
+        self._enqueued[tp].append(time.perf_counter())
+        self._counts[tp] += 1
+        self._next_offsets[tp] = msg.offset + 1
+        self.pending += 1
+
+    async def _worker(self, tp: TopicPartition, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await next_batch(queue, self._max_records, self._linger_ms)
+            await self._running.wait()
+            enqueued, now = self._enqueued[tp], time.perf_counter()
+            for _ in batch:
+                QUEUE_TIME.observe(now - enqueued.popleft())
+            self._inflight += 1
+            self._idle.clear()
             try:
-                event_dict = json.loads(msg.value.decode("utf-8"))
-            except json.JSONDecodeError:
-                await producer.send_and_wait(
-                    "rau_events_dlq",
-                    msg.value,
-                    headers=[("reason", b"deserialization_error")],
-                )
-                offsets = {
-                    TopicPartition(msg.topic, msg.partition): OffsetAndMetadata(
-                        msg.offset + 1, None
+                async with self._semaphore:
+                    await process_kafka_batch(
+                        batch,
+                        self._producer,
+                        self._group_id,
+                        self._logger,
+                        commit_lock=self._commit_lock,
                     )
-                }
-                await producer.send_offsets_to_transaction(offsets, group_id)
-                await producer.commit_transaction()
-                return
-
-            topic, value, headers = await process_event(event_dict)
-            headers = [
-                (str(k), str(v).encode("utf-8")) for k, v in (headers or {}).items()
-            ]
-            await producer.send_and_wait(
-                topic, json.dumps(value).encode("utf-8"), headers=headers
-            )
-            offsets = {
-                TopicPartition(msg.topic, msg.partition): OffsetAndMetadata(
-                    msg.offset + 1, None
-                )
-            }
-            await producer.send_offsets_to_transaction(offsets, group_id)
-            await producer.commit_transaction()
-            PROCESSED_COUNTER.inc()
+            except Exception as e:
+                self._logger.error("process_error", error=str(e), batch_size=len(batch))
+            finally:
+                self._inflight -= 1
+                if not self._inflight:
+                    self._idle.set()
+            for _ in batch:
+                queue.task_done()
+            self._counts[tp] -= len(batch)
+            self.pending -= len(batch)
+            if self._buffer is not None:
+                self._buffer.release(batch)
+            QUEUE_GAUGE.set(self.pending)
+
+    async def pause(self) -> None:
+        """Hold back new batches and wait for in-flight ones to commit."""
+        self._running.clear()
+        await self._idle.wait()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def reassign(self, assigned: set) -> Dict[TopicPartition, int]:
+        """Adopt ``assigned`` as the owned partitions.
+
+        Queued records of partitions no longer owned are dropped. Returns the
+        next offset to fetch for every kept partition that still has queued
+        records, so the consumer continues after them instead of re-reading
+        from the committed offset.
+        """
+        for tp in [tp for tp in self._queues if tp not in assigned]:
+            self._workers.pop(tp).cancel()
+            self._queues.pop(tp)
+            dropped = self._counts.pop(tp, 0)
+            self._next_offsets.pop(tp, None)
+            self._enqueued.pop(tp, None)
+            self.pending -= dropped
+            REBALANCE_DROPPED.inc(dropped)
+        if self._buffer is not None:
+            # also covers lost partitions whose records are still in the
+            # shared fetch queue and were never dispatched
+            self._buffer.retain(assigned)
+        self._owned = set(assigned)
+        QUEUE_GAUGE.set(self.pending)
+        return {tp: self._next_offsets[tp] for tp, count in self._counts.items() if count > 0}
+
+    async def join(self) -> None:
+        """Wait until every dispatched record has been processed."""
+        await asyncio.gather(*(q.join() for q in list(self._queues.values())))
+
+    async def close(self) -> None:
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queues.clear()
+        self._workers.clear()
+
+
+class OrchestratorRebalanceListener(ConsumerRebalanceListener):
+    """Keep in-flight work consistent across consumer group rebalances.
+
+    On revoke, in-flight batches finish and commit before the group moves
+    on, so the next owner starts from an offset that includes them. On
+    assign, only partitions that actually moved lose their queued records.
+    Partitions we keep, which is most of them with the sticky assignor, keep
+    their queue and resume at the next unfetched offset instead of
+    reprocessing from the committed one. aiokafka only implements the eager
+    protocol, so this is how incremental rebalancing is emulated.
+    """
+
+    def __init__(
+        self,
+        consumer: AIOKafkaConsumer,
+        queue: asyncio.Queue,
+        pool: PartitionWorkerPool,
+        logger: structlog.BoundLogger,
+        buffer: InFlightBuffer | None = None,
+    ) -> None:
+        self._consumer = consumer
+        self._queue = queue
+        self._pool = pool
+        self._logger = logger
+        self._buffer = buffer
+
+    async def on_partitions_revoked(self, revoked: List[TopicPartition]) -> None:
+        if not revoked:
             return
-        except KafkaError as e:
-            await producer.abort_transaction()
-            attempts += 1
-            if attempts > 3:
-                logger.error("kafka_error", error=str(e), attempt=attempts)
-                raise
-            wait = 2 ** attempts
-            logger.warning("kafka_retry", attempt=attempts, wait=wait)
-            await asyncio.sleep(wait)
+        start = time.perf_counter()
+        await self._pool.pause()
+        self._logger.info(
+            "partitions_revoked",
+            partitions=len(revoked),
+            drain_seconds=round(time.perf_counter() - start, 3),
+        )
+
+    async def on_partitions_assigned(self, assigned: List[TopicPartition]) -> None:
+        # records still in the shared queue are routed (or dropped) first
+        while not self._queue.empty():
+            self._pool.dispatch(self._queue.get_nowait())
+            self._queue.task_done()
+        resume_at = self._pool.reassign(set(assigned))
+        for tp, offset in resume_at.items():
+            self._consumer.seek(tp, offset)
+        if self._buffer is not None:
+            self._buffer.reapply()
+        self._pool.resume()
+        self._logger.info("partitions_assigned", partitions=len(assigned), kept_queued=len(resume_at))
 
 
 async def consume_loop(
@@ -100,22 +512,56 @@ async def consume_loop(
     queue: asyncio.Queue,
     stop_event: asyncio.Event,
     logger: structlog.BoundLogger,
+    buffer: InFlightBuffer | None = None,
+    max_records: int = 500,
+    timeout_ms: int = 100,
 ) -> None:
     while not stop_event.is_set():
-        msg = await consumer.getone()
-        await queue.put(msg)
-        QUEUE_GAUGE.set(queue.qsize())
-        tp = TopicPartition(msg.topic, msg.partition)
+        batches = await consumer.getmany(timeout_ms=timeout_ms, max_records=max_records)
+        for tp, msgs in batches.items():
+            for msg in msgs:
+                queue.put_nowait(msg)
+            if buffer is not None:
+                buffer.add(tp, sum(_record_size(msg) for msg in msgs))
+        if batches:
+            QUEUE_GAUGE.set(queue.qsize())
+    logger.info("consume_loop_stopped")
+
+
+async def sample_lag(consumer: AIOKafkaConsumer) -> Dict[TopicPartition, int]:
+    """Set ``LAG_GAUGE`` for every assigned partition and return the samples.
+
+    Partitions without a highwater yet (nothing fetched since assignment)
+    are skipped.
+    """
+    lags: Dict[TopicPartition, int] = {}
+    for tp in consumer.assignment():
+        highwater = consumer.highwater(tp)
+        if highwater is None:
+            continue
         try:
-            lag = consumer.highwater(tp) - msg.offset - 1
-            LAG_GAUGE.set(lag)
+            position = await consumer.position(tp)
         except Exception:
-            pass
-        if queue.qsize() > 10000:
-            consumer.pause(*consumer.assignment())
-        elif queue.qsize() < 1000:
-            consumer.resume(*consumer.paused())
-    logger.info("consume_loop_stopped")
+            # revoked while sampling
+            continue
+        lags[tp] = max(0, highwater - position)
+        LAG_GAUGE.labels(topic=tp.topic, partition=str(tp.partition)).set(lags[tp])
+    return lags
+
+
+async def lag_loop(
+    consumer: AIOKafkaConsumer,
+    stop_event: asyncio.Event,
+    logger: structlog.BoundLogger,
+    interval: float = 5.0,
+) -> None:
+    while not stop_event.is_set():
+        try:
+            await sample_lag(consumer)
+        except Exception as e:
+            logger.warning("lag_sample_error", error=str(e))
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop_event.wait(), interval)
 
 
 async def process_loop(
@@ -124,23 +570,37 @@ async def process_loop(
     queue: asyncio.Queue,
     stop_event: asyncio.Event,
     logger: structlog.BoundLogger,
+    max_records: int = 1,
+    linger_ms: int = 0,
+    max_concurrency: int = 8,
+    buffer: InFlightBuffer | None = None,
+    pool: PartitionWorkerPool | None = None,
 ) -> None:
-    while not stop_event.is_set() or not queue.empty():
-        msg = await queue.get()
-        try:
-            await process_kafka_message(msg, producer, consumer._group_id, logger)
-        except Exception as e:
-            logger.error("process_error", error=str(e))
-        finally:
+    pool = pool or PartitionWorkerPool(
+        producer,
+        consumer._group_id,
+        logger,
+        max_concurrency=max_concurrency,
+        max_records=max_records,
+        linger_ms=linger_ms,
+        buffer=buffer,
+    )
+    try:
+        while not stop_event.is_set() or not queue.empty():
+            msg = await queue.get()
+            pool.dispatch(msg)
             queue.task_done()
-            QUEUE_GAUGE.set(queue.qsize())
+            QUEUE_GAUGE.set(queue.qsize() + pool.pending)
+        await pool.join()
+    finally:
+        await pool.close()
     logger.info("process_loop_stopped")
 
 
 async def shutdown(
     consumer: AIOKafkaConsumer,
     producer: AIOKafkaProducer,
-    runner: web.AppRunner,
+    runner: web.AppRunner | None,
     stop_event: asyncio.Event,
     tasks: Tuple[asyncio.Task, ...],
     logger: structlog.BoundLogger,
@@ -151,41 +611,47 @@ async def shutdown(
     await asyncio.gather(*tasks, return_exceptions=True)
     await consumer.stop()
     await producer.stop()
-    await runner.cleanup()
+    if runner is not None:
+        await runner.cleanup()
     logger.info("shutdown_complete")
 
 
-async def main() -> None:
+async def main(serve_metrics: bool = True) -> None:
     settings = Settings()
-    logger = configure_logging(settings.ENVIRONMENT)
+    logger = configure_logging(settings.ENVIRONMENT).bind(instance=get_instance_id())
+    ssl_context = create_ssl_context(cafile=settings.KAFKA_SSL_CA) if settings.KAFKA_SSL_CA else None
 
     consumer = AIOKafkaConsumer(
-        "rau_events",
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
         group_id="ai-orchestrator",
         enable_auto_commit=False,
+        # keeps most partitions in place across rebalances
+        partition_assignment_strategy=(StickyPartitionAssignor,),
         isolation_level="read_committed",
         security_protocol=settings.KAFKA_SECURITY_PROTOCOL,
         sasl_mechanism=settings.KAFKA_SASL_MECHANISM,
-        sasl_plain_username=settings.KAFKA_USERNAME,
-        sasl_plain_password=settings.KAFKA_PASSWORD,
-        ssl_cafile=settings.KAFKA_SSL_CAFILE,
+        sasl_plain_username=settings.KAFKA_SASL_USERNAME,
+        sasl_plain_password=settings.KAFKA_SASL_PASSWORD,
+        ssl_context=ssl_context,
     )
 
     producer = AIOKafkaProducer(
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-        transactional_id="trustvault-ai",
+        # unique per replica and worker so replicas do not fence each other
+        transactional_id=f"trustvault-ai-{get_instance_id()}",
         security_protocol=settings.KAFKA_SECURITY_PROTOCOL,
         sasl_mechanism=settings.KAFKA_SASL_MECHANISM,
-        sasl_plain_username=settings.KAFKA_USERNAME,
-        sasl_plain_password=settings.KAFKA_PASSWORD,
-        ssl_cafile=settings.KAFKA_SSL_CAFILE,
+        sasl_plain_username=settings.KAFKA_SASL_USERNAME,
+        sasl_plain_password=settings.KAFKA_SASL_PASSWORD,
+        ssl_context=ssl_context,
     )
 
+    pipeline = build_pipeline(settings)
+    await pipeline.start()
     await consumer.start()
     await producer.start()
 
-    runner = await metrics_app()
+    runner = await metrics_app() if serve_metrics else None
 
     queue: asyncio.Queue = asyncio.Queue()
     stop_event = asyncio.Event()
@@ -194,8 +660,45 @@ async def main() -> None:
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, stop_event.set)
 
-    consume_task = asyncio.create_task(consume_loop(consumer, queue, stop_event, logger))
-    process_task = asyncio.create_task(process_loop(consumer, producer, queue, stop_event, logger))
+    buffer = InFlightBuffer(consumer, settings.ORCH_MAX_INFLIGHT_BYTES)
+    pool = PartitionWorkerPool(
+        producer,
+        consumer._group_id,
+        logger,
+        max_concurrency=settings.ORCH_MAX_CONCURRENCY,
+        max_records=settings.ORCH_BATCH_MAX_RECORDS,
+        linger_ms=settings.ORCH_BATCH_LINGER_MS,
+        buffer=buffer,
+    )
+    consumer.subscribe(
+        ["rau_events"],
+        listener=OrchestratorRebalanceListener(consumer, queue, pool, logger, buffer=buffer),
+    )
+    consume_task = asyncio.create_task(
+        consume_loop(
+            consumer,
+            queue,
+            stop_event,
+            logger,
+            buffer=buffer,
+            max_records=settings.ORCH_FETCH_MAX_RECORDS,
+            timeout_ms=settings.ORCH_FETCH_TIMEOUT_MS,
+        )
+    )
+    process_task = asyncio.create_task(
+        process_loop(
+            consumer,
+            producer,
+            queue,
+            stop_event,
+            logger,
+            buffer=buffer,
+            pool=pool,
+        )
+    )
+    lag_task = asyncio.create_task(
+        lag_loop(consumer, stop_event, logger, interval=settings.ORCH_LAG_SAMPLE_INTERVAL)
+    )
 
     try:
         await stop_event.wait()
@@ -205,10 +708,172 @@ async def main() -> None:
             producer,
             runner,
             stop_event,
-            (consume_task, process_task),
+            (consume_task, process_task, lag_task),
             logger,
         )
+        await pipeline.stop()
+
+
+def _worker_entry(index: int) -> None:
+    os.environ["ORCH_WORKER_INDEX"] = str(index)
+    # the supervisor owns SIGINT; workers stop on the SIGTERM it forwards
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(main(serve_metrics=False))
+
+
+class RestartBackoff:
+    """Restart schedule of one worker slot.
+
+    Each exit within ``healthy_uptime`` of the worker's start doubles the
+    restart delay, from ``base`` up to ``cap``; an exit after a healthy run
+    resets it. :meth:`exited` returns ``None`` once ``max_failures`` fast
+    exits happened in a row, meaning the slot should be given up.
+    """
+
+    def __init__(self, base: float, cap: float, healthy_uptime: float, max_failures: int) -> None:
+        self._base = base
+        self._cap = cap
+        self._healthy_uptime = healthy_uptime
+        self._max_failures = max_failures
+        self.failures = 0
+
+    def exited(self, uptime: float) -> Optional[float]:
+        if uptime >= self._healthy_uptime:
+            self.failures = 0
+        self.failures += 1
+        if self.failures > self._max_failures:
+            return None
+        return min(self._base * 2 ** (self.failures - 1), self._cap)
+
+
+async def supervise(
+    workers: int,
+    restart_delay: float = 1.0,
+    max_restart_delay: float = 60.0,
+    healthy_uptime: float = 60.0,
+    max_fast_failures: int = 10,
+) -> None:
+    """Run ``workers`` orchestrator processes, restarting any that die.
+
+    Every worker joins the ``ai-orchestrator`` consumer group with its own
+    transactional id. Workers write metrics to ``PROMETHEUS_MULTIPROC_DIR``
+    and the supervisor serves the aggregate on the usual metrics port.
+
+    A crashing worker is restarted with exponential backoff (see
+    :class:`RestartBackoff`) and abandoned after ``max_fast_failures``
+    consecutive exits within ``healthy_uptime`` seconds; the supervisor
+    fails once no worker is left.
+    """
+    logger = configure_logging(os.getenv("ENVIRONMENT", "dev")).bind(role="supervisor")
+    metrics_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(metrics_registry)
+    runner = await metrics_app(metrics_registry)
+
+    ctx = multiprocessing.get_context("spawn")
+    procs: Dict[int, multiprocessing.process.BaseProcess] = {}
+    started: Dict[int, float] = {}
+    restart_at: Dict[int, float] = {}
+    backoff = {
+        index: RestartBackoff(restart_delay, max_restart_delay, healthy_uptime, max_fast_failures)
+        for index in range(workers)
+    }
+
+    def start(index: int) -> None:
+        proc = ctx.Process(target=_worker_entry, args=(index,), name=f"orchestrator-{index}")
+        proc.start()
+        procs[index] = proc
+        started[index] = time.monotonic()
+        logger.info("worker_started", worker=index, pid=proc.pid)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    for index in range(workers):
+        start(index)
+    try:
+        while not stop_event.is_set():
+            now = time.monotonic()
+            for index, proc in list(procs.items()):
+                if proc.is_alive():
+                    continue
+                del procs[index]
+                multiprocess.mark_process_dead(proc.pid)
+                delay = backoff[index].exited(now - started[index])
+                logger.warning(
+                    "worker_exited", worker=index, pid=proc.pid, exitcode=proc.exitcode, restart_in=delay
+                )
+                if delay is None:
+                    logger.error("worker_abandoned", worker=index, failures=max_fast_failures)
+                else:
+                    restart_at[index] = now + delay
+            for index, when in list(restart_at.items()):
+                if when <= now:
+                    del restart_at[index]
+                    start(index)
+            if not procs and not restart_at:
+                raise RuntimeError(f"all {workers} workers failed {max_fast_failures} times in a row")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop_event.wait(), restart_delay)
+    finally:
+        for proc in procs.values():
+            proc.terminate()
+        for proc in procs.values():
+            await loop.run_in_executor(None, proc.join)
+            multiprocess.mark_process_dead(proc.pid)
+        await runner.cleanup()
+        logger.info("supervisor_stopped")
+
+
+def cli(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m ai_service.kafka_orchestrator")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("ORCH_WORKERS", "1")),
+        help="number of orchestrator processes (default: 1, in-process)",
+    )
+    sub = parser.add_subparsers(dest="command")
+    rp = sub.add_parser("replay", help="re-score historical events at full speed, without transactions")
+    src = rp.add_mutually_exclusive_group()
+    src.add_argument("--file", help="read events from a local .jsonl or .parquet file")
+    src.add_argument("--topic", default="rau_events", help="topic to replay (default: rau_events)")
+    start = rp.add_mutually_exclusive_group()
+    start.add_argument("--from-offset", type=int, help="first offset of every partition")
+    start.add_argument("--from-timestamp", type=parse_timestamp_ms, help="epoch ms or ISO 8601")
+    end = rp.add_mutually_exclusive_group()
+    end.add_argument("--to-offset", type=int, help="stop before this offset (default: current end)")
+    end.add_argument("--to-timestamp", type=parse_timestamp_ms, help="epoch ms or ISO 8601")
+    rp.add_argument("--concurrency", type=int, default=256, help="events in flight (default: 256)")
+    rp.add_argument("--batch-size", type=int, default=500, help="alerts per bulk write (default: 500)")
+    args = parser.parse_args(argv)
+    if args.command == "replay":
+        settings = Settings()
+        configure_logging(settings.ENVIRONMENT)
+        asyncio.run(
+            run_replay(
+                settings,
+                file=args.file,
+                topic=args.topic,
+                from_offset=args.from_offset,
+                from_timestamp=args.from_timestamp,
+                to_offset=args.to_offset,
+                to_timestamp=args.to_timestamp,
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+            )
+        )
+        return
+    if args.workers <= 1:
+        asyncio.run(main())
+        return
+    # must be set before workers import prometheus_client
+    os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="ai-orchestrator-metrics-")
+    )
+    asyncio.run(supervise(args.workers))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    cli()
@@ -1,9 +1,379 @@
+"""Event Pipeline
+----------------
+
+Staged processing of raw events: normalize → score → label → emit.
+
+Every stage owns a bounded :class:`asyncio.Queue` and a configurable number
+of worker tasks, so a slow stage applies backpressure to the ones before it
+instead of growing memory. Synchronous stages (normalization, the blocking
+OpenAI call) run in a thread pool to keep the event loop free for Kafka
+heartbeats. Normalize workers take every job already waiting, up to a
+batch size, into one thread pool call, so a busy stage pays one executor
+hop per batch rather than per event. Per-stage queue depth and latency are exported so the
+bottleneck stage is visible.
+
+The emit stage returns the alert as a ``(topic, value, headers)`` output, so
+the orchestrator publishes it in the same Kafka transaction as the consumed
+offsets. Alert rows are written to Postgres beforehand, grouped across emit
+workers by :class:`AlertBatcher`; the insert is idempotent per event, so a
+batch replayed after an aborted transaction does not duplicate them.
+
+The orchestrator drives the pipeline through :func:`process_event`.
+"""
+
+from __future__ import annotations
+
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .app import codec
+from .app.metrics import PIPELINE_STAGE_QUEUE_DEPTH, PIPELINE_STAGE_SECONDS
+from .app.normalize import CompactEvent, NormalizationError, Normalizer
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .app.labeler import GPTLabel
+    from .app.scoring_engine import ScoreResult
+    from .settings import Settings
+
+Output = Optional[Tuple[str, bytes, Dict[str, str]]]
+
+STAGES = ("normalize", "score", "label", "emit")
+DEFAULT_CONCURRENCY = {"normalize": 4, "score": 256, "label": 8, "emit": 64}
+
+
+class _Job:
+    __slots__ = ("raw", "future", "event", "scores", "label")
+
+    def __init__(self, raw: Dict[str, Any], future: asyncio.Future) -> None:
+        self.raw = raw
+        self.future = future
+        self.event: CompactEvent | None = None
+        self.scores: ScoreResult | None = None
+        self.label: GPTLabel | None = None
+
+
+class Pipeline:
+    """Bounded, multi-stage event pipeline.
+
+    ``score`` is awaited on the loop; ``label`` is a blocking callable run in
+    the thread pool; ``emit`` persists the alert and returns the output
+    :meth:`submit` resolves with. ``concurrency`` maps stage name to worker
+    count and ``queue_size`` bounds every stage queue; a normalize worker
+    handles at most ``normalize_batch_size`` queued jobs per thread pool call.
+    """
+
+    def __init__(
+        self,
+        *,
+        score: Callable[[CompactEvent], Awaitable[ScoreResult]],
+        label: Callable[[CompactEvent, ScoreResult], GPTLabel],
+        emit: Callable[[CompactEvent, ScoreResult, GPTLabel], Awaitable[Output]],
+        concurrency: Mapping[str, int] | None = None,
+        queue_size: int = 1000,
+        normalize_batch_size: int = 64,
+        on_start: Callable[[], Awaitable[None]] | None = None,
+        on_stop: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        self._score = score
+        self._label = label
+        self._emit = emit
+        self._concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self._queue_size = queue_size
+        self._normalize_batch_size = normalize_batch_size
+        self._on_start = on_start
+        self._on_stop = on_stop
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        global _current
+        if self._on_start is not None:
+            await self._on_start()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._concurrency["normalize"] + self._concurrency["label"],
+            thread_name_prefix="pipeline",
+        )
+        handlers = {
+            "score": self._score_stage,
+            "label": self._label_stage,
+            "emit": self._emit_stage,
+        }
+        for name in STAGES:
+            self._queues[name] = asyncio.Queue(maxsize=self._queue_size)
+        for index, name in enumerate(STAGES):
+            nxt = self._queues[STAGES[index + 1]] if index + 1 < len(STAGES) else None
+            for _ in range(self._concurrency[name]):
+                if name == "normalize":
+                    worker = self._normalize_worker(self._queues[name], nxt)
+                else:
+                    worker = self._worker(name, handlers[name], self._queues[name], nxt)
+                self._tasks.append(asyncio.create_task(worker))
+        _current = self
+
+    async def stop(self) -> None:
+        global _current
+        if _current is self:
+            _current = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for queue in self._queues.values():
+            while not queue.empty():
+                job = queue.get_nowait()
+                if not job.future.done():
+                    job.future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._on_stop is not None:
+            await self._on_stop()
+
+    async def submit(self, raw: Dict[str, Any]) -> Output:
+        """Queue ``raw`` and wait for the pipeline to finish with it.
+
+        Returns what ``emit`` returned, or a ``(topic, value, headers)``
+        tuple for events that fail normalization; a tuple must be published
+        by the caller. Raises :class:`asyncio.CancelledError` if the
+        pipeline is stopped first.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queues["normalize"].put(_Job(raw, future))
+        PIPELINE_STAGE_QUEUE_DEPTH.labels(stage="normalize").set(self._queues["normalize"].qsize())
+        return await future
+
+    # ------------------------------------------------------------------
+    async def _worker(
+        self,
+        name: str,
+        handler: Callable[[_Job], Awaitable[bool]],
+        queue: asyncio.Queue,
+        nxt: asyncio.Queue | None,
+    ) -> None:
+        depth = PIPELINE_STAGE_QUEUE_DEPTH.labels(stage=name)
+        latency = PIPELINE_STAGE_SECONDS.labels(stage=name)
+        while True:
+            job = await queue.get()
+            depth.set(queue.qsize())
+            try:
+                start = time.perf_counter()
+                try:
+                    forward = await handler(job)
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                    continue
+                finally:
+                    latency.observe(time.perf_counter() - start)
+                if forward and nxt is not None:
+                    await nxt.put(job)
+            except asyncio.CancelledError:
+                # stopped mid-job: release the caller waiting in submit
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+
+    async def _normalize_worker(self, queue: asyncio.Queue, nxt: asyncio.Queue) -> None:
+        depth = PIPELINE_STAGE_QUEUE_DEPTH.labels(stage="normalize")
+        latency = PIPELINE_STAGE_SECONDS.labels(stage="normalize")
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await queue.get()]
+            while len(jobs) < self._normalize_batch_size and not queue.empty():
+                jobs.append(queue.get_nowait())
+            depth.set(queue.qsize())
+            try:
+                start = time.perf_counter()
+                results = await loop.run_in_executor(self._executor, _normalize_many, [job.raw for job in jobs])
+                elapsed = time.perf_counter() - start
+                for job, result in zip(jobs, results):
+                    latency.observe(elapsed)
+                    if isinstance(result, CompactEvent):
+                        job.event = result
+                        await nxt.put(job)
+                    elif job.future.done():
+                        continue
+                    elif isinstance(result, NormalizationError):
+                        job.future.set_result(
+                            (
+                                "rau_events_dlq",
+                                codec.dumps(job.raw),
+                                {"reason": "normalization_error", "error": str(result)},
+                            )
+                        )
+                    else:
+                        job.future.set_exception(result)
+            except asyncio.CancelledError:
+                # stopped mid-batch: release the callers waiting in submit
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.cancel()
+                raise
+
+    async def _score_stage(self, job: _Job) -> bool:
+        job.scores = await self._score(job.event)
+        return True
+
+    async def _label_stage(self, job: _Job) -> bool:
+        loop = asyncio.get_running_loop()
+        job.label = await loop.run_in_executor(self._executor, self._label, job.event, job.scores)
+        return True
+
+    async def _emit_stage(self, job: _Job) -> bool:
+        output = await self._emit(job.event, job.scores, job.label)
+        if not job.future.done():
+            job.future.set_result(output)
+        return False
+
+
+def _normalize_many(raws: Sequence[Dict[str, Any]]) -> List[CompactEvent | Exception]:
+    # per-event normalize, not normalize_batch: the later stages take
+    # CompactEvents, and rebuilding those from the columnar batch costs
+    # more than the batch parse saves
+    results: List[CompactEvent | Exception] = []
+    for raw in raws:
+        try:
+            results.append(Normalizer.normalize(raw))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class AlertBatcher:
+    """Group items added by concurrent emit workers into one ``write`` call.
+
+    A batch is written once ``max_batch`` items are waiting or ``linger_ms``
+    after its first item arrived; :meth:`add` returns when its batch has
+    been written and raises if the write failed.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Sequence[Any]], Awaitable[None]],
+        max_batch: int = 500,
+        linger_ms: float = 5.0,
+    ) -> None:
+        self._write = write
+        self._max_batch = max_batch
+        self._linger = linger_ms / 1000.0
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set = set()
+
+    async def add(self, item: Any) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._linger, self._flush)
+        await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._write_batch(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write_batch(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            await self._write([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+_current: Pipeline | None = None
+
+
+def build_pipeline(
+    settings: Settings,
+    emit: Callable[[CompactEvent, ScoreResult, GPTLabel], Awaitable[Output]] | None = None,
+) -> Pipeline:
+    """Wire the scoring engine, GPT labeler and alert emitter into a pipeline.
+
+    By default alerts are inserted in batches and returned as ``alerts``
+    outputs for the orchestrator's transaction. ``emit`` replaces that, e.g.
+    with a bulk writer for replays.
+    """
+    from .app.alert_emitter import AlertIn, emitter
+    from .app.labeler import label_event
+    from .app.scoring_engine import ScoringEngine
+    from .app.sharding import ShardedScoringEngine
+
+    scoring = dict(
+        max_batch_size=settings.SCORING_MAX_BATCH_SIZE,
+        max_wait_ms=settings.SCORING_MAX_WAIT_MS,
+        history_capacity=settings.SCORING_HISTORY_CAPACITY,
+        history_ttl=settings.SCORING_HISTORY_TTL,
+        lstm_mode=settings.SCORING_LSTM_MODE,
+        lstm_backend=settings.SCORING_LSTM_BACKEND,
+        lstm_precision=settings.SCORING_LSTM_PRECISION,
+    )
+    engine: ScoringEngine | ShardedScoringEngine
+    if settings.SCORING_SHARDS > 0:
+        engine = ShardedScoringEngine(settings.MODEL_DIR, shards=settings.SCORING_SHARDS, **scoring)
+    else:
+        engine = ScoringEngine(
+            settings.MODEL_DIR,
+            executor=settings.SCORING_EXECUTOR,
+            workers=settings.SCORING_EXECUTOR_WORKERS,
+            **scoring,
+        )
+
+    async def persist(items: Sequence[Tuple[AlertIn, bytes]]) -> None:
+        await emitter.persist_many([alert for alert, _ in items], [event_json for _, event_json in items])
+
+    writer = AlertBatcher(persist, settings.PIPELINE_EMIT_BATCH_SIZE, settings.PIPELINE_EMIT_LINGER_MS)
+
+    async def emit_alert(event: CompactEvent, scores: ScoreResult, label: GPTLabel) -> Output:
+        alert = AlertIn(event=event, scores=scores, label=label)
+        output, event_json = emitter.output(alert)
+        await writer.add((alert, event_json))
+        return output
+
+    async def start() -> None:
+        await emitter.init()
+        if isinstance(engine, ShardedScoringEngine):
+            engine.resize_on_signals()
+
+    async def stop() -> None:
+        await engine.close()
+        await emitter.close()
+
+    return Pipeline(
+        score=engine.submit,
+        label=label_event,
+        emit=emit or emit_alert,
+        concurrency={
+            "normalize": settings.PIPELINE_NORMALIZE_CONCURRENCY,
+            "score": settings.PIPELINE_SCORE_CONCURRENCY,
+            "label": settings.PIPELINE_LABEL_CONCURRENCY,
+            "emit": settings.PIPELINE_EMIT_CONCURRENCY,
+        },
+        queue_size=settings.PIPELINE_QUEUE_SIZE,
+        normalize_batch_size=settings.PIPELINE_NORMALIZE_BATCH_SIZE,
+        on_start=start,
+        on_stop=stop,
+    )
+
 
-async def process_event(event: dict):
-    """Dummy pipeline processing; returns topic, value, headers."""
-    await asyncio.sleep(0)  # simulate async work
-    if event.get("bad_json"):
-        # for tests: event indicates should go to DLQ
-        return "rau_events_dlq", {"error": "bad"}, {"reason": "bad_event"}
-    return "alerts", event, {}
+async def process_event(event: dict) -> Output:
+    """Run ``event`` through the running pipeline; see :meth:`Pipeline.submit`."""
+    if _current is None:
+        raise RuntimeError("pipeline not started")
+    return await _current.submit(event)
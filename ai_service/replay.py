@@ -0,0 +1,336 @@
+"""Replay / Backfill
+-------------------
+
+Re-run historical ``rau_events`` through :func:`ai_service.pipeline.process_event`
+at full speed, e.g. to re-score after a model change.
+
+Unlike the live orchestrator there is no consumer group and no per-record
+transaction: records are read from an offset or timestamp range of the topic,
+or from a local JSONL/Parquet file, pushed through the pipeline with many
+events in flight, and alerts are written in bulk. Events/s and p50/p99
+latency are logged when the replay finishes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import datetime as _dt
+import math
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, TopicPartition
+from aiokafka.helpers import create_ssl_context
+import structlog
+
+from .app import codec
+from .app.log_config import get_logger
+from .pipeline import build_pipeline, process_event
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .app.alert_emitter import AlertEmitter
+    from .settings import Settings
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets from 1 µs to 1000 s, ``per_decade`` per
+    decade, so percentiles of any number of samples take constant memory.
+
+    A percentile is reported as the upper bound of its bucket: within
+    ``10 ** (1 / per_decade)`` (about 5 % for the default) of the true value.
+    """
+
+    def __init__(self, per_decade: int = 50) -> None:
+        self.bounds = [10 ** (k / per_decade - 6) for k in range(9 * per_decade + 1)]
+        # the last bucket takes everything above the largest bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(q * self.total))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]  # pragma: no cover - counts sum to total
+
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latencies: LatencyHistogram = field(default_factory=LatencyHistogram, repr=False)
+
+    def percentile(self, q: float) -> float:
+        return self.latencies.percentile(q)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed, 3),
+            "events_per_sec": round(self.events / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+        }
+
+
+class BulkAlertWriter:
+    """Pipeline ``emit`` callable that buffers alerts for :meth:`AlertEmitter.emit_many`."""
+
+    def __init__(self, emitter: AlertEmitter, batch_size: int = 500) -> None:
+        self._emitter = emitter
+        self._batch_size = batch_size
+        self._buffer: List[Any] = []
+
+    async def add(self, event: Any, scores: Any, label: Any) -> None:
+        from .app.alert_emitter import AlertIn
+
+        self._buffer.append(AlertIn(event=event, scores=scores, label=label))
+        if len(self._buffer) >= self._batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._buffer = self._buffer, []
+        await self._emitter.emit_many(batch)
+
+
+# ---------------------------------------------------------------- sources
+def parse_timestamp_ms(value: str) -> int:
+    """Parse epoch milliseconds or an ISO 8601 timestamp into epoch ms."""
+    if value.isdigit():
+        return int(value)
+    dt = _dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_dt.timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+async def iter_file(path: str | Path) -> AsyncIterator[Any]:
+    """Yield raw events from a ``.jsonl`` file (bytes per line) or a ``.parquet`` file (dicts)."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:  # pragma: no cover - optional dependency
+            raise RuntimeError("replaying Parquet files requires pyarrow") from e
+        for batch in pq.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                yield row
+            await asyncio.sleep(0)
+        return
+    with open(path, "rb") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if line:
+                yield line
+            if n % 1000 == 0:
+                await asyncio.sleep(0)
+
+
+async def iter_kafka(
+    consumer: AIOKafkaConsumer,
+    topic: str,
+    *,
+    from_offset: Optional[int] = None,
+    from_timestamp: Optional[int] = None,
+    to_offset: Optional[int] = None,
+    to_timestamp: Optional[int] = None,
+    max_records: int = 5000,
+) -> AsyncIterator[bytes]:
+    """Yield record values of every partition of ``topic`` within the given range.
+
+    The range end defaults to the end offsets at the time the replay starts,
+    so a replay of a live topic terminates; ``to_offset`` is clamped to
+    them. A partition is done once the consumer's position reaches its end:
+    the last offsets of a range may be transaction markers, which a
+    ``read_committed`` consumer skips without returning a record.
+    """
+    partitions = [TopicPartition(topic, p) for p in sorted(consumer.partitions_for_topic(topic) or ())]
+    consumer.assign(partitions)
+    earliest = await consumer.beginning_offsets(partitions)
+    latest = await consumer.end_offsets(partitions)
+    if to_timestamp is not None:
+        found = await consumer.offsets_for_times({tp: to_timestamp for tp in partitions})
+        end = {tp: (found[tp].offset if found.get(tp) else latest[tp]) for tp in partitions}
+    elif to_offset is not None:
+        end = {tp: min(to_offset, latest[tp]) for tp in partitions}
+    else:
+        end = latest
+    if from_timestamp is not None:
+        found = await consumer.offsets_for_times({tp: from_timestamp for tp in partitions})
+        # no record at or after the timestamp: nothing to replay
+        start = {tp: (found[tp].offset if found.get(tp) else end[tp]) for tp in partitions}
+    else:
+        start = {tp: max(from_offset or 0, earliest[tp]) for tp in partitions}
+
+    remaining = set()
+    for tp in partitions:
+        begin = start[tp]
+        if begin < end[tp]:
+            consumer.seek(tp, begin)
+            remaining.add(tp)
+        else:
+            consumer.pause(tp)
+
+    while remaining:
+        batches = await consumer.getmany(*remaining, timeout_ms=1000, max_records=max_records)
+        for tp, msgs in batches.items():
+            for msg in msgs:
+                if msg.offset >= end[tp]:
+                    break
+                yield msg.value
+        for tp in list(remaining):
+            if await consumer.position(tp) >= end[tp]:
+                remaining.discard(tp)
+                consumer.pause(tp)
+
+
+# ---------------------------------------------------------------- replay
+# processing errors logged with a traceback: the first few, then a sample
+FAILURE_LOG_FIRST = 10
+FAILURE_LOG_EVERY = 1000
+
+
+async def replay_events(
+    source: AsyncIterator[Any],
+    producer: Optional[AIOKafkaProducer],
+    *,
+    concurrency: int = 256,
+    logger: Optional[structlog.BoundLogger] = None,
+) -> ReplayStats:
+    """Push every event of ``source`` through the pipeline, ``concurrency`` at a time.
+
+    Pipeline outputs (e.g. DLQ records) are sent without a transaction and
+    awaited in bulk. Records that fail to decode go to ``rau_events_dlq``
+    as in the live orchestrator, and count as failed. Events whose
+    processing raises are logged with their traceback (the first
+    ``FAILURE_LOG_FIRST``, then every ``FAILURE_LOG_EVERY``th) and count as
+    failed. Raises :class:`RuntimeError` if every event failed.
+    """
+    logger = logger or get_logger(service="ai-replay")
+    stats = ReplayStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    pending: List[asyncio.Future] = []
+
+    async def worker() -> None:
+        while True:
+            raw = await queue.get()
+            start = time.perf_counter()
+            try:
+                try:
+                    event = codec.loads(raw) if isinstance(raw, (bytes, bytearray, str)) else raw
+                except codec.DecodeError:
+                    stats.failed += 1
+                    if producer is not None:
+                        value = raw.encode("utf-8") if isinstance(raw, str) else bytes(raw)
+                        pending.append(
+                            await producer.send(
+                                "rau_events_dlq", value, headers=[("reason", b"deserialization_error")]
+                            )
+                        )
+                    continue
+                result = await process_event(event)
+                if result is not None and producer is not None:
+                    topic, value, headers = result
+                    headers = [(str(k), str(v).encode("utf-8")) for k, v in (headers or {}).items()]
+                    pending.append(await producer.send(topic, value, headers=headers))
+                stats.latencies.record(time.perf_counter() - start)
+                stats.events += 1
+            except Exception:
+                stats.failed += 1
+                if stats.failed <= FAILURE_LOG_FIRST or stats.failed % FAILURE_LOG_EVERY == 0:
+                    logger.exception("replay_event_failed", failed=stats.failed)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    begin = time.perf_counter()
+    try:
+        async for raw in source:
+            await queue.put(raw)
+            if len(pending) >= 10000:
+                batch, pending[:] = list(pending), []
+                await asyncio.gather(*batch)
+        await queue.join()
+        await asyncio.gather(*pending)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    stats.elapsed = time.perf_counter() - begin
+    if stats.failed and not stats.events:
+        raise RuntimeError(f"replay failed: none of {stats.failed} events succeeded")
+    return stats
+
+
+async def run_replay(
+    settings: Settings,
+    *,
+    file: Optional[str] = None,
+    topic: str = "rau_events",
+    from_offset: Optional[int] = None,
+    from_timestamp: Optional[int] = None,
+    to_offset: Optional[int] = None,
+    to_timestamp: Optional[int] = None,
+    concurrency: int = 256,
+    batch_size: int = 500,
+    logger: Optional[structlog.BoundLogger] = None,
+) -> ReplayStats:
+    from .app.alert_emitter import emitter
+
+    logger = logger or get_logger(service="ai-replay")
+    kafka_opts = dict(
+        bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+        security_protocol=settings.KAFKA_SECURITY_PROTOCOL,
+        sasl_mechanism=settings.KAFKA_SASL_MECHANISM,
+        sasl_plain_username=settings.KAFKA_SASL_USERNAME,
+        sasl_plain_password=settings.KAFKA_SASL_PASSWORD,
+        ssl_context=create_ssl_context(cafile=settings.KAFKA_SSL_CA) if settings.KAFKA_SSL_CA else None,
+    )
+    writer = BulkAlertWriter(emitter, batch_size=batch_size)
+    pipeline = build_pipeline(settings, emit=writer.add)
+    producer = AIOKafkaProducer(linger_ms=50, enable_idempotence=True, **kafka_opts)
+    consumer: Optional[AIOKafkaConsumer] = None
+    await pipeline.start()
+    await producer.start()
+    try:
+        if file is not None:
+            source = iter_file(file)
+        else:
+            consumer = AIOKafkaConsumer(
+                group_id=None,
+                enable_auto_commit=False,
+                isolation_level="read_committed",
+                **kafka_opts,
+            )
+            await consumer.start()
+            await consumer.topics()  # populate metadata for partitions_for_topic
+            source = iter_kafka(
+                consumer,
+                topic,
+                from_offset=from_offset,
+                from_timestamp=from_timestamp,
+                to_offset=to_offset,
+                to_timestamp=to_timestamp,
+            )
+        stats = await replay_events(source, producer, concurrency=concurrency, logger=logger)
+        await writer.flush()
+    finally:
+        if consumer is not None:
+            await consumer.stop()
+        await producer.stop()
+        await pipeline.stop()
+    logger.info("replay_complete", source=file or topic, **stats.as_dict())
+    return stats
@@ -8,10 +8,38 @@ class Settings(BaseSettings):
 
     # Kafka
     KAFKA_BOOTSTRAP_SERVERS: str
+    KAFKA_SECURITY_PROTOCOL: str = "PLAINTEXT"
+    KAFKA_SASL_MECHANISM: str = "PLAIN"
     KAFKA_SASL_USERNAME: str | None = None
     KAFKA_SASL_PASSWORD: str | None = None
     KAFKA_SSL_CA: str | None = None   # path to CA file
 
+    # Orchestrator fetching and backpressure
+    ORCH_FETCH_MAX_RECORDS: int = 500
+    ORCH_FETCH_TIMEOUT_MS: int = 100
+    ORCH_MAX_INFLIGHT_BYTES: int = 64 * 1024 * 1024
+    # Orchestrator batching: one transaction per batch of records
+    ORCH_BATCH_MAX_RECORDS: int = 500
+    ORCH_BATCH_LINGER_MS: int = 50
+    # Partitions processed concurrently by the worker pool
+    ORCH_MAX_CONCURRENCY: int = 8
+    # Seconds between per-partition consumer lag samples
+    ORCH_LAG_SAMPLE_INTERVAL: float = 5.0
+
+    # Pipeline: bounded queue and worker count per stage
+    PIPELINE_QUEUE_SIZE: int = 1000
+    PIPELINE_NORMALIZE_CONCURRENCY: int = 4
+    # queued events a normalize worker hands to the thread pool at once
+    PIPELINE_NORMALIZE_BATCH_SIZE: int = 64
+    # score workers only wait on the scoring batcher; more of them make bigger
+    # batches, so keep this at least SCORING_MAX_BATCH_SIZE
+    PIPELINE_SCORE_CONCURRENCY: int = 256
+    PIPELINE_LABEL_CONCURRENCY: int = 8
+    # emit workers wait on the alert insert batcher, like score workers
+    PIPELINE_EMIT_CONCURRENCY: int = 64
+    PIPELINE_EMIT_BATCH_SIZE: int = 500
+    PIPELINE_EMIT_LINGER_MS: float = 5.0
+
     # Postgres
     PG_HOST: str
     PG_PORT: int = 5432
@@ -22,8 +50,33 @@ class Settings(BaseSettings):
     # OpenAI / models
     OPENAI_API_KEY: str
     MODEL_DIR: str = "models/"
+    # Scoring batcher: flush at this many events or after this long
+    SCORING_MAX_BATCH_SIZE: int = 256
+    SCORING_MAX_WAIT_MS: float = 2.0
+    # Model inference runs off the event loop in a "thread" or "process" pool;
+    # workers > 1 overlaps batches in "windowed" mode only, since incremental
+    # batches share the LSTM state (use SCORING_SHARDS to parallelize those)
+    SCORING_EXECUTOR: str = "thread"
+    SCORING_EXECUTOR_WORKERS: int = 1
+    # Per-user LSTM history: users kept, and seconds idle before eviction
+    SCORING_HISTORY_CAPACITY: int = 20000
+    SCORING_HISTORY_TTL: float = 3600.0
+    # "windowed" re-runs the window; "incremental" steps each user's kept LSTM
+    # state, which is cheaper but drifts from the windowed score once a
+    # user's window is full (within 5% in tests), so it is opt-in
+    SCORING_LSTM_MODE: str = "windowed"
+    # LSTM runtime: "tf", "numpy", "tflite" or "onnx" (see app/lstm_backends.py)
+    SCORING_LSTM_BACKEND: str = "tf"
+    # "float16" / "int8" load a quantized TFLite variant (tflite backend only).
+    # They save model size, not latency: int8 steps are ~20% slower than
+    # float32 (see windows_per_sec in the variant's report)
+    SCORING_LSTM_PRECISION: str = "float32"
+    # >0 scores in this many worker processes sharded by user (app/sharding.py);
+    # SCORING_EXECUTOR then does not apply and the history capacity is per shard
+    SCORING_SHARDS: int = 0
 
     LOG_LEVEL: str = "INFO"
+    ENVIRONMENT: str = "dev"
 
     class Config:
         env_file = ".env"
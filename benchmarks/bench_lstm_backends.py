@@ -0,0 +1,83 @@
+"""LSTM backend latency benchmark
+--------------------------------
+
+Times each backend in :mod:`ai_service.app.lstm_backends` on the models in
+``models/``: load time, a full-window reconstruction (windowed scoring) and
+a single step (incremental scoring) at several batch sizes. Backends whose
+runtime or exported file is missing are reported with an ``error``.
+
+Usage::
+
+    python -m trainer.train_lstm --export-only
+    python -m benchmarks.bench_lstm_backends --batch 1 16 128
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ai_service.app.lstm_backends import BACKENDS, load_backend
+
+
+def _time_per_call(fn: Callable[[], Any], number: int) -> float:
+    fn()
+    best = float("inf")
+    # best of three damps scheduler noise
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+
+def run_benchmark(
+    model_dir: str = "models",
+    backends: Sequence[str] = tuple(BACKENDS),
+    batches: Sequence[int] = (1, 16, 128),
+    window: int = 50,
+    number: int = 20,
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(0)
+    results = []
+    for name in backends:
+        start = time.perf_counter()
+        try:
+            backend = load_backend(name, model_dir)
+        except Exception as e:
+            results.append({"backend": name, "error": str(e)})
+            continue
+        load_s = time.perf_counter() - start
+        for batch in batches:
+            seq = rng.random((batch, window, 32), dtype=np.float32)
+            state = backend.initial_state(batch)
+            results.append(
+                {
+                    "backend": name,
+                    "batch": batch,
+                    "load_s": round(load_s, 3),
+                    "window_us": round(_time_per_call(lambda: backend.reconstruct(seq), number), 1),
+                    "step_us": round(_time_per_call(lambda: backend.step(seq[:, 0], state), number * 10), 1),
+                }
+            )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_lstm_backends")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--backend", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--number", type=int, default=20, help="window calls per batch size")
+    args = parser.parse_args(argv)
+    for result in run_benchmark(args.model_dir, args.backend, args.batch, number=args.number):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Orchestrator throughput benchmark
+-----------------------------------
+
+Drives ``consume_loop`` and ``process_loop`` against the in-memory broker
+from :mod:`benchmarks.fake_kafka` and reports messages/s plus end-to-end
+latency percentiles (append to the input topic → offset committed).
+``process_event`` is replaced by an echo with optional simulated work, so
+the numbers measure the orchestrator itself rather than the models.
+
+Usage::
+
+    python -m benchmarks.bench_orchestrator --messages 20000 --size 512 \\
+        --partitions 8 --latency-ms 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# the orchestrator imports Settings, which requires these; none are used here
+for _name in ("KAFKA_BOOTSTRAP_SERVERS", "PG_HOST", "PG_DB", "PG_USER", "PG_PASS", "OPENAI_API_KEY"):
+    os.environ.setdefault(_name, "unused")
+
+from ai_service import kafka_orchestrator as orchestrator  # noqa: E402
+
+from .fake_kafka import FakeBroker, FakeConsumer, FakeProducer  # noqa: E402
+
+TOPIC = "rau_events"
+GROUP = "ai-orchestrator"
+
+
+class _QuietLogger:
+    def bind(self, **_kw: Any) -> "_QuietLogger":
+        return self
+
+    def __getattr__(self, _name: str) -> Any:
+        return lambda *a, **kw: None
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _payload(size: int, n: int) -> bytes:
+    base = {
+        "id": f"{n:026d}",
+        "src_ip": f"10.0.{n % 256}.{(n // 256) % 256}",
+        "timestamp": 1_700_000_000 + n,
+        "user_id": str(n % 97),
+    }
+    # pad to ``size`` bytes; the key and quotes add 10 bytes
+    base["pad"] = "x" * max(0, size - len(json.dumps(base)) - 10)
+    return json.dumps(base).encode()
+
+
+async def run_benchmark(
+    *,
+    messages: int = 10000,
+    size: int = 256,
+    partitions: int = 4,
+    latency_ms: float = 0.0,
+    rate: float = 0.0,
+    process_ms: float = 0.0,
+    batch: int = 500,
+    linger_ms: int = 20,
+    concurrency: int = 8,
+    max_inflight_bytes: int = 64 * 1024 * 1024,
+    timeout: float = 300.0,
+) -> Dict[str, Any]:
+    """Run one benchmark and return its summary.
+
+    ``rate`` is messages/s offered to the input topic (``0`` pre-loads every
+    message before starting, measuring peak throughput).
+    """
+    broker = FakeBroker(latency=latency_ms / 1000, partitions=partitions)
+    payloads = [_payload(size, n) for n in range(messages)]
+
+    async def echo(event: Dict[str, Any]) -> Any:
+        if process_ms:
+            await asyncio.sleep(process_ms / 1000)
+        return None
+
+    original = orchestrator.process_event
+    orchestrator.process_event = echo
+    consumer = FakeConsumer(broker, TOPIC, GROUP)
+    producer = FakeProducer(broker)
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = asyncio.Event()
+    logger = _QuietLogger()
+    buffer = orchestrator.InFlightBuffer(consumer, max_inflight_bytes)
+
+    async def feed() -> None:
+        begin = time.perf_counter()
+        for n, payload in enumerate(payloads):
+            if rate:
+                # schedule against the start time so sleep overshoot is caught up
+                delay = begin + n / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            broker.append(TOPIC, payload, partition=n % partitions)
+
+    if not rate:
+        await feed()
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(orchestrator.consume_loop(consumer, queue, stop, logger, buffer=buffer)),
+        asyncio.create_task(
+            orchestrator.process_loop(
+                consumer,
+                producer,
+                queue,
+                stop,
+                logger,
+                max_records=batch,
+                linger_ms=linger_ms,
+                max_concurrency=concurrency,
+                buffer=buffer,
+            )
+        ),
+    ]
+    if rate:
+        tasks.append(asyncio.create_task(feed()))
+    try:
+        while broker.committed_total(GROUP) < messages:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"committed {broker.committed_total(GROUP)}/{messages}")
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        orchestrator.process_event = original
+
+    lat = broker.commit_latencies
+    return {
+        "messages": messages,
+        "size": size,
+        "partitions": partitions,
+        "latency_ms": latency_ms,
+        "batch": batch,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "msgs_per_sec": round(messages / elapsed, 1),
+        "transactions": broker.transactions,
+        "p50_ms": round(percentile(lat, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(lat, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(lat, 0.99) * 1000, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_orchestrator")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--size", type=int, nargs="+", default=[256], help="message sizes in bytes")
+    parser.add_argument("--partitions", type=int, nargs="+", default=[4])
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0.0], help="simulated broker round-trip")
+    parser.add_argument("--rate", type=float, default=0.0, help="offered msgs/s (0: pre-load)")
+    parser.add_argument("--process-ms", type=float, default=0.0, help="simulated pipeline work per event")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--linger-ms", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    for size in args.size:
+        for partitions in args.partitions:
+            for latency_ms in args.latency_ms:
+                result = asyncio.run(
+                    run_benchmark(
+                        messages=args.messages,
+                        size=size,
+                        partitions=partitions,
+                        latency_ms=latency_ms,
+                        rate=args.rate,
+                        process_ms=args.process_ms,
+                        batch=args.batch,
+                        linger_ms=args.linger_ms,
+                        concurrency=args.concurrency,
+                    )
+                )
+                print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
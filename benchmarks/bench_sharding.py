@@ -0,0 +1,98 @@
+"""Sharded scoring benchmark
+-------------------------
+
+Throughput of :class:`~ai_service.app.sharding.ShardedScoringEngine` at
+several shard counts against a single in-process
+:class:`~ai_service.app.scoring_engine.ScoringEngine`, for a stream of
+events from many users submitted concurrently. Reports events per second
+and the time to resize from each shard count to the next.
+
+Usage::
+
+    python -m benchmarks.bench_sharding --shards 1 2 4 --events 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from ai_service.app.normalize import Normalizer
+from ai_service.app.scoring_engine import ScoringEngine
+from ai_service.app.sharding import ShardedScoringEngine
+
+
+def _events(n: int, users: int) -> List[Any]:
+    rng = random.Random(0)
+    return [
+        Normalizer.normalize(
+            {
+                "src_ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                "timestamp": 1700000000 + i,
+                "bytes": rng.randint(0, 10000),
+                "user_id": f"user-{rng.randint(1, users)}",
+                "method": rng.choice(["GET", "POST", "PUT"]),
+                "endpoint": f"/api/{rng.randint(1, 50)}",
+            }
+        )
+        for i in range(n)
+    ]
+
+
+async def _throughput(engine: Any, events: Sequence[Any]) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(engine.submit(event) for event in events))
+    return len(events) / (time.perf_counter() - start)
+
+
+async def _run(model_dir: str, backend: str, shard_counts: Sequence[int], events: Sequence[Any]) -> List[Dict[str, Any]]:
+    results = []
+    single = ScoringEngine(model_dir, lstm_backend=backend, metrics_port=None)
+    try:
+        results.append({"engine": "single", "events_per_sec": round(await _throughput(single, events))})
+    finally:
+        await single.close()
+
+    sharded = ShardedScoringEngine(model_dir, shards=shard_counts[0], lstm_backend=backend)
+    try:
+        for i, shards in enumerate(shard_counts):
+            result: Dict[str, Any] = {"engine": "sharded", "shards": shards}
+            if i:
+                start = time.perf_counter()
+                result["moved_users"] = await sharded.resize(shards)
+                result["resize_s"] = round(time.perf_counter() - start, 3)
+            result["events_per_sec"] = round(await _throughput(sharded, events))
+            results.append(result)
+    finally:
+        await sharded.close()
+    return results
+
+
+def run_benchmark(
+    model_dir: str = "models",
+    backend: str = "numpy",
+    shard_counts: Sequence[int] = (1, 2, 4),
+    events: int = 20000,
+    users: int = 2000,
+) -> List[Dict[str, Any]]:
+    return asyncio.run(_run(model_dir, backend, shard_counts, _events(events, users)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_sharding")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--backend", default="numpy", help="LSTM backend; numpy shares models across forked workers")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    args = parser.parse_args(argv)
+    for result in run_benchmark(args.model_dir, args.backend, args.shards, args.events, args.users):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
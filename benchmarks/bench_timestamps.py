@@ -0,0 +1,97 @@
+"""Timestamp parsing micro-benchmark
+-----------------------------------
+
+Compares ``Normalizer._parse_timestamp`` with the previous parser, which
+sent every string through ``dateutil.parser.isoparse``, for each timestamp
+format seen on ``rau_events``. Reports nanoseconds per call and the speedup.
+
+Usage::
+
+    python -m benchmarks.bench_timestamps --number 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as _dt
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dateutil import parser as dt_parser
+
+from ai_service.app.normalize import Normalizer
+
+SAMPLES: Dict[str, List[Any]] = {
+    "rfc3339_z": ["2024-01-01T12:00:00Z", "2024-06-30T23:59:59.123456Z"],
+    "rfc3339_offset": ["2024-01-01T12:00:00+02:00", "2024-06-30T23:59:59.5-05:30"],
+    "epoch_s": ["1700000000", 1700000000],
+    "epoch_ms": ["1700000000123", 1700000000123],
+    "epoch_us": ["1700000000123456", 1700000000123456],
+    "other": ["20240101T120000Z", "2024-W01-1"],
+}
+
+
+def baseline_parse(value: Any) -> _dt.datetime:
+    """The parser before format detection, for comparison."""
+    if isinstance(value, (int, float)):
+        ts = float(value)
+        if ts > 1e11:
+            ts /= 1000.0
+        return _dt.datetime.fromtimestamp(ts, tz=_dt.timezone.utc)
+    if isinstance(value, str) and value.isdigit():
+        ts = int(value)
+        if ts > 1e11:
+            ts /= 1000.0
+        return _dt.datetime.fromtimestamp(ts, tz=_dt.timezone.utc)
+    dt = dt_parser.isoparse(str(value))
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=_dt.timezone.utc)
+    return dt.astimezone(_dt.timezone.utc)
+
+
+def _time_per_call(parse: Callable[[Any], Any], values: List[Any], number: int) -> Optional[float]:
+    try:
+        for value in values:
+            parse(value)
+    except Exception:
+        # e.g. epoch microseconds, which the baseline cannot parse
+        return None
+    rounds = max(1, number // len(values))
+    best = float("inf")
+    # best of three damps scheduler noise
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for value in values:
+                parse(value)
+        best = min(best, time.perf_counter() - start)
+    return best / (rounds * len(values)) * 1e9
+
+
+def run_benchmark(number: int = 20000) -> List[Dict[str, Any]]:
+    results = []
+    for name, values in SAMPLES.items():
+        fast = _time_per_call(lambda v: Normalizer._parse_timestamp(v, name), values, number)
+        base = _time_per_call(baseline_parse, values, number)
+        results.append(
+            {
+                "format": name,
+                "fast_ns": round(fast, 1),
+                "baseline_ns": round(base, 1) if base is not None else None,
+                "speedup": round(base / fast, 1) if base is not None else None,
+            }
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_timestamps")
+    parser.add_argument("--number", type=int, default=20000, help="calls per format")
+    args = parser.parse_args(argv)
+    for result in run_benchmark(args.number):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""In-memory Kafka stand-in
+---------------------------
+
+Implements the part of the ``AIOKafkaConsumer`` / ``AIOKafkaProducer``
+surface used by :mod:`ai_service.kafka_orchestrator`: bulk fetch,
+pause/resume, highwater, transactional produce and transactional offset
+commits. Everything lives in one process, so benchmarks run on a laptop
+without a broker or network.
+
+Every broker round-trip (fetch, produce acknowledgement, offset commit,
+transaction commit) waits ``latency`` seconds. Records produced inside a
+transaction become visible only when it commits, as with
+``isolation_level="read_committed"``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from aiokafka import OffsetAndMetadata, TopicPartition
+
+
+@dataclass
+class FakeRecord:
+    topic: str
+    partition: int
+    offset: int
+    timestamp: int
+    value: bytes
+    key: Optional[bytes] = None
+    headers: Sequence[Tuple[str, bytes]] = ()
+    timestamp_type: int = 0
+    # perf_counter() at append time, for end-to-end latency
+    appended: float = 0.0
+
+
+@dataclass
+class FakeBroker:
+    """Partitioned logs, committed group offsets and commit latencies."""
+
+    latency: float = 0.0
+    partitions: int = 1
+    logs: Dict[TopicPartition, List[FakeRecord]] = field(default_factory=lambda: defaultdict(list))
+    committed: Dict[Tuple[str, TopicPartition], int] = field(default_factory=dict)
+    # seconds from append to offset commit, one entry per committed record
+    commit_latencies: List[float] = field(default_factory=list)
+    transactions: int = 0
+    aborts: int = 0
+
+    def __post_init__(self) -> None:
+        self._appended = asyncio.Event()
+
+    async def round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def append(self, topic: str, value: bytes, partition: Optional[int] = None, **kw: Any) -> FakeRecord:
+        if partition is None:
+            partition = hash(kw.get("key") or value) % self.partitions
+        log = self.logs[TopicPartition(topic, partition)]
+        now = time.perf_counter()
+        record = FakeRecord(
+            topic=topic,
+            partition=partition,
+            offset=len(log),
+            timestamp=int(time.time() * 1000),
+            value=value,
+            appended=now,
+            **kw,
+        )
+        log.append(record)
+        self._appended.set()
+        return record
+
+    def commit(self, group_id: str, offsets: Dict[TopicPartition, OffsetAndMetadata]) -> None:
+        now = time.perf_counter()
+        for tp, meta in offsets.items():
+            previous = self.committed.get((group_id, tp), 0)
+            for record in self.logs[tp][previous : meta.offset]:
+                self.commit_latencies.append(now - record.appended)
+            self.committed[(group_id, tp)] = max(previous, meta.offset)
+
+    def committed_total(self, group_id: str) -> int:
+        return sum(offset for (group, _), offset in self.committed.items() if group == group_id)
+
+    async def wait_appended(self, timeout: float) -> None:
+        self._appended.clear()
+        try:
+            await asyncio.wait_for(self._appended.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class FakeConsumer:
+    """Consumer assigned to every partition of ``topic``."""
+
+    def __init__(self, broker: FakeBroker, topic: str, group_id: str = "ai-orchestrator") -> None:
+        self._broker = broker
+        self._topic = topic
+        self._group_id = group_id
+        self._assignment = {TopicPartition(topic, p) for p in range(broker.partitions)}
+        self._paused: Set[TopicPartition] = set()
+        self._position = {tp: broker.committed.get((group_id, tp), 0) for tp in self._assignment}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self._assignment)
+
+    def paused(self) -> Set[TopicPartition]:
+        return set(self._paused)
+
+    def pause(self, *partitions: TopicPartition) -> None:
+        self._paused.update(partitions)
+
+    def resume(self, *partitions: TopicPartition) -> None:
+        self._paused.difference_update(partitions)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return len(self._broker.logs[tp])
+
+    def seek(self, tp: TopicPartition, offset: int) -> None:
+        self._position[tp] = offset
+
+    async def position(self, tp: TopicPartition) -> int:
+        return self._position[tp]
+
+    async def getmany(
+        self, *partitions: TopicPartition, timeout_ms: int = 0, max_records: Optional[int] = None
+    ) -> Dict[TopicPartition, List[FakeRecord]]:
+        await self._broker.round_trip()
+        deadline = time.perf_counter() + timeout_ms / 1000
+        while True:
+            out = self._fetch(partitions or tuple(self._assignment), max_records)
+            remaining = deadline - time.perf_counter()
+            if out or remaining <= 0:
+                return out
+            await self._broker.wait_appended(remaining)
+
+    def _fetch(
+        self, partitions: Sequence[TopicPartition], max_records: Optional[int]
+    ) -> Dict[TopicPartition, List[FakeRecord]]:
+        budget = max_records or 500
+        out: Dict[TopicPartition, List[FakeRecord]] = {}
+        for tp in sorted(partitions):
+            if tp in self._paused or budget <= 0:
+                continue
+            pos = self._position[tp]
+            records = self._broker.logs[tp][pos : pos + budget]
+            if records:
+                out[tp] = records
+                self._position[tp] = pos + len(records)
+                budget -= len(records)
+        return out
+
+    async def getone(self) -> FakeRecord:
+        while True:
+            batch = await self.getmany(timeout_ms=100, max_records=1)
+            for records in batch.values():
+                return records[0]
+
+
+class FakeProducer:
+    """Transactional producer writing into ``broker``."""
+
+    def __init__(self, broker: FakeBroker) -> None:
+        self._broker = broker
+        self._pending: List[Tuple[str, bytes, Sequence[Tuple[str, bytes]]]] = []
+        self._offsets: Dict[str, Dict[TopicPartition, OffsetAndMetadata]] = {}
+        self._in_transaction = False
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def begin_transaction(self) -> None:
+        if self._in_transaction:
+            raise RuntimeError("transaction already in progress")
+        self._in_transaction = True
+
+    async def send(
+        self, topic: str, value: bytes, key: Optional[bytes] = None, headers: Any = None
+    ) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        if self._in_transaction:
+            self._pending.append((topic, value, headers or ()))
+            fut.set_result(None)
+            return fut
+        self._broker.append(topic, value, key=key, headers=headers or ())
+
+        async def ack() -> None:
+            await self._broker.round_trip()
+            fut.set_result(None)
+
+        asyncio.ensure_future(ack())
+        return fut
+
+    async def send_and_wait(self, topic: str, value: bytes, key: Optional[bytes] = None, headers: Any = None) -> None:
+        await (await self.send(topic, value, key=key, headers=headers))
+
+    async def send_offsets_to_transaction(
+        self, offsets: Dict[TopicPartition, OffsetAndMetadata], group_id: str
+    ) -> None:
+        await self._broker.round_trip()
+        self._offsets.setdefault(group_id, {}).update(offsets)
+
+    async def commit_transaction(self) -> None:
+        await self._broker.round_trip()
+        for topic, value, headers in self._pending:
+            self._broker.append(topic, value, headers=headers)
+        for group_id, offsets in self._offsets.items():
+            self._broker.commit(group_id, offsets)
+        self._broker.transactions += 1
+        self._reset()
+
+    async def abort_transaction(self) -> None:
+        self._broker.aborts += 1
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending = []
+        self._offsets = {}
+        self._in_transaction = False
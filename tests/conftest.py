@@ -0,0 +1,22 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(scope="session")
+def model_dir():
+    """Trained models in ``models/``, trained on first use."""
+    from trainer import export_stats, train_if, train_lstm
+
+    model_dir = Path("models")
+    if not (model_dir / "isolation_forest.joblib").exists():
+        train_if.main()
+    if not (model_dir / "lstm_encoder").exists() or not (model_dir / "lstm_encoder_weights.npz").exists():
+        train_lstm.main()
+    if not (model_dir / "if_stats.json").exists():
+        export_stats.main()
+    return str(model_dir)
@@ -6,10 +6,11 @@ import datetime as dt
 from unittest.mock import patch
 
 import pytest
+from pydantic import ValidationError
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from ai_service.app.alert_emitter import AlertEmitter, AlertIn
-from ai_service.app.normalize import NormalizedEvent
+from ai_service.app.normalize import CompactEvent, NormalizedEvent, Normalizer
 from ai_service.app.scoring_engine import ScoreResult
 from ai_service.app.labeler import GPTLabel
 
@@ -60,6 +61,12 @@ class DummyConn:
         self.pool.rows.append(args)
         return "id"
 
+    async def executemany(self, query, rows):
+        self.pool.rows.extend(rows)
+
+    def transaction(self):
+        return self
+
 
 class DummyPool:
     def __init__(self):
@@ -92,6 +99,11 @@ async def test_success(monkeypatch):
     assert prod.transactions == ["begin", "commit"]
     topic, value, _hdr = prod.messages[0]
     assert topic == "alerts"
+    payload = json.loads(value)
+    assert payload["event"]["id"] == alert.event.id
+    assert payload["label"]["class"] == "Test"
+    raw = emitter._pool.rows[0][8]
+    assert json.loads(raw) == payload["event"]
 
 
 async def test_kafka_failure(monkeypatch):
@@ -131,3 +143,79 @@ async def test_db_failure(monkeypatch):
     assert "abort" in prod.transactions
     topic, value, hdr = prod.messages[-1]
     assert topic == "alerts_dlq"
+
+
+async def test_emit_many_single_transaction():
+    emitter = AlertEmitter()
+    emitter._pool = DummyPool()
+    prod = DummyProducer()
+    emitter._producer = prod
+
+    alerts = [await _example_alert() for _ in range(3)]
+    await emitter.emit_many(alerts)
+
+    assert prod.transactions == ["begin", "commit"]
+    assert [m[0] for m in prod.messages] == ["alerts"] * 3
+    assert len(emitter._pool.rows) == 3
+
+
+async def test_emit_many_db_commit_failure_aborts_kafka_once():
+    class FailCommitPool(DummyPool):
+        def acquire(self):
+            class Conn(DummyConn):
+                def transaction(self):
+                    class Tx:
+                        async def __aenter__(self):
+                            return self
+
+                        async def __aexit__(self, exc_type, exc, tb):
+                            raise Exception("commit failed")
+
+                    return Tx()
+
+            return Conn(self)
+
+    emitter = AlertEmitter()
+    emitter._pool = FailCommitPool()
+    prod = DummyProducer()
+    emitter._producer = prod
+
+    await emitter.emit_many([await _example_alert() for _ in range(2)])
+
+    assert prod.transactions == ["begin", "abort"]
+    assert [m[0] for m in prod.messages] == ["alerts_dlq"] * 2
+    assert all(m[2] == [("reason", b"db_failure")] for m in prod.messages)
+
+
+async def test_emit_many_kafka_failure_removes_batch_rows():
+    emitter = AlertEmitter()
+    emitter._pool = DummyPool()
+    prod = DummyProducer()
+    prod.fail_commit = True
+    emitter._producer = prod
+
+    await emitter.emit_many([await _example_alert() for _ in range(2)])
+
+    assert prod.transactions == ["begin", "abort"]
+    inserted, delete = emitter._pool.rows[:2], emitter._pool.rows[2]
+    assert delete[0].startswith("DELETE") and delete[1] == [row[0] for row in inserted]
+    assert all(m[2] == [("reason", b"kafka_failure")] for m in prod.messages if m[0] == "alerts_dlq")
+
+
+async def test_alert_event_validated_and_described_as_normalized_event():
+    event = Normalizer.normalize({"src_ip": "10.0.0.1", "timestamp": 0, "user_id": "alice"})
+    scores = ScoreResult(score_if=0.1, score_lstm=0.2, aggregate=0.3)
+    label = GPTLabel(class_="Test", severity="Low", reason="", gpt_tokens=0)
+
+    # compact events pass through; dicts and models are validated
+    assert AlertIn(event=event, scores=scores, label=label).event is event
+    from_dict = AlertIn(event=event.as_dict(), scores=scores, label=label)
+    assert isinstance(from_dict.event, CompactEvent) and from_dict.event == event
+    with pytest.raises(ValidationError):
+        AlertIn(event={"src_ip": "10.0.0.1"}, scores=scores, label=label)
+
+    schema = AlertIn.model_json_schema()
+    assert schema["properties"]["event"]["$ref"] == "#/$defs/NormalizedEvent"
+    alert = AlertIn(event=event, scores=scores, label=label)
+    assert json.loads(alert.model_dump_json())["event"] == event.as_dict()
+    assert AlertIn.model_validate_json(alert.model_dump_json()).event == event
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from aiokafka import OffsetAndMetadata, TopicPartition
+
+from benchmarks.bench_orchestrator import run_benchmark
+from benchmarks.fake_kafka import FakeBroker, FakeConsumer, FakeProducer
+
+
+def test_fake_broker_read_committed():
+    async def run():
+        broker = FakeBroker(partitions=1)
+        broker.append("rau_events", b"a", partition=0)
+        consumer = FakeConsumer(broker, "rau_events", "g")
+        producer = FakeProducer(broker)
+        tp = TopicPartition("rau_events", 0)
+
+        batch = await consumer.getmany(timeout_ms=0)
+        producer.begin_transaction()
+        await producer.send("alerts", b"out")
+        await producer.send_offsets_to_transaction({tp: OffsetAndMetadata(1, None)}, "g")
+        assert broker.logs[TopicPartition("alerts", 0)] == []
+        await producer.commit_transaction()
+
+        producer.begin_transaction()
+        await producer.send("alerts", b"dropped")
+        await producer.abort_transaction()
+        return broker, batch
+
+    broker, batch = asyncio.run(run())
+    assert [r.value for r in batch[TopicPartition("rau_events", 0)]] == [b"a"]
+    assert [r.value for r in broker.logs[TopicPartition("alerts", 0)]] == [b"out"]
+    assert broker.committed == {("g", TopicPartition("rau_events", 0)): 1}
+    assert len(broker.commit_latencies) == 1
+    assert broker.aborts == 1
+
+
+def test_benchmark_smoke():
+    result = asyncio.run(run_benchmark(messages=300, partitions=3, latency_ms=0.5, batch=50, linger_ms=5))
+    assert result["messages"] == 300
+    assert result["msgs_per_sec"] > 0
+    assert result["transactions"] >= 6
+    assert 0 < result["p50_ms"] <= result["p99_ms"]
@@ -0,0 +1,36 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app import codec
+
+
+def test_roundtrip_bytes():
+    data = codec.dumps({"src_ip": "10.0.0.1", "bytes": 5, "tags": ["a", "é"]})
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == {"src_ip": "10.0.0.1", "bytes": 5, "tags": ["a", "é"]}
+
+
+@pytest.mark.parametrize("payload", [b"not-json", b"\xff\xfe"])
+def test_decode_error(payload):
+    with pytest.raises(codec.DecodeError):
+        codec.loads(payload)
+
+
+def test_stdlib_fallback(monkeypatch):
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "msgspec", None)
+    try:
+        fallback = importlib.reload(codec)
+        assert fallback.BACKEND == "json"
+        assert fallback.dumps({"a": [1, 2]}) == b'{"a":[1,2]}'
+        assert fallback.loads(b'{"a":[1,2]}') == {"a": [1, 2]}
+        with pytest.raises(fallback.DecodeError):
+            fallback.loads(b"\xff")
+    finally:
+        monkeypatch.undo()
+        importlib.reload(codec)
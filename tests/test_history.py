@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app.history import HistoryStore
+
+
+def _vec(v, features=4):
+    return np.full(features, v, dtype=np.float32)
+
+
+def test_window_keeps_last_rows_in_order():
+    store = HistoryStore(capacity=4, window=5, features=4)
+    for v in range(3):
+        seq = store.append("u", _vec(v))
+    assert seq.shape == (3, 4)
+    assert seq[:, 0].tolist() == [0, 1, 2]
+    for v in range(3, 12):
+        seq = store.append("u", _vec(v))
+    assert seq[:, 0].tolist() == [7, 8, 9, 10, 11]
+
+
+def test_view_is_zero_copy():
+    store = HistoryStore(capacity=2, window=5, features=4)
+    seq = store.append("u", _vec(1))
+    assert np.shares_memory(seq, store._data)
+    assert seq.flags["C_CONTIGUOUS"]
+
+
+def test_lru_eviction_reuses_slot():
+    store = HistoryStore(capacity=2, window=3, features=4)
+    store.append("a", _vec(1))
+    store.append("b", _vec(2))
+    store.append("a", _vec(3))  # b is now least recently used
+    seq = store.append("c", _vec(4))
+    assert "b" not in store and "a" in store
+    # the reused slot starts empty
+    assert seq[:, 0].tolist() == [4]
+    assert len(store) == 2
+
+
+def test_idle_users_expire():
+    store = HistoryStore(capacity=4, window=3, features=4, ttl=10.0)
+    store.append("a", _vec(1), now=0.0)
+    store.append("b", _vec(2), now=5.0)
+    assert store.evict_idle(now=12.0) == 1
+    assert "a" not in store and "b" in store
+    store.append("b", _vec(3), now=14.0)
+    assert store.evict_idle(now=20.0) == 0
+    assert store.get("b")[:, 0].tolist() == [2, 3]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app.iforest import SINGLE_ROW_MAX, CompiledForest
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"n_estimators": 10},
+        {"n_estimators": 30, "max_features": 0.5},
+        {"n_estimators": 20, "max_samples": 64, "bootstrap": True},
+    ],
+)
+def test_matches_sklearn(params):
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(400, 32)).astype(np.float32)
+    clf = IsolationForest(random_state=0, **params).fit(X)
+    forest = CompiledForest.from_sklearn(clf)
+
+    # outliers and exact training points exercise both sides of thresholds
+    test = np.vstack([rng.normal(scale=3.0, size=(200, 32)).astype(np.float32), X[:50]])
+    expected = clf.score_samples(test)
+    np.testing.assert_allclose(forest.score_samples(test), expected, rtol=1e-12)
+    np.testing.assert_allclose(forest.score_samples(test[:SINGLE_ROW_MAX]), expected[:SINGLE_ROW_MAX], rtol=1e-12)
+    assert forest.score_one(test[7]) == pytest.approx(expected[7], rel=1e-12)
+
+
+def test_accepts_single_vector_and_float64():
+    rng = np.random.default_rng(4)
+    X = rng.normal(size=(100, 8))
+    clf = IsolationForest(n_estimators=5, random_state=0).fit(X)
+    forest = CompiledForest.from_sklearn(clf)
+    assert forest.score_samples(X[0]).shape == (1,)
+    np.testing.assert_allclose(forest.score_samples(X), clf.score_samples(X), rtol=1e-12)
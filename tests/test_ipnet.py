@@ -0,0 +1,57 @@
+import ipaddress
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app import ipnet
+from ai_service.app.ipnet import InternalNetworks, parse_ip
+from ai_service.app.normalize import Normalizer
+
+
+@pytest.fixture(autouse=True)
+def default_networks():
+    ipnet.configure("private")
+    yield
+    ipnet.configure("private")
+
+
+def test_default_matches_is_private():
+    rng = random.Random(0)
+    samples = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(2000)]
+    samples += ["10.1.2.3", "172.31.255.255", "172.32.0.0", "192.168.0.1", "127.0.0.1", "255.255.255.255"]
+    samples += ["fd00::1", "fe80::1", "::1", "2001:db8::1", "2a00:1450::1", "::ffff:8.8.8.8"]
+    for text in samples:
+        assert parse_ip(text).internal == ipaddress.ip_address(text).is_private, text
+
+
+def test_owned_public_range_is_internal():
+    ipnet.configure("private, 8.8.8.0/24")
+    ev = Normalizer.normalize({"src_ip": "8.8.8.8", "timestamp": 0})
+    assert ev.is_internal is True
+    assert parse_ip("8.8.9.1").internal is False
+    ipnet.configure("8.8.8.0/24")
+    assert parse_ip("10.0.0.1").internal is False
+
+
+def test_intervals_merged_and_bounded():
+    nets = InternalNetworks(["10.0.0.0/9", "10.128.0.0/9", "10.0.0.0/8", "2001:db8::/32"])
+    assert nets._starts[4] == [int(ipaddress.ip_address("10.0.0.0"))]
+    assert nets.contains(int(ipaddress.ip_address("10.255.255.255")), 4)
+    assert not nets.contains(int(ipaddress.ip_address("11.0.0.0")), 4)
+    assert not nets.contains(int(ipaddress.ip_address("9.255.255.255")), 4)
+    assert nets.contains(int(ipaddress.ip_address("2001:db8::5")), 6)
+
+
+def test_parse_cache_shared_and_canonical():
+    parse_ip.cache_clear()
+    Normalizer.normalize({"src_ip": "FD00:0::1", "dst_ip": "8.8.4.4", "timestamp": 0})
+    Normalizer.normalize_batch([{"src_ip": "FD00:0::1", "timestamp": 0}])
+    info = parse_ip.cache_info()
+    assert (info.misses, info.hits) == (2, 1)
+    assert parse_ip("FD00:0::1").text == "fd00::1"
+    with pytest.raises(ValueError):
+        parse_ip("01.2.3.4")
@@ -1,5 +1,6 @@
 import asyncio
 import json
+import time
 
 import sys
 import types
@@ -13,6 +14,12 @@ try:
 except Exception:  # pragma: no cover - fallback when aiokafka isn't installed
     aiokafka = types.ModuleType("aiokafka")
     errors = types.ModuleType("aiokafka.errors")
+    helpers = types.ModuleType("aiokafka.helpers")
+    helpers.create_ssl_context = lambda *a, **kw: None
+    abc = types.ModuleType("aiokafka.abc")
+    abc.ConsumerRebalanceListener = object
+    sticky = types.ModuleType("aiokafka.coordinator.assignors.sticky.sticky_assignor")
+    sticky.StickyPartitionAssignor = object
     prometheus_client = types.ModuleType("prometheus_client")
     aiohttp = types.ModuleType("aiohttp")
     aiohttp.web = types.ModuleType("aiohttp.web")
@@ -28,12 +35,18 @@ except Exception:  # pragma: no cover - fallback when aiokafka isn't installed
             pass
         def set(self, *a, **k):
             pass
+        def observe(self, *a, **k):
+            pass
 
     prometheus_client.Gauge = DummyMetric
     prometheus_client.Counter = DummyMetric
+    prometheus_client.Histogram = DummyMetric
     prometheus_client.CONTENT_TYPE_LATEST = "text/plain"
-    prometheus_client.CollectorRegistry = object
+    prometheus_client.CollectorRegistry = type("CollectorRegistry", (), {"register": lambda self, c: None})
     prometheus_client.generate_latest = lambda *a, **kw: b""
+    prometheus_client.multiprocess = types.SimpleNamespace(
+        MultiProcessCollector=lambda *a, **kw: None, mark_process_dead=lambda *a, **kw: None
+    )
     structlog = types.ModuleType("structlog")
     structlog.processors = types.SimpleNamespace(JSONRenderer=lambda: None)
     structlog.BoundLogger = object
@@ -71,12 +84,36 @@ except Exception:  # pragma: no cover - fallback when aiokafka isn't installed
     errors.KafkaError = KafkaError
     sys.modules.setdefault("aiokafka", aiokafka)
     sys.modules.setdefault("aiokafka.errors", errors)
+    sys.modules.setdefault("aiokafka.helpers", helpers)
+    sys.modules.setdefault("aiokafka.abc", abc)
+    sys.modules.setdefault("aiokafka.coordinator.assignors.sticky.sticky_assignor", sticky)
     sys.modules.setdefault("prometheus_client", prometheus_client)
     sys.modules.setdefault("aiohttp", aiohttp)
     sys.modules.setdefault("structlog", structlog)
     sys.modules.setdefault("pydantic", pydantic)
 
-from ai_service.kafka_orchestrator import process_kafka_message
+import ai_service.kafka_orchestrator as orchestrator
+from ai_service.app.secrets import get_instance_id
+from ai_service.kafka_orchestrator import (
+    InFlightBuffer,
+    OrchestratorRebalanceListener,
+    PartitionWorkerPool,
+    RestartBackoff,
+    TopicPartition,
+    consume_loop,
+    next_batch,
+    sample_lag,
+    process_kafka_batch,
+    process_kafka_message,
+)
+
+
+@pytest.fixture(autouse=True)
+def echo_pipeline(monkeypatch):
+    async def fake_process_event(event):
+        return "alerts", event, {}
+
+    monkeypatch.setattr(orchestrator, "process_event", fake_process_event)
 
 
 class KafkaMockProducer:
@@ -91,11 +128,14 @@ class KafkaMockProducer:
     def begin_transaction(self):
         pass
 
-    async def send_and_wait(self, topic, value, headers=None):
+    async def send(self, topic, value, headers=None):
         self.calls += 1
         if self.fail_first and self.calls == 1:
             raise KafkaError("temporary error")
         self.sent.append((topic, value, headers))
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(None)
+        return fut
 
     async def send_offsets_to_transaction(self, offsets, group_id):
         self.offsets.append((offsets, group_id))
@@ -110,6 +150,9 @@ class KafkaMockProducer:
 class Message:
     def __init__(self, value, topic="rau_events", partition=0, offset=0):
         self.value = value
+        self.timestamp = int(time.time() * 1000)
+        self.headers = ()
+        self.key = None
         self.topic = topic
         self.partition = partition
         self.offset = offset
@@ -121,6 +164,9 @@ class KafkaMockConsumer:
 
 
 class DummyLogger:
+    def info(self, *a, **k):
+        pass
+
     def warning(self, *a, **k):
         pass
 
@@ -147,3 +193,316 @@ def test_bad_json_to_dlq():
     assert topic == "rau_events_dlq"
     assert value == b"not-json"
     assert headers == [("reason", b"deserialization_error")]
+
+
+def test_batch_single_transaction():
+    producer = KafkaMockProducer()
+    msgs = [
+        Message(json.dumps({"n": 0}).encode(), partition=0, offset=5),
+        Message(json.dumps({"n": 1}).encode(), partition=1, offset=7),
+        Message(b"not-json", partition=0, offset=6),
+    ]
+    asyncio.run(process_kafka_batch(msgs, producer, "test-group", DummyLogger()))
+    assert producer.commits == 1
+    assert len(producer.sent) == 3
+    offsets, group_id = producer.offsets[0]
+    assert group_id == "test-group"
+    committed = {(tp.topic, tp.partition): om.offset for tp, om in offsets.items()}
+    assert committed == {("rau_events", 0): 7, ("rau_events", 1): 8}
+
+
+def test_failing_record_to_dlq_in_batch(monkeypatch):
+    async def flaky(event):
+        if event.get("bad"):
+            raise TypeError("unhashable type: 'list'")
+        return "alerts", event, {}
+
+    monkeypatch.setattr(orchestrator, "process_event", flaky)
+    producer = KafkaMockProducer()
+    msgs = [
+        Message(json.dumps({"n": 0}).encode(), offset=0),
+        Message(json.dumps({"n": 1, "bad": True}).encode(), offset=1),
+        Message(json.dumps({"n": 2}).encode(), offset=2),
+    ]
+    asyncio.run(process_kafka_batch(msgs, producer, "test-group", DummyLogger()))
+    assert producer.commits == 1
+    assert [topic for topic, _, _ in producer.sent] == ["alerts", "rau_events_dlq", "alerts"]
+    _, value, headers = producer.sent[1]
+    assert value == msgs[1].value
+    assert headers[0] == ("reason", b"processing_error")
+    assert [om.offset for om in producer.offsets[0][0].values()] == [3]
+
+
+def test_next_batch_limits():
+    async def run():
+        queue = asyncio.Queue()
+        for i in range(5):
+            queue.put_nowait(i)
+        first = await next_batch(queue, max_records=3, linger_ms=10)
+        second = await next_batch(queue, max_records=3, linger_ms=10)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [0, 1, 2]
+    assert second == [3, 4]
+
+
+def test_partition_pool_order_and_concurrency(monkeypatch):
+    seen = []
+
+    async def fake_process_event(event):
+        if event["p"] == 0:
+            await asyncio.sleep(0.05)
+        seen.append((event["p"], event["n"]))
+        return "alerts", event, {}
+
+    monkeypatch.setattr(orchestrator, "process_event", fake_process_event)
+
+    async def run():
+        producer = KafkaMockProducer()
+        pool = PartitionWorkerPool(producer, "test-group", DummyLogger(), max_concurrency=2)
+        for n in range(3):
+            for p in (0, 1):
+                msg = Message(json.dumps({"p": p, "n": n}).encode(), partition=p, offset=n)
+                pool.dispatch(msg)
+        await pool.join()
+        await pool.close()
+        return producer
+
+    producer = asyncio.run(run())
+    # the slow partition does not hold back the fast one
+    assert [p for p, _ in seen[:3]] == [1, 1, 1]
+    for p in (0, 1):
+        assert [n for q, n in seen if q == p] == [0, 1, 2]
+    committed = [
+        (tp.partition, om.offset) for offsets, _ in producer.offsets for tp, om in offsets.items()
+    ]
+    assert [o for p, o in committed if p == 0] == [1, 2, 3]
+    assert producer.commits == 6
+
+
+class PausingConsumer:
+    def __init__(self, batches, partitions):
+        self.batches = list(batches)
+        self._assignment = set(partitions)
+        self._paused = set()
+        self.seeks = {}
+
+    def seek(self, tp, offset):
+        self.seeks[tp] = offset
+
+    def assignment(self):
+        return set(self._assignment)
+
+    def paused(self):
+        return set(self._paused)
+
+    def pause(self, *tps):
+        self._paused.update(tps)
+
+    def resume(self, *tps):
+        self._paused.difference_update(tps)
+
+    def highwater(self, tp):
+        return 100
+
+    async def position(self, tp):
+        return self.seeks.get(tp, 40)
+
+    async def getmany(self, timeout_ms=0, max_records=None):
+        await asyncio.sleep(0)
+        return self.batches.pop(0) if self.batches else {}
+
+
+def test_inflight_buffer_pauses_per_partition():
+    tp0, tp1 = TopicPartition("rau_events", 0), TopicPartition("rau_events", 1)
+    consumer = PausingConsumer([], [tp0, tp1])
+    buffer = InFlightBuffer(consumer, max_bytes=200)
+    big = [Message(b"x" * 60, partition=0, offset=i) for i in range(2)]
+    buffer.add(tp0, 120)
+    buffer.add(tp1, 10)
+    assert consumer.paused() == {tp0}
+    buffer.release(big[:1])
+    assert consumer.paused() == {tp0}
+    buffer.release(big[1:])
+    assert consumer.paused() == set()
+    assert buffer.total == 10
+
+
+def test_reassign_forgets_lost_partition_bytes_once():
+    kept, lost = TopicPartition("rau_events", 0), TopicPartition("rau_events", 1)
+
+    async def run():
+        consumer = PausingConsumer([], [kept, lost])
+        buffer = InFlightBuffer(consumer, max_bytes=10_000)
+        pool = PartitionWorkerPool(KafkaMockProducer(), "test-group", DummyLogger(), buffer=buffer)
+        await pool.pause()
+        queued = Message(b"x" * 50, partition=1, offset=0)
+        # fetched before the rebalance: one record dispatched, one still in the fetch queue
+        late = Message(b"y" * 50, partition=1, offset=1)
+        buffer.add(lost, 100)
+        pool.dispatch(queued)
+        pool.reassign({kept})
+        assert buffer.total == 0
+        assert lost not in pool._enqueued
+        pool.dispatch(late)
+        total = buffer.total
+        pool.resume()
+        await pool.close()
+        return total
+
+    assert asyncio.run(run()) == 0
+
+
+def test_consume_loop_bulk_fetch():
+    tp0 = TopicPartition("rau_events", 0)
+    msgs = [Message(b"{}", offset=i) for i in range(3)]
+    consumer = PausingConsumer([{tp0: msgs}], [tp0])
+
+    async def run():
+        queue = asyncio.Queue()
+        stop = asyncio.Event()
+        buffer = InFlightBuffer(consumer, max_bytes=1000)
+        task = asyncio.create_task(consume_loop(consumer, queue, stop, DummyLogger(), buffer=buffer))
+        while queue.qsize() < 3:
+            await asyncio.sleep(0)
+        stop.set()
+        await task
+        return queue, buffer
+
+    queue, buffer = asyncio.run(run())
+    assert [queue.get_nowait().offset for _ in range(3)] == [0, 1, 2]
+    assert buffer.total == 6
+
+
+def test_instance_id_per_worker(monkeypatch):
+    monkeypatch.setenv("INSTANCE_ID", "pod-a")
+    monkeypatch.delenv("ORCH_WORKER_INDEX", raising=False)
+    assert get_instance_id() == "pod-a"
+    monkeypatch.setenv("ORCH_WORKER_INDEX", "3")
+    assert get_instance_id() == "pod-a-3"
+
+
+def test_emitted_events_only_commit_offsets(monkeypatch):
+    async def emitted(event):
+        return None
+
+    monkeypatch.setattr(orchestrator, "process_event", emitted)
+    producer = KafkaMockProducer()
+    msg = Message(json.dumps({"foo": "bar"}).encode(), offset=41)
+    asyncio.run(process_kafka_message(msg, producer, "test-group", DummyLogger()))
+    assert producer.sent == []
+    assert producer.commits == 1
+    offsets, _ = producer.offsets[0]
+    assert [om.offset for om in offsets.values()] == [42]
+
+
+def test_rebalance_commits_inflight_and_drops_lost_partitions(monkeypatch):
+    release = None
+
+    async def slow_process_event(event):
+        await release.wait()
+        return "alerts", event, {}
+
+    monkeypatch.setattr(orchestrator, "process_event", slow_process_event)
+    kept, lost = TopicPartition("rau_events", 0), TopicPartition("rau_events", 1)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        producer = KafkaMockProducer()
+        consumer = PausingConsumer([], [kept, lost])
+        queue = asyncio.Queue()
+        pool = PartitionWorkerPool(producer, "test-group", DummyLogger())
+        listener = OrchestratorRebalanceListener(consumer, queue, pool, DummyLogger())
+        for p in (0, 1):
+            for n in range(3):
+                pool.dispatch(Message(json.dumps({"p": p, "n": n}).encode(), partition=p, offset=n))
+        await asyncio.sleep(0)
+        # one batch per partition is in flight; the revoke waits for both to commit
+        revoke = asyncio.create_task(listener.on_partitions_revoked([kept, lost]))
+        await asyncio.sleep(0.01)
+        assert not revoke.done()
+        release.set()
+        await revoke
+        committed = producer.commits
+        # fetched while the rebalance was pending
+        queue.put_nowait(Message(b'{"late": 1}', partition=1, offset=3))
+        await listener.on_partitions_assigned([kept])
+        await pool.join()
+        await pool.close()
+        return producer, consumer, committed
+
+    producer, consumer, committed = asyncio.run(run())
+    assert committed == 2
+    # partition 0 kept its queue and continues after it; partition 1 was dropped
+    assert consumer.seeks == {kept: 3}
+    offsets = [(tp.partition, om.offset) for o, _ in producer.offsets for tp, om in o.items()]
+    assert offsets.count((1, 1)) == 1 and max(o for p, o in offsets if p == 1) == 1
+    assert max(o for p, o in offsets if p == 0) == 3
+
+
+def test_sample_lag_per_partition():
+    tps = [TopicPartition("rau_events", 0), TopicPartition("rau_events", 1)]
+    consumer = PausingConsumer([], tps)
+    consumer.seek(tps[1], 100)
+    lags = asyncio.run(sample_lag(consumer))
+    assert lags == {tps[0]: 60, tps[1]: 0}
+
+
+def test_source_header_added_to_event():
+    msg = Message(b'{"srcip": "8.8.8.8"}')
+    msg.headers = [("trace", b"x"), ("source", b"firewall")]
+    topic, value, _, _ = asyncio.run(orchestrator._transform(msg))
+    assert json.loads(value) == {"srcip": "8.8.8.8", "source": "firewall"}
+
+
+def test_pipeline_stage_metrics_on_orchestrator_registry():
+    from prometheus_client import generate_latest
+
+    text = generate_latest(orchestrator.registry)
+    assert b"pipeline_stage_seconds" in text
+    assert b"pipeline_stage_queue_depth" in text
+
+
+def test_restart_backoff_doubles_resets_and_gives_up():
+    backoff = RestartBackoff(base=1.0, cap=5.0, healthy_uptime=60.0, max_failures=4)
+    assert [backoff.exited(0.5) for _ in range(3)] == [1.0, 2.0, 4.0]
+    # a healthy run starts the schedule over
+    assert backoff.exited(120.0) == 1.0
+    assert [backoff.exited(0.5) for _ in range(4)] == [2.0, 4.0, 5.0, None]
+
+
+def test_supervise_gives_up_on_crash_looping_workers(monkeypatch, tmp_path):
+    started = []
+
+    class DeadProcess:
+        exitcode = 1
+
+        def __init__(self, target, args, name):
+            self.pid = 1000 + len(started)
+
+        def start(self):
+            started.append(self.pid)
+
+        def is_alive(self):
+            return False
+
+    class Runner:
+        async def cleanup(self):
+            pass
+
+    async def metrics_app(registry):
+        return Runner()
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(orchestrator, "metrics_app", metrics_app)
+    logger = types.SimpleNamespace(bind=lambda **kw: DummyLogger())
+    monkeypatch.setattr(orchestrator, "configure_logging", lambda env: logger)
+    monkeypatch.setattr(
+        orchestrator.multiprocessing, "get_context", lambda method: types.SimpleNamespace(Process=DeadProcess)
+    )
+    with pytest.raises(RuntimeError, match="all 2 workers"):
+        asyncio.run(orchestrator.supervise(2, restart_delay=0.001, max_restart_delay=0.004, max_fast_failures=3))
+    # the initial start plus three restarts per worker
+    assert len(started) == 8
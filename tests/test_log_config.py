@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app import log_config
+from ai_service.app.log_config import QueueSink, get_logger, parse_sample_rates
+
+
+def _lines(stream):
+    log_config.flush()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_sampling_never_drops_errors():
+    stream = io.StringIO()
+    log_config.configure(sample_rates={"scored": 0.0, "labeled": 0.5}, stream=stream)
+    try:
+        log = get_logger(service="test")
+        for _ in range(200):
+            log.info("scored", score=1.0)
+            log.info("labeled")
+        log.error("scored", score=2.0)
+        log.warning("scored", score=3.0)
+        log.info("started")
+        lines = _lines(stream)
+    finally:
+        log_config.configure(stream=None)
+    scored = [line for line in lines if line["event"] == "scored"]
+    assert [line["level"] for line in scored] == ["error", "warning"]
+    labeled = [line for line in lines if line["event"] == "labeled"]
+    assert 40 < len(labeled) < 160 and all(line["sample_rate"] == 0.5 for line in labeled)
+    assert any(line["event"] == "started" and "sample_rate" not in line for line in lines)
+
+
+def test_sink_renders_off_the_calling_thread():
+    writers = []
+
+    class Stream(io.StringIO):
+        def write(self, s):
+            writers.append(threading.current_thread().name)
+            return super().write(s)
+
+    stream = Stream()
+    log_config.configure(sample_rates={}, stream=stream)
+    try:
+        get_logger(service="test").info("emitted", alert_id="a")
+        lines = _lines(stream)
+    finally:
+        log_config.configure(stream=None)
+    assert lines == [{"service": "test", "alert_id": "a", "event": "emitted", "level": "info"}]
+    assert set(writers) == {"log-sink"}
+
+
+def test_full_queue_drops_only_sampled_levels():
+    sink = QueueSink(stream=io.StringIO(), maxsize=1)
+    gate = threading.Event()
+    sink._renderer = lambda *_: gate.wait() or "x"
+    sink.info({"event": "a"})  # taken by the thread, blocks on the gate
+    while not sink._queue.empty():
+        pass
+    sink.info({"event": "b"})
+    sink.info({"event": "c"})
+    assert sink.dropped == 1
+    gate.set()
+    sink.error({"event": "d"})  # waits for room instead of dropping
+    sink.flush()
+    assert sink.dropped == 1
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("normalized=0.001, scored=0.5,") == {"normalized": 0.001, "scored": 0.5}
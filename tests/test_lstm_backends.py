@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app.lstm_backends import ONNX_FILE, adjust_stats, load_backend, report_file
+from trainer import train_lstm
+
+
+@pytest.fixture(scope="module")
+def model_dirs(tmp_path_factory):
+    if not Path("models/lstm_encoder").exists():
+        train_lstm.main()
+    reference = load_backend("tf", "models")
+    # export next to a copy-free reference: the step files only need the weights
+    out = tmp_path_factory.mktemp("lstm_backends")
+    train_lstm.export_backends(reference.cells, str(out), windows=train_lstm.calibration_windows(32))
+    return reference, out
+
+
+def _backend(name, out):
+    if name == "onnx":
+        pytest.importorskip("onnxruntime")
+        if not (out / ONNX_FILE).exists():
+            pytest.skip("tf2onnx not installed; no ONNX export")
+    return load_backend(name, out)
+
+
+@pytest.mark.parametrize("name", ["numpy", "tflite", "onnx"])
+def test_backend_matches_saved_model(model_dirs, name):
+    reference, out = model_dirs
+    backend = _backend(name, out)
+    rng = np.random.default_rng(5)
+    for shape in [(4, 50, 32), (3, 7, 32), (1, 1, 32)]:
+        batch = rng.random(shape, dtype=np.float32)
+        np.testing.assert_allclose(backend.reconstruct(batch), reference.reconstruct(batch), atol=1e-5)
+
+
+@pytest.mark.parametrize("name", ["numpy", "tflite", "onnx"])
+def test_backend_step_matches_cells(model_dirs, name):
+    reference, out = model_dirs
+    backend = _backend(name, out)
+    rng = np.random.default_rng(6)
+    x = rng.random((5, 32), dtype=np.float32)
+    state = rng.random((5, backend.state_size), dtype=np.float32)
+    y, new_state = backend.step(x, state)
+    y_ref, state_ref = reference.cells.step(x, state)
+    np.testing.assert_allclose(y, y_ref, atol=1e-5)
+    np.testing.assert_allclose(new_state, state_ref, atol=1e-5)
+
+
+def test_tflite_backend_concurrent_threads(model_dirs):
+    reference, out = model_dirs
+    backend = load_backend("tflite", out)
+    rng = np.random.default_rng(7)
+    # different shapes per thread make a shared interpreter resize under another caller
+    batches = [rng.random((n, 20, 32), dtype=np.float32) for n in (1, 3, 5, 8) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(backend.reconstruct, batches))
+    for batch, result in zip(batches, results):
+        np.testing.assert_allclose(result, reference.reconstruct(batch), atol=1e-5)
+
+
+@pytest.mark.parametrize("precision, tolerance", [("float16", 1e-4), ("int8", 1e-2)])
+def test_quantized_variant_and_report(model_dirs, precision, tolerance):
+    _, out = model_dirs
+    reference = load_backend("tflite", out)
+    variant = load_backend("tflite", out, precision=precision)
+    batch = train_lstm.calibration_windows(8, seed=1)
+    err_ref = np.mean(np.square(batch - reference.reconstruct(batch)), axis=(1, 2))
+    err_var = np.mean(np.square(batch - variant.reconstruct(batch)), axis=(1, 2))
+    np.testing.assert_allclose(err_var, err_ref, rtol=tolerance)
+
+    report = json.loads((out / report_file(precision)).read_text())
+    assert report["variant"] == precision and report["windows"] == 32
+    assert report["size_bytes"] < report["float32_size_bytes"]
+    assert report["rel_diff"]["max"] < tolerance
+    assert set(report["stats"]) == {"float32", "variant"}
+
+
+def test_adjust_stats_shifts_lstm_only():
+    stats = {"mu_if": 0.1, "sigma_if": 0.2, "mu_lstm": 1.0, "sigma_lstm": 0.5}
+    report = {"stats": {"float32": {"mu_lstm": 2.0, "sigma_lstm": 1.0}, "variant": {"mu_lstm": 2.1, "sigma_lstm": 1.2}}}
+    adjusted = adjust_stats(stats, report)
+    assert adjusted["mu_lstm"] == pytest.approx(1.1)
+    assert adjusted["sigma_lstm"] == pytest.approx(0.6)
+    assert adjusted["mu_if"] == 0.1 and stats["mu_lstm"] == 1.0
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend("torch", "models")
+    with pytest.raises(ValueError):
+        load_backend("numpy", "models", precision="int8")
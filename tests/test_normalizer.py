@@ -132,3 +132,173 @@ def test_is_internal_ipv6_ula():
     ev = Normalizer.normalize(raw)
     assert ev.is_internal is True
     assert ipaddress.ip_address(ev.src_ip).version == 6
+
+
+def test_normalize_batch_matches_normalize():
+    raws = [
+        {"id": "a", "src_ip": "192.168.1.10", "timestamp": "2024-01-01T12:00:00Z", "bytes": "7"},
+        {"id": "b", "src_ip": "8.8.8.8", "dst_ip": "fd00::1", "timestamp": 1_600_000_000_000},
+        {"id": "c", "src_ip": "8.8.8.8", "timestamp": "2024-01-01T00:00:00", "user_id": "u", "foo": 1},
+        {"id": "d", "src_ip": "fd00::1", "timestamp": 1.5, "method": "GET", "endpoint": "/"},
+    ]
+    batch = Normalizer.normalize_batch(raws)
+    assert not batch.errors.any()
+    for i, raw in enumerate(raws):
+        assert batch.event(i) == Normalizer.normalize(raw)
+
+
+def test_normalize_batch_columns():
+    batch = Normalizer.normalize_batch(
+        [{"src_ip": "10.0.0.1", "dst_ip": "::1", "timestamp": 0, "bytes": 5}, {"src_ip": "8.8.8.8", "timestamp": "0"}]
+    )
+    assert batch.src_ip[0].tolist() == [0, int(ipaddress.ip_address("10.0.0.1"))]
+    assert batch.src_version.tolist() == [4, 4]
+    assert batch.dst_ip[0].tolist() == [0, 1]
+    assert batch.dst_version.tolist() == [6, 0]
+    assert batch.is_internal.tolist() == [True, False]
+    assert batch.timestamp.tolist() == [0, 0]
+    assert batch.bytes.tolist() == [5, 0]
+    assert batch.has_bytes.tolist() == [True, False]
+    assert len(batch.id[1]) == 26
+
+
+def test_normalize_batch_error_mask():
+    raws = [
+        {"src_ip": "8.8.8.8", "timestamp": 0},
+        {"src_ip": "999.1.1.1", "timestamp": 0},
+        {"src_ip": "8.8.8.8", "timestamp": "not"},
+        "not a dict",
+    ]
+    batch = Normalizer.normalize_batch(raws)
+    assert batch.errors.tolist() == [False, True, True, True]
+    assert batch.error_messages[1:] == ["invalid src_ip", "invalid timestamp", "raw must be a dict"]
+    events = batch.events()
+    assert events[0].src_ip == "8.8.8.8" and events[1:] == [None, None, None]
+    with pytest.raises(NormalizationError):
+        batch.event(1)
+
+
+def test_normalize_batch_timestamp_out_of_int64_range():
+    raws = [{"src_ip": "8.8.8.8", "timestamp": ts} for ts in (99999999999, 9999999999999, 10**17, 10**19)]
+    raws += [{"src_ip": "8.8.8.8", "timestamp": "9999-01-01T00:00:00Z"}, {"src_ip": "8.8.8.8", "timestamp": 0}]
+    batch = Normalizer.normalize_batch(raws)
+    assert batch.errors.tolist() == [True, True, True, True, True, False]
+    assert set(batch.error_messages[:5]) == {"timestamp out of range"}
+    batch.raw_extra[0]["x"] = 1
+    assert batch.raw_extra[1] == {}
+
+
+TIMESTAMP_CORPUS = [
+    0, 1, 1_700_000_000, 1_700_000_000_123, 1.5, 1_700_000_000.25, 1_700_000_000_123.0, True,
+    "0", "1700000000", "1700000000123", "1700000000999",
+    "2024-01-01T12:00:00Z", "2024-01-01T12:00:00.123456Z", "2024-01-01T12:00:00.1234567Z",
+    "2024-01-01T12:00:00+02:00", "2024-06-30T23:59:59.5-05:30", "2024-01-01T12:00:00",
+    "2024-01-01T24:00:00", "20240101T120000Z", "2024-W01-1", "2024-01-01", "2024-01-01 12:00:00",
+]
+
+
+@pytest.mark.parametrize("source", [None, "a"])
+def test_fast_timestamp_matches_dateutil_parser(source):
+    from benchmarks.bench_timestamps import baseline_parse
+
+    for value in TIMESTAMP_CORPUS + TIMESTAMP_CORPUS[::-1]:
+        assert Normalizer._parse_timestamp(value, source) == baseline_parse(value), value
+    for value in ("not", "2024-13-01T00:00:00Z", "", "2024-01-01T12:00:00+25:00"):
+        with pytest.raises(NormalizationError):
+            Normalizer._parse_timestamp(value, source)
+
+
+def test_timestamp_epoch_us_and_format_cache():
+    from ai_service.app import normalize
+
+    us = 1_700_000_000_123_457
+    ev = Normalizer.normalize({"srcip": "8.8.8.8", "ts": us, "source": "firewall"})
+    assert ev.timestamp == dt.datetime(2023, 11, 14, 22, 13, 20, 123457, tzinfo=dt.timezone.utc)
+    assert normalize._TS_FORMATS["firewall"] == "epoch"
+    # a source that switches format is detected again
+    Normalizer.normalize({"srcip": "8.8.8.8", "ts": "2024-01-01T00:00:00Z", "source": "firewall"})
+    assert normalize._TS_FORMATS["firewall"] == "rfc3339"
+    batch = Normalizer.normalize_batch([{"src_ip": "8.8.8.8", "timestamp": str(us)}])
+    assert batch.timestamp[0] == us * 1000
+
+
+def test_timestamp_cache_ignores_untrusted_sources():
+    from ai_service.app import normalize
+
+    for n in range(100):
+        Normalizer.normalize({"src_ip": "8.8.8.8", "timestamp": 0, "source": f"attacker-{n}"})
+    assert not any(key.startswith("attacker-") for key in normalize._TS_FORMATS)
+    # unhashable sources are a normalization question, not a TypeError
+    for source in (["a"], {"a": 1}):
+        ev = Normalizer.normalize({"src_ip": "8.8.8.8", "timestamp": 0, "source": source})
+        assert ev.timestamp == dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+        with pytest.raises(NormalizationError):
+            Normalizer._parse_timestamp("not", source)
+    assert not Normalizer.normalize_batch([{"src_ip": "8.8.8.8", "timestamp": 0, "source": ["a"]}]).errors[0]
+
+
+def test_compact_event_matches_model():
+    raw = {"src_ip": "10.0.0.1", "dst_ip": "::1", "timestamp": "2024-01-01T12:00:00.5Z", "bytes": 3, "foo": [1]}
+    ev = Normalizer.normalize(raw)
+    model = ev.model()
+    assert isinstance(model, NormalizedEvent)
+    assert ev.as_dict() == model.model_dump(mode="json")
+    assert NormalizedEvent.model_validate(model.model_dump()) == model
+    assert ev.model() is model
+    assert Normalizer.schema() == NormalizedEvent.model_json_schema()
+
+
+def test_compact_event_is_slotted_and_lazy():
+    raw = {"src_ip": "8.8.8.8", "timestamp": 0, "foo": "bar"}
+    ev = Normalizer.normalize(raw)
+    assert not hasattr(ev, "__dict__")
+    assert ev._extra is None
+    assert ev.raw_extra == {"foo": "bar"} and ev._raw is None
+    # the raw dict itself is never modified
+    assert raw == {"src_ip": "8.8.8.8", "timestamp": 0, "foo": "bar"}
+
+
+def test_non_string_user_id_rejected():
+    with pytest.raises(NormalizationError):
+        Normalizer.normalize({"src_ip": "8.8.8.8", "timestamp": 0, "user_id": 5})
+    assert Normalizer.normalize_batch([{"src_ip": "8.8.8.8", "timestamp": 0, "method": 1}]).errors[0]
+
+
+def test_source_field_mappings():
+    ev = Normalizer.normalize(
+        {"source": "proxy", "client_ip": "10.0.0.1", "@timestamp": "2024-01-01T00:00:00Z", "bytes_out": 9, "x": 1}
+    )
+    assert (ev.src_ip, ev.bytes) == ("10.0.0.1", 9)
+    assert ev.timestamp == dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    assert ev.raw_extra == {"source": "proxy", "x": 1}
+    # the header-provided source wins; canonical names are not read for a mapped source
+    raw = {"srcip": "8.8.8.8", "ts": 0, "src_ip": "1.1.1.1"}
+    ev = Normalizer.normalize(raw, source="firewall")
+    assert ev.src_ip == "8.8.8.8" and ev.raw_extra == {"src_ip": "1.1.1.1"}
+    batch = Normalizer.normalize_batch([raw, {"source": "proxy", "client_ip": "::1", "@timestamp": 0}], "firewall")
+    assert batch.errors.tolist() == [False, True]
+    assert Normalizer.normalize({"source": "unknown", "src_ip": "8.8.8.8", "timestamp": 0}).src_ip == "8.8.8.8"
+
+
+def test_register_source_rejects_unknown_fields(monkeypatch):
+    from ai_service.app import normalize
+    from ai_service.app.normalize import register_source
+
+    # register into a copy so "cdn" does not leak into other tests
+    monkeypatch.setattr(normalize, "_MAPPINGS", dict(normalize._MAPPINGS))
+    with pytest.raises(ValueError):
+        register_source("bad", {"srcip": "src"})
+    register_source("cdn", {"src_ip": "client", "user_id": "uid"})
+    ev = Normalizer.normalize({"client": "8.8.8.8", "uid": "u1", "timestamp": 0}, source="cdn")
+    assert (ev.src_ip, ev.user_id) == ("8.8.8.8", "u1")
+
+
+@pytest.mark.parametrize("value", ["{firewall:", '["firewall"]', '{"cdn": "client"}'])
+def test_malformed_source_mappings_name_the_variable(monkeypatch, value):
+    from ai_service.app.normalize import _load_specs
+
+    monkeypatch.setenv("SOURCE_MAPPINGS", value)
+    with pytest.raises(ValueError, match="SOURCE_MAPPINGS"):
+        _load_specs()
+    monkeypatch.setenv("SOURCE_MAPPINGS", '{"cdn": {"src_ip": "client"}}')
+    assert _load_specs()["cdn"] == {"src_ip": "client"}
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service import pipeline as pipeline_mod
+from ai_service.app import codec
+from ai_service.app.metrics import PIPELINE_STAGE_SECONDS
+from ai_service.pipeline import AlertBatcher, Pipeline, process_event
+
+
+class Recorder:
+    def __init__(self):
+        self.emitted = []
+        self.started = False
+        self.stopped = False
+
+    async def score(self, event):
+        await asyncio.sleep(0)
+        return {"aggregate": 0.5, "event_id": event.id}
+
+    def label(self, event, scores):
+        return {"class": "Benign", "event_id": event.id}
+
+    async def emit(self, event, scores, label):
+        self.emitted.append((event.id, scores["event_id"], label["event_id"]))
+
+    async def on_start(self):
+        self.started = True
+
+    async def on_stop(self):
+        self.stopped = True
+
+
+def _pipeline(rec, **kw):
+    return Pipeline(
+        score=rec.score,
+        label=rec.label,
+        emit=rec.emit,
+        on_start=rec.on_start,
+        on_stop=rec.on_stop,
+        **kw,
+    )
+
+
+def test_events_flow_through_all_stages():
+    rec = Recorder()
+
+    async def run():
+        p = _pipeline(rec, concurrency={"normalize": 2, "label": 2}, queue_size=2)
+        await p.start()
+        raws = [{"id": f"ev{i}", "src_ip": "10.0.0.1", "timestamp": i} for i in range(20)]
+        results = await asyncio.gather(*(process_event(raw) for raw in raws))
+        await p.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [None] * 20
+    assert sorted(rec.emitted) == sorted((f"ev{i}",) * 3 for i in range(20))
+    assert rec.started and rec.stopped
+    assert pipeline_mod._current is None
+    samples = PIPELINE_STAGE_SECONDS.labels(stage="emit").collect()[0].samples
+    assert any(s.name.endswith("_count") and s.value >= 20 for s in samples)
+
+
+def test_normalization_error_goes_to_dlq():
+    rec = Recorder()
+
+    async def run():
+        p = _pipeline(rec)
+        await p.start()
+        try:
+            return await p.submit({"timestamp": 0})
+        finally:
+            await p.stop()
+
+    topic, value, headers = asyncio.run(run())
+    assert topic == "rau_events_dlq"
+    assert codec.loads(value) == {"timestamp": 0}
+    assert headers["reason"] == "normalization_error"
+    assert rec.emitted == []
+
+
+def test_normalize_batches_queued_jobs(monkeypatch):
+    rec = Recorder()
+    calls = []
+    normalize_many = pipeline_mod._normalize_many
+
+    def recording(raws):
+        calls.append(len(raws))
+        return normalize_many(raws)
+
+    monkeypatch.setattr(pipeline_mod, "_normalize_many", recording)
+    normalize = pipeline_mod.Normalizer.normalize
+
+    def failing(raw):
+        if raw["id"] == "ev3":
+            raise ZeroDivisionError
+        return normalize(raw)
+
+    monkeypatch.setattr(pipeline_mod.Normalizer, "normalize", failing)
+
+    async def run():
+        p = _pipeline(rec, concurrency={"normalize": 1}, normalize_batch_size=4)
+        await p.start()
+        raws = [{"id": f"ev{i}", "src_ip": "10.0.0.1", "timestamp": i} for i in range(10)]
+        try:
+            return await asyncio.gather(*(p.submit(raw) for raw in raws), return_exceptions=True)
+        finally:
+            await p.stop()
+
+    results = asyncio.run(run())
+    assert isinstance(results[3], ZeroDivisionError)
+    assert results[:3] + results[4:] == [None] * 9
+    assert sum(calls) == 10 and max(calls) == 4 and len(calls) < 10
+
+
+def test_stage_error_propagates():
+    rec = Recorder()
+
+    async def boom(event):
+        raise RuntimeError("model unavailable")
+
+    rec.score = boom
+
+    async def run():
+        p = _pipeline(rec)
+        await p.start()
+        try:
+            await p.submit({"src_ip": "10.0.0.1", "timestamp": 0})
+        finally:
+            await p.stop()
+
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        asyncio.run(run())
+
+
+def test_emit_output_is_returned():
+    rec = Recorder()
+
+    async def emit(event, scores, label):
+        return ("alerts", event.id.encode(), {"event_id": event.id})
+
+    rec.emit = emit
+
+    async def run():
+        p = _pipeline(rec)
+        await p.start()
+        try:
+            return await p.submit({"id": "ev1", "src_ip": "10.0.0.1", "timestamp": 0})
+        finally:
+            await p.stop()
+
+    assert asyncio.run(run()) == ("alerts", b"ev1", {"event_id": "ev1"})
+
+
+def test_stop_releases_jobs_mid_stage():
+    rec = Recorder()
+
+    async def hang(event):
+        rec.emitted.append("scoring")
+        await asyncio.Event().wait()
+
+    rec.score = hang
+
+    async def run():
+        p = _pipeline(rec)
+        await p.start()
+        task = asyncio.create_task(p.submit({"src_ip": "10.0.0.1", "timestamp": 0}))
+        while not rec.emitted:
+            await asyncio.sleep(0.01)
+        await p.stop()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 1.0)
+
+    asyncio.run(run())
+
+
+def test_alert_batcher_groups_concurrent_adds():
+    batches = []
+
+    async def write(items):
+        batches.append(list(items))
+
+    async def run():
+        batcher = AlertBatcher(write, max_batch=4, linger_ms=5.0)
+        await asyncio.gather(*(batcher.add(i) for i in range(6)))
+
+    asyncio.run(run())
+    assert batches == [[0, 1, 2, 3], [4, 5]]
+
+
+def test_alert_batcher_propagates_write_errors():
+    async def write(items):
+        raise RuntimeError("db down")
+
+    async def run():
+        batcher = AlertBatcher(write, linger_ms=1.0)
+        return await asyncio.gather(batcher.add(1), batcher.add(2), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(run())] == ["db down", "db down"]
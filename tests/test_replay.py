@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from aiokafka import TopicPartition
+
+import ai_service.replay as replay
+from ai_service.replay import iter_file, iter_kafka, parse_timestamp_ms, replay_events
+
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, topic, value, headers=None):
+        self.sent.append((topic, value, headers))
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(None)
+        return fut
+
+
+class Record:
+    def __init__(self, offset, value):
+        self.offset = offset
+        self.value = value
+
+
+class FakeConsumer:
+    def __init__(self, data):
+        # partition -> list of values; ``None`` is a transaction marker,
+        # which advances the position but is never returned
+        self.data = data
+        self.positions = {}
+        self.paused = set()
+
+    def partitions_for_topic(self, topic):
+        return set(self.data)
+
+    def assign(self, partitions):
+        self.assigned = partitions
+
+    async def beginning_offsets(self, partitions):
+        return {tp: 0 for tp in partitions}
+
+    async def end_offsets(self, partitions):
+        return {tp: len(self.data[tp.partition]) for tp in partitions}
+
+    async def offsets_for_times(self, query):
+        return {tp: None for tp in query}
+
+    def seek(self, tp, offset):
+        self.positions[tp] = offset
+
+    def pause(self, tp):
+        self.paused.add(tp)
+
+    async def position(self, tp):
+        return self.positions[tp]
+
+    async def getmany(self, *partitions, timeout_ms=0, max_records=None):
+        await asyncio.sleep(0)
+        out = {}
+        for tp in partitions:
+            pos = self.positions[tp]
+            values = self.data[tp.partition][pos : pos + 2]
+            records = [Record(pos + i, v) for i, v in enumerate(values) if v is not None]
+            if records:
+                out[tp] = records
+            self.positions[tp] = pos + len(values)
+        return out
+
+
+def _collect(consumer, **kwargs):
+    async def collect():
+        return [v async for v in iter_kafka(consumer, "rau_events", **kwargs)]
+
+    # a replay that never reaches its end fails instead of hanging
+    return asyncio.run(asyncio.wait_for(collect(), 5))
+
+
+def test_replay_file(tmp_path, monkeypatch):
+    async def fake_process_event(event):
+        if event.get("dlq"):
+            return "rau_events_dlq", b"{}", {"reason": "normalization_error"}
+        return None
+
+    monkeypatch.setattr(replay, "process_event", fake_process_event)
+    path = tmp_path / "events.jsonl"
+    lines = [json.dumps({"n": i, "dlq": i == 3}) for i in range(10)] + ["not-json", ""]
+    path.write_text("\n".join(lines))
+    producer = FakeProducer()
+
+    stats = asyncio.run(replay_events(iter_file(path), producer, concurrency=4))
+    assert stats.events == 10
+    assert stats.failed == 1
+    assert sorted(producer.sent) == [
+        ("rau_events_dlq", b"not-json", [("reason", b"deserialization_error")]),
+        ("rau_events_dlq", b"{}", [("reason", b"normalization_error")]),
+    ]
+    summary = stats.as_dict()
+    assert summary["events_per_sec"] > 0
+    assert summary["p99_ms"] >= summary["p50_ms"]
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.exceptions = []
+
+    def exception(self, event, **kw):
+        self.exceptions.append((event, kw, sys.exc_info()[1]))
+
+
+def test_replay_logs_failures_and_fails_when_nothing_succeeds(tmp_path, monkeypatch):
+    async def broken_process_event(event):
+        raise KeyError("MODEL_DIR")
+
+    monkeypatch.setattr(replay, "process_event", broken_process_event)
+    monkeypatch.setattr(replay, "FAILURE_LOG_FIRST", 2)
+    monkeypatch.setattr(replay, "FAILURE_LOG_EVERY", 4)
+    path = tmp_path / "events.jsonl"
+    path.write_text("\n".join(json.dumps({"n": i}) for i in range(9)))
+    logger = RecordingLogger()
+
+    with pytest.raises(RuntimeError, match="none of 9 events"):
+        asyncio.run(replay_events(iter_file(path), FakeProducer(), concurrency=2, logger=logger))
+    # failures 1, 2, 4 and 8, each with its exception
+    assert [kw["failed"] for _, kw, _ in logger.exceptions] == [1, 2, 4, 8]
+    assert all(isinstance(error, KeyError) for _, _, error in logger.exceptions)
+
+
+def test_iter_kafka_offset_range():
+    consumer = FakeConsumer({0: [b"a0", b"a1", b"a2", b"a3"], 1: [b"b0", b"b1", b"b2"]})
+    values = _collect(consumer, from_offset=1, to_offset=3)
+    assert sorted(values) == [b"a1", b"a2", b"b1", b"b2"]
+    assert consumer.paused == {TopicPartition("rau_events", 0), TopicPartition("rau_events", 1)}
+
+
+def test_iter_kafka_to_offset_past_end():
+    consumer = FakeConsumer({0: [b"a0", b"a1", b"a2"], 1: [b"b0"]})
+    assert sorted(_collect(consumer, to_offset=100)) == [b"a0", b"a1", b"a2", b"b0"]
+
+
+def test_iter_kafka_range_ending_in_markers():
+    # read_committed consumers skip commit markers without returning records
+    consumer = FakeConsumer({0: [b"a0", b"a1", None, None, None], 1: [b"b0", None]})
+    assert sorted(_collect(consumer)) == [b"a0", b"a1", b"b0"]
+    assert sorted(_collect(FakeConsumer({0: [None, None, None]}))) == []
+
+
+def test_latency_histogram_bounded():
+    hist = replay.LatencyHistogram()
+    for i in range(1, 100001):
+        hist.record(i * 1e-6)  # 1 µs .. 100 ms
+    assert len(hist.counts) == len(hist.bounds) + 1
+    assert hist.total == 100000
+    assert abs(hist.percentile(0.5) - 0.05) / 0.05 < 0.05
+    assert abs(hist.percentile(0.99) - 0.099) / 0.099 < 0.05
+    assert replay.LatencyHistogram().percentile(0.5) == 0.0
+
+
+def test_parse_timestamp_ms():
+    assert parse_timestamp_ms("1700000000000") == 1_700_000_000_000
+    assert parse_timestamp_ms("1970-01-01T00:00:01Z") == 1000
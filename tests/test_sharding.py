@@ -0,0 +1,182 @@
+import asyncio
+import importlib
+import os
+import random
+import signal
+import sys
+
+import pytest
+
+# ensure real prometheus_client is loaded (tests may stub it)
+mod = sys.modules.get("prometheus_client")
+if mod is not None and getattr(mod, "__file__", None) is None:
+    sys.modules.pop("prometheus_client", None)
+    importlib.invalidate_caches()
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ai_service.app.normalize import Normalizer
+from ai_service.app.scoring_engine import ScoringEngine
+from ai_service.app.sharding import HashRing, ShardDied, ShardedScoringEngine
+
+
+def _events(n, users, seed=0):
+    rng = random.Random(seed)
+    return [
+        Normalizer.normalize(
+            {
+                "src_ip": f"192.168.1.{rng.randint(1, 254)}",
+                "timestamp": 1700000000 + i,
+                "bytes": rng.randint(0, 1000),
+                "user_id": f"user-{rng.randint(1, users)}" if i % 10 else None,
+                "method": rng.choice(["GET", "POST"]),
+            }
+        )
+        for i in range(n)
+    ]
+
+
+def _assert_same(results, expected):
+    assert len(results) == len(expected)
+    for r, e in zip(results, expected):
+        assert r.score_if == pytest.approx(e.score_if, rel=1e-6)
+        assert r.score_lstm == pytest.approx(e.score_lstm, rel=1e-4, abs=1e-7)
+        assert r.aggregate == pytest.approx(e.aggregate, abs=1e-5)
+
+
+def test_ring_moves_only_to_new_shard():
+    users = [f"user-{i}" for i in range(5000)]
+    ring, grown = HashRing(4), HashRing(5)
+    owners = [ring.shard(u) for u in users]
+    assert sorted(set(owners)) == [0, 1, 2, 3]
+    moved = [u for u, owner in zip(users, owners) if grown.shard(u) != owner]
+    assert all(grown.shard(u) == 4 for u in moved)
+    # about a fifth of the users move to the fifth shard
+    assert 0.1 < len(moved) / len(users) < 0.3
+    with pytest.raises(ValueError):
+        HashRing(0)
+
+
+def test_sharded_matches_single_engine_across_resize(model_dir):
+    first, second = _events(120, users=12, seed=1), _events(120, users=12, seed=2)
+    single = ScoringEngine(model_dir, lstm_backend="numpy", metrics_port=None)
+    expected_first = asyncio.run(single.score_batch(first))
+    expected_second = asyncio.run(single.score_batch(second))
+
+    async def run():
+        sharded = ShardedScoringEngine(model_dir, shards=2, lstm_backend="numpy", max_wait_ms=5.0)
+        try:
+            results_first = await sharded.score_batch(first)
+            moved = await sharded.resize(3)
+            # histories moved with their users, so scores continue unchanged
+            results_second = await sharded.score_batch(second)
+            return results_first, results_second, moved, sharded.shards
+        finally:
+            await sharded.close()
+
+    results_first, results_second, moved, shards = asyncio.run(run())
+    _assert_same(results_first, expected_first)
+    _assert_same(results_second, expected_second)
+    assert moved > 0 and shards == 3
+
+
+def test_failed_resize_restores_users(model_dir):
+    first, second = _events(120, users=12, seed=6), _events(120, users=12, seed=7)
+    single = ScoringEngine(model_dir, lstm_backend="numpy", metrics_port=None)
+    expected = asyncio.run(single.score_batch(first)) + asyncio.run(single.score_batch(second))
+
+    async def run():
+        sharded = ShardedScoringEngine(model_dir, shards=2, lstm_backend="numpy")
+        call, added = sharded._call, []
+
+        async def failing_import(shard, request):
+            if request[0] == "import" and shard.index == 2:
+                added.append(shard)
+                raise RuntimeError("import failed")
+            return await call(shard, request)
+
+        try:
+            results = await sharded.score_batch(first)
+            sharded._call = failing_import
+            with pytest.raises(RuntimeError, match="import failed"):
+                await sharded.resize(3)
+            sharded._call = call
+            # users went back to their old shards with their histories
+            results += await sharded.score_batch(second)
+            return results, sharded.shards, sharded.ring.shards, added[0].process.is_alive()
+        finally:
+            await sharded.close()
+
+    results, shards, ring_shards, added_alive = asyncio.run(run())
+    assert (shards, ring_shards, added_alive) == (2, 2, False)
+    _assert_same(results, expected)
+
+
+def test_resize_down_keeps_histories(model_dir):
+    events = _events(80, users=8, seed=3)
+    single = ScoringEngine(model_dir, lstm_backend="numpy", lstm_mode="windowed", metrics_port=None)
+    expected = [asyncio.run(single.score(e)) for e in events]
+
+    async def run():
+        sharded = ShardedScoringEngine(model_dir, shards=3, lstm_backend="numpy", lstm_mode="windowed")
+        try:
+            results = await sharded.score_batch(events[:40])
+            await sharded.resize(1)
+            return results + await sharded.score_batch(events[40:])
+        finally:
+            await sharded.close()
+
+    _assert_same(asyncio.run(run()), expected)
+
+
+def test_unknown_mode_rejected(model_dir):
+    with pytest.raises(ValueError):
+        ShardedScoringEngine(model_dir, shards=1, lstm_backend="numpy", lstm_mode="sometimes")
+
+
+def test_dead_shard_is_restarted(model_dir):
+    events = _events(40, users=8, seed=4)
+
+    async def run():
+        sharded = ShardedScoringEngine(model_dir, shards=2, lstm_backend="numpy")
+        try:
+            await sharded.score_batch(events)
+            dead = sharded._shards[0].process
+            dead.kill()
+            dead.join()
+            # the batch that finds the worker gone fails; its replacement scores the rest
+            first = await asyncio.gather(*(sharded.submit(e) for e in events), return_exceptions=True)
+            second = await sharded.score_batch(events)
+            return first, second, dead.pid, sharded._shards[0].process
+        finally:
+            await sharded.close()
+
+    first, second, dead_pid, process = asyncio.run(run())
+    assert any(isinstance(r, ShardDied) for r in first)
+    assert len(second) == len(events)
+    assert process.pid != dead_pid
+
+
+def test_resize_on_signals(model_dir):
+    async def run():
+        sharded = ShardedScoringEngine(model_dir, shards=1, lstm_backend="numpy")
+        try:
+            sharded.resize_on_signals()
+            os.kill(os.getpid(), signal.SIGTTIN)
+            os.kill(os.getpid(), signal.SIGTTIN)
+            for _ in range(500):
+                await asyncio.sleep(0.01)
+                if sharded.shards == 3 and not sharded._resizes:
+                    break
+            grown = sharded.shards
+            os.kill(os.getpid(), signal.SIGTTOU)
+            for _ in range(500):
+                await asyncio.sleep(0.01)
+                if sharded.shards == 2 and not sharded._resizes:
+                    break
+            scores = await sharded.score_batch(_events(20, users=4, seed=5))
+            return grown, sharded.shards, len(scores)
+        finally:
+            await sharded.close()
+
+    assert asyncio.run(run()) == (3, 2, 20)
@@ -1,12 +1,33 @@
+import argparse
+import json
+from typing import Iterable, Optional
+
 import numpy as np
 from sklearn.ensemble import IsolationForest
 import joblib
 from pathlib import Path
 
+from ai_service.app.features import FEATURES, vectorize
+from ai_service.app.normalize import Normalizer
+
+
+def featurize(records: Iterable[dict]) -> np.ndarray:
+    """Raw event dicts to the ``(n, 32)`` matrix the scoring engine builds."""
+    return vectorize([Normalizer.normalize(record) for record in records])
+
+
+def load_events(path: str) -> np.ndarray:
+    """Features of a JSON Lines file of raw events."""
+    with open(path) as f:
+        return featurize(json.loads(line) for line in f if line.strip())
+
 
-def main() -> None:
-    rng = np.random.RandomState(42)
-    X = rng.normal(size=(200, 32))
+def main(events: Optional[str] = None) -> None:
+    if events is None:
+        rng = np.random.RandomState(42)
+        X = rng.normal(size=(200, FEATURES))
+    else:
+        X = load_events(events)
     clf = IsolationForest(n_estimators=10, random_state=42)
     clf.fit(X)
     Path('models').mkdir(exist_ok=True)
@@ -14,4 +35,6 @@ def main() -> None:
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(prog="python -m trainer.train_if")
+    parser.add_argument("--events", help="train on a JSON Lines file of raw events instead of random features")
+    main(parser.parse_args().events)